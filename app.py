@@ -1,33 +1,76 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string, send_file, redirect
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 import os
-import tempfile
+import io
+import hashlib
 import base64
 import requests
 from murf import MurfDub, Murf
+from murf.environment import MurfEnvironment
 from murf.utils import validate_hmac
 from dotenv import load_dotenv
 import json
+import copy
 import uuid
+import time
+import threading
 from datetime import datetime
-from models import db, User, ChatMessage, Circle
+from models import db, User, ChatMessage, Circle, MessageTranslation, upgrade_schema
+from translation_cache import TranslationCache
+from dubbing_cache import DubbingCache, dubbing_key
+from blob_store import BlobStore, guess_audio_mimetype
+from circle_images import decode_data_url, guess_image_mimetype, hash_from_url, image_url, store_image, thumbnails_available
+from audio_pipeline import prepare_for_dubbing, split_for_dubbing, NoSpeechError
+from dubbing_stream import ChunkSequencer, ParkedChunks
+from typing_indicators import TypingAggregator
+from broadcast_batcher import BroadcastBatcher
+from presence import PresenceRegistry
+from write_behind import WriteBehindQueue, close_on_signals
+from state_store import create_backend, SharedMap
+from executors import BoundedExecutor, ExecutorBusy, ExecutorTimeout
+from translation_providers import TranslationRouter, create_providers
+from dubbing_scheduler import DubbingScheduler, BudgetExceeded, CreditBudget, estimate_audio_seconds, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK
+import chat_history
+from chat_archive import ArchiveStore
+from retention import RetentionPolicy, RetentionWorker, parse_retention_days
+import message_search
+from circle_summary import CircleSummaryStore
+import metrics
+import structured_log
+from metrics import instrument_handler, timed_call
+from tracing import Tracer
 
 load_dotenv()
 
+structured_log.configure()
+log = structured_log.get_logger('app')
+# Fraction of per-message / per-poll log events that are kept
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.1))
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'the-circle-secret'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///the_circle.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///the_circle.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Enable CORS for React frontend
 CORS(app, origins="*")
 
 db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With a message queue (e.g. redis://), emits to a room reach clients on every worker
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'))
 
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    message_search.setup()
+
+# Voice audio lives on disk, content-addressed; rows only keep the hash
+blob_store = BlobStore(os.getenv('BLOB_STORE_PATH', os.path.join(app.instance_path, 'blobs')))
+if not thumbnails_available():
+    log.warning('thumbnails_disabled', reason='Pillow is not installed; circle images serve as their own thumbnails')
+# History past the hot window, compacted by retention.py and read back by chat_history
+chat_archive = ArchiveStore(os.getenv('ARCHIVE_PATH', os.path.join(app.instance_path, 'archive')))
 
 # Initialize Murf clients
 dub_api_key = os.getenv('MURFDUB_API_KEY')
@@ -36,24 +79,101 @@ if not dub_api_key:
     murf_dub_client = None
 else:
     try:
-        murf_dub_client = MurfDub(api_key=dub_api_key)
+        murf_environment = MurfEnvironment.DEFAULT
+        if os.getenv('MURF_BASE_URL'):
+            # e.g. a regional gateway, or the stub server used by bench/
+            murf_environment = copy.copy(MurfEnvironment.DEFAULT)
+            murf_environment.base = os.getenv('MURF_BASE_URL').rstrip('/')
+        murf_dub_client = MurfDub(api_key=dub_api_key, environment=murf_environment)
         print(f"MurfDub client initialized successfully")
     except Exception as e:
         print(f"MurfDub client initialization error: {e}")
         murf_dub_client = None
 
+# Shared state lives behind a state store so several worker processes can serve
+# the same circles; values read from it are snapshots and must be written back
+state_backend = create_backend(os.getenv('STATE_STORE_URL'))
+
 # Store circle data
-user_languages = {}
-active_rooms = {}
-circle_transcripts = {}
+user_languages = SharedMap(state_backend, 'user_languages')
+active_rooms = PresenceRegistry(state_backend)
+circle_transcripts = SharedMap(state_backend, 'circle_transcripts')
+
+# Read-through cache of /api/circles/<id> responses; update_circle invalidates it
+circle_info_cache = SharedMap(state_backend, 'circle_info')
+CIRCLE_INFO_TTL_SECONDS = int(os.getenv('CIRCLE_INFO_TTL', 300))
+circle_info_lookups = metrics.registry.counter(
+    'circle_info_cache_lookups', 'Circle metadata lookups by cache result.', ['result'])
 
 # Chat functionality
-chat_rooms = {}
-chat_messages = {}
-user_sessions = {}
+chat_rooms = SharedMap(state_backend, 'chat_rooms')
+chat_messages = SharedMap(state_backend, 'chat_messages')
+user_sessions = SharedMap(state_backend, 'user_sessions')
+
+# Voice messages
+MIN_AUDIO_BYTES = 75
+
+def trace_db_insert(rows, started, ended):
+    # The handler only enqueues (db_enqueue); the real write is traced when its batch commits
+    for row in rows:
+        tracer.record(row.get('message_uuid'), 'db_insert', started, ended, batch=len(rows))
+
+# Chat messages are broadcast immediately and persisted in batched transactions
+write_queue = WriteBehindQueue(
+    app,
+    ChatMessage,
+    flush_interval_ms=int(os.getenv('WRITE_BEHIND_FLUSH_MS', 50)),
+    max_batch=int(os.getenv('WRITE_BEHIND_MAX_BATCH', 200)),
+    on_flush=trace_db_insert
+)
+translation_queue = WriteBehindQueue(
+    app,
+    MessageTranslation,
+    flush_interval_ms=int(os.getenv('WRITE_BEHIND_FLUSH_MS', 50)),
+    max_batch=int(os.getenv('WRITE_BEHIND_MAX_BATCH', 200))
+)
+close_on_signals(write_queue, translation_queue)
+
+# Per-circle counters behind GET /api/circles, fed by the send/join/leave handlers
+circle_summary = CircleSummaryStore(app, flush_interval_ms=int(os.getenv('CIRCLE_SUMMARY_FLUSH_MS', 1000)))
+circle_summary.backfill()
+if not os.getenv('STATE_STORE_URL'):
+    circle_summary.reset_participants()
+metrics.registry.gauge('circle_summary_pending', 'Circles with summary updates not yet written.', lambda: circle_summary.depth())
+
+# Off by default: compaction isn't coordinated across workers, so enable it on one of them
+RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', 0))
+retention_worker = RetentionWorker(app, chat_archive, blob_store, RETENTION_INTERVAL_SECONDS) if RETENTION_INTERVAL_SECONDS > 0 else None
+
+# One "who is typing" frame per room per interval instead of a broadcast per keystroke
+typing_events = metrics.registry.counter('typing_events', 'Typing events by whether they changed the room snapshot.', ['result'])
+typing_aggregator = TypingAggregator(
+    state_backend,
+    lambda room_id, users: socketio.emit('typing_users', {'room_id': room_id, 'users': users}, room=room_id),
+    interval_ms=int(os.getenv('TYPING_INTERVAL_MS', 300)),
+    ttl_seconds=int(os.getenv('TYPING_TTL_SECONDS', 6)),
+    events=typing_events,
+    snapshots=metrics.registry.counter('typing_snapshots', 'Typing snapshots broadcast to rooms.')
+)
+
+# Busy rooms get one new_messages frame per window instead of a new_message per message
+broadcast_batcher = BroadcastBatcher(
+    lambda room_id, message: socketio.emit('new_message', message, room=room_id),
+    lambda room_id, messages: socketio.emit('new_messages', {'room_id': room_id, 'messages': messages}, room=room_id),
+    threshold_per_second=float(os.getenv('BROADCAST_BATCH_THRESHOLD', 5)),
+    window_ms=int(os.getenv('BROADCAST_BATCH_WINDOW_MS', 100)),
+    frames=metrics.registry.counter('broadcast_frames', 'Chat broadcast frames by kind (single message or batch).', ['kind'])
+)
+metrics.registry.gauge('broadcast_pending_messages', 'Chat messages held for the next batch frame.', lambda: broadcast_batcher.stats()['pending_messages'])
+
+def flush_pending_writes():
+    # Make sure rows still waiting in the write-behind queues show up in reads
+    write_queue.flush()
+    translation_queue.flush()
 
 # Dubbing API
-pending_jobs = {}
+pending_jobs = SharedMap(state_backend, 'pending_jobs')
+dubbing_cache = DubbingCache(state_backend, max_bytes=int(os.getenv('DUBBING_CACHE_BYTES', 200 * 1024 * 1024)))
 
 # Language mapping for Murf Dubbing API
 DUBBING_LANGUAGE_MAP = {
@@ -91,26 +211,319 @@ TRANSLATE_LANGUAGE_MAP = {
     'pl': 'pl'
 }
 
-WEBHOOK_SECRET = "the-circle-webhook-secret"
+WEBHOOK_SECRET = os.getenv('MURF_WEBHOOK_SECRET', "the-circle-webhook-secret")
+WEBHOOK_SIGNATURE_HEADER = 'X-Murf-Signature'
+WEBHOOK_TIMESTAMP_HEADER = 'X-Murf-Timestamp'
+WEBHOOK_TOLERANCE_SECONDS = 300
+
+# Public URL of /api/murf/webhook; when unset, completion relies on polling
+MURF_WEBHOOK_URL = os.getenv('MURF_WEBHOOK_URL')
+
+# Fallback job poller
+JOB_POLL_INITIAL_DELAY = 2
+JOB_POLL_WEBHOOK_GRACE = 20
+JOB_POLL_BACKOFF = 1.5
+JOB_POLL_MAX_DELAY = 30
+JOB_POLL_MAX_ATTEMPTS = 30
+job_poller_lock = threading.Lock()
+job_poller_running = False
+job_poll_state = {}
+
+# Blocking provider calls run in bounded pools, so a slow provider can't stall
+# socket handlers or pile up unbounded background tasks
+translation_pool = BoundedExecutor(
+    'translation',
+    max_workers=int(os.getenv('TRANSLATION_WORKERS', 8)),
+    max_queue=int(os.getenv('TRANSLATION_QUEUE', 64)),
+    default_timeout=float(os.getenv('TRANSLATION_TIMEOUT', 10))
+)
+dubbing_pool = BoundedExecutor(
+    'dubbing-upload',
+    max_workers=int(os.getenv('DUBBING_UPLOAD_WORKERS', 4)),
+    max_queue=int(os.getenv('DUBBING_UPLOAD_QUEUE', 32)),
+    default_timeout=float(os.getenv('DUBBING_UPLOAD_TIMEOUT', 60))
+)
+download_pool = BoundedExecutor(
+    'audio-download',
+    max_workers=int(os.getenv('AUDIO_DOWNLOAD_WORKERS', 4)),
+    max_queue=int(os.getenv('AUDIO_DOWNLOAD_QUEUE', 64)),
+    default_timeout=float(os.getenv('AUDIO_DOWNLOAD_TIMEOUT', 120))
+)
+executor_pools = [translation_pool, dubbing_pool, download_pool]
+MURF_REQUEST_OPTIONS = {'timeout_in_seconds': int(os.getenv('MURF_REQUEST_TIMEOUT', 30))}
+
+# Fair, rate- and budget-limited admission for dubbing jobs. Credits are
+# seconds of source audio; a budget of 0 means unlimited
+dubbing_scheduler = DubbingScheduler(
+    rate_per_second=float(os.getenv('DUBBING_JOBS_PER_SECOND', 1)),
+    burst=int(os.getenv('DUBBING_JOBS_BURST', 5)),
+    credit_budget=float(os.getenv('DUBBING_CREDIT_BUDGET', 0)),
+    credit_window_seconds=int(os.getenv('DUBBING_CREDIT_WINDOW', 3600)),
+    max_queue=int(os.getenv('DUBBING_SCHEDULER_QUEUE', 200)),
+    position_interval_seconds=float(os.getenv('DUBBING_POSITION_INTERVAL', 2))
+)
+DUBBING_SHORT_CLIP_SECONDS = 15
+# Streaming dubs release each listener's chunks in order, whichever worker finishes them
+parked_chunks = ParkedChunks(os.getenv('DUBBING_CHUNK_PATH', os.path.join(app.instance_path, 'dubbing_chunks')))
+dubbing_streams = ChunkSequencer(state_backend, discard=lambda result: discard_parked_chunk(result))
+
+# Pre-dubbing for circles with auto_dub: speculative jobs get their own, smaller budget
+# (seconds of audio per window) and only clips up to PREDUB_MAX_SECONDS
+PREDUB_MAX_SECONDS = float(os.getenv('PREDUB_MAX_SECONDS', 60))
+predub_budget = CreditBudget(
+    float(os.getenv('PREDUB_CREDIT_BUDGET', 600)),
+    window_seconds=int(os.getenv('PREDUB_CREDIT_WINDOW', 3600))
+)
+predub_jobs = metrics.registry.counter('predub_jobs', 'Speculative dubbing decisions by outcome.', ['result'])
+
+# Per-message stage timings, keyed by message_id
+tracer = Tracer(capacity=int(os.getenv('TRACE_BUFFER_SIZE', 1000)))
+
+# Socket.IO connections held by this process
+connected_sids = set()
+
+metrics.registry.gauge('circle_pending_dubbing_jobs', 'Dubbing jobs waiting on Murf.', lambda: len(pending_jobs))
+metrics.registry.gauge('circle_active_rooms', 'Circles with at least one participant.', lambda: len(active_rooms))
+metrics.registry.gauge('circle_connected_sids', 'Socket.IO clients connected to this process.', lambda: len(connected_sids))
+metrics.registry.gauge('circle_write_queue_depth', 'Chat rows waiting for the write-behind flush.', lambda: write_queue.depth())
+metrics.registry.gauge('circle_dubbing_queue_depth', 'Dubbing jobs held by the scheduler.', lambda: dubbing_scheduler.stats()['queued'])
+DUBBING_PROVIDER_BACKOFF_SECONDS = 30
+# The Translation Bot "types" for this long before it answers
+BOT_TYPING_DELAY_SECONDS = 1
+
+# Translation cache shared by translate_text and the Translation Bot
+translation_cache = TranslationCache(
+    app,
+    max_entries=int(os.getenv('TRANSLATION_CACHE_SIZE', 5000)),
+    ttl_seconds=int(os.getenv('TRANSLATION_CACHE_TTL', 7 * 24 * 3600))
+)
+
+# Providers are tried in TRANSLATION_PROVIDERS order; libre needs TRANSLATE_API_URL, argos needs argostranslate
+translation_router = TranslationRouter(
+    create_providers(
+        os.getenv('TRANSLATION_PROVIDERS', 'libre,google,argos').split(','),
+        libre_url=os.getenv('TRANSLATE_API_URL'),
+        libre_api_key=os.getenv('TRANSLATE_API_KEY'),
+        timeout=float(os.getenv('TRANSLATION_PROVIDER_TIMEOUT', 5))
+    ),
+    hedge_percentile=float(os.getenv('TRANSLATION_HEDGE_PERCENTILE', 95)),
+    default_hedge_seconds=float(os.getenv('TRANSLATION_HEDGE_SECONDS', 1.0)),
+    deadline_seconds=float(os.getenv('TRANSLATION_TIMEOUT', 10))
+)
+
+def translate_message(text, source_language, target_language):
+    source_lang = TRANSLATE_LANGUAGE_MAP.get(source_language, 'auto')
+    target_lang = TRANSLATE_LANGUAGE_MAP.get(target_language, 'en')
+    
+    cached = translation_cache.get(text, source_lang, target_lang)
+    if cached is not None:
+        return cached
+    
+    translated_text = translation_router.translate(text, source_lang, target_lang)
+    translation_cache.set(text, source_lang, target_lang, translated_text)
+    return translated_text
+
+def translate_messages(texts, source_language, target_language):
+    # Cache misses go to the provider as one batch call where the backend supports it
+    source_lang = TRANSLATE_LANGUAGE_MAP.get(source_language, 'auto')
+    target_lang = TRANSLATE_LANGUAGE_MAP.get(target_language, 'en')
+    
+    results = [translation_cache.get(text, source_lang, target_lang) for text in texts]
+    missing = list(dict.fromkeys(text for text, cached in zip(texts, results) if cached is None))
+    if missing:
+        translated = dict(zip(missing, translation_router.translate_batch(missing, source_lang, target_lang)))
+        for text, translated_text in translated.items():
+            translation_cache.set(text, source_lang, target_lang, translated_text)
+        results = [translated.get(text, cached) for text, cached in zip(texts, results)]
+    return results
+
+def decode_audio_payload(audio):
+    # Binary clients send raw bytes as a Socket.IO attachment, legacy clients send base64
+    if isinstance(audio, (bytes, bytearray)):
+        return bytes(audio)
+    return base64.b64decode(audio)
+
+def encode_audio_payload(audio_bytes, transport):
+    if transport == 'binary':
+        return audio_bytes
+    return base64.b64encode(audio_bytes).decode('utf-8')
+
+def voice_audio_payload(msg, transport):
+    if msg.audio_hash:
+        audio_bytes = blob_store.get(msg.audio_hash)
+        if audio_bytes is not None:
+            return encode_audio_payload(audio_bytes, transport)
+    # Rows written before the blob store still carry base64 in audio_data
+    if msg.audio_data:
+        return decode_audio_payload(msg.audio_data) if transport == 'binary' else msg.audio_data
+    return None
+
+def audio_url(audio_hash):
+    return f"/api/audio/{audio_hash}" if audio_hash else None
+
+def apply_circle_image(circle, value):
+    # Data URLs become blobs; our own image URLs round-trip unchanged; http(s) URLs are kept as links
+    if not value:
+        circle.image = circle.image_hash = circle.thumbnail_hash = None
+        return
+    
+    existing_hash = hash_from_url(value)
+    if existing_hash and existing_hash in (circle.image_hash, circle.thumbnail_hash):
+        return
+    
+    data = decode_data_url(value)
+    if data is None and existing_hash:
+        data = blob_store.get(existing_hash)
+    if data is not None:
+        circle.image_hash, circle.thumbnail_hash = store_image(blob_store, data)
+        circle.image = None
+    elif value.startswith(('http://', 'https://')):
+        circle.image = value
+        circle.image_hash = circle.thumbnail_hash = None
+    else:
+        raise ValueError('Unsupported image')
+
+def apply_circle_retention(circle, data):
+    for field in ('audio_retention_days', 'text_retention_days'):
+        if field in data:
+            setattr(circle, field, parse_retention_days(data[field]))
+
+def circle_info(circle):
+    if circle.image and circle.image.startswith('data:'):
+        # Rows written before images moved to the blob store
+        try:
+            apply_circle_image(circle, circle.image)
+        except ValueError:
+            circle.image = None
+        db.session.commit()
+    
+    return {
+        'id': circle.id,
+        'name': circle.name,
+        'description': circle.description,
+        'image': image_url(circle.image_hash) or circle.image,
+        'thumbnail': image_url(circle.thumbnail_hash) or circle.image,
+        'color': circle.color,
+        'emoji': circle.emoji,
+        'owner_username': circle.owner_username,
+        'created_at': circle.created_at.isoformat(),
+        'retention': RetentionPolicy.for_circle(circle).to_dict(),
+        'auto_dub': bool(circle.auto_dub)
+    }
+
+def cached_circle_info(circle_id):
+    # Read-through over circle_info_cache; None for rooms that were never created as circles
+    cached = circle_info_cache.get(circle_id)
+    if cached is not None and time.time() - cached['cached_at'] < CIRCLE_INFO_TTL_SECONDS:
+        circle_info_lookups.inc(result='hit')
+        return cached['info']
+    circle_info_lookups.inc(result='miss')
+    
+    with app.app_context():
+        circle = Circle.query.filter_by(id=circle_id).first()
+        if not circle:
+            return None
+        info = circle_info(circle)
+        circle_info_cache[circle_id] = {'info': info, 'cached_at': time.time()}
+        return info
+
+def circle_summary_entry(summary, circle=None):
+    if circle is not None:
+        entry = circle_info(circle)
+    else:
+        entry = {'id': summary.room_id, 'name': f"Circle {summary.room_id.split('-')[-1]}", 'image': None, 'thumbnail': None}
+    entry.update(
+        participant_count=active_rooms.count(summary.room_id),
+        message_count=summary.message_count,
+        languages=sorted(filter(None, summary.languages.split(','))),
+        last_activity_at=summary.last_activity_at.isoformat(),
+        last_message={
+            'username': summary.last_message_username,
+            'type': summary.last_message_type,
+            'preview': summary.last_message_preview,
+            'timestamp': summary.last_message_at.isoformat()
+        } if summary.last_message_at else None
+    )
+    return entry
+
+def history_entry(msg, translations=None):
+    if msg.message_type == 'voice':
+        return {
+            'type': 'voice',
+            'speaker': msg.username,
+            # Archived voice messages outlived their audio
+            'audio_url': audio_url(msg.audio_hash) or (None if getattr(msg, 'archived', False) else f"/api/messages/{msg.message_uuid}/audio"),
+            'audio_length': msg.audio_length,
+            'language': msg.language,
+            'timestamp': msg.timestamp.isoformat(),
+            'message_id': msg.message_uuid,
+            'source_language': msg.language,
+            'format': 'audio/webm'
+        }
+    return {
+        'type': 'text',
+        'id': msg.message_uuid,
+        'username': msg.username,
+        'message': msg.message,
+        'timestamp': msg.timestamp.isoformat(),
+        'language': msg.language,
+        'translations': (translations or {}).get(msg.message_uuid, {})
+    }
+
+def transport_room(room_id, transport):
+    return f"{room_id}#{transport}"
+
+def language_room(room_id, language):
+    return f"{room_id}#lang:{language}"
+
+def session_transport(sid):
+    if sid is None:
+        # Pre-dubs have no listener yet
+        return 'base64'
+    return (user_sessions.get(sid) or {}).get('audio_transport', 'base64')
+
+def emit_voice_message(room_id, message, audio_bytes, audio_base64=None):
+    # Each circle has one sub-room per audio transport, so binary clients never
+    # pay for base64 and legacy clients keep receiving strings
+    socketio.emit('voice_message', dict(message, audio_data=audio_bytes, audio_encoding='binary'),
+                  room=transport_room(room_id, 'binary'))
+    
+    if active_rooms.has_member(room_id, audio_transport='base64'):
+        if audio_base64 is None:
+            audio_base64 = encode_audio_payload(audio_bytes, 'base64')
+        socketio.emit('voice_message', dict(message, audio_data=audio_base64, audio_encoding='base64'),
+                      room=transport_room(room_id, 'base64'))
 
 # Murf API error handling
-def handle_murf_error(error, speaker_name, user_sid):
+def classify_murf_error(error):
     error_msg = str(error)
-    user_friendly_msg = "Translation failed"
     
     if "INSUFFICIENT_CREDITS" in error_msg or "CREDITS_EXHAUSTED" in error_msg:
-        user_friendly_msg = "Translation service credits exhausted"
+        return 'credits_exhausted', "Translation service credits exhausted"
+    elif "429" in error_msg or "RATE_LIMIT" in error_msg:
+        return 'rate_limited', "Translation service is busy - please try again shortly"
     elif "LANGUAGE_NOT_SUPPORTED" in error_msg:
-        user_friendly_msg = "Language not supported for translation"
+        return 'language_not_supported', "Language not supported for translation"
     elif "SPEECH_NOT_PRESENT" in error_msg:
-        user_friendly_msg = "No speech detected in audio"
+        return 'speech_not_present', "No speech detected in audio"
     elif "SOURCE_LANGUAGE_MISMATCH" in error_msg:
-        user_friendly_msg = "Source language mismatch"
+        return 'source_language_mismatch', "Source language mismatch"
     elif "504" in error_msg or "Gateway Time-out" in error_msg or "timeout" in error_msg.lower():
-        user_friendly_msg = "Translation service temporarily unavailable - please try again"
+        return 'timeout', "Translation service temporarily unavailable - please try again"
     elif "SERVER_ERROR" in error_msg:
-        user_friendly_msg = "Translation server error"
+        return 'server_error', "Translation server error"
+    return 'other', "Translation failed"
+
+def handle_murf_error(error, speaker_name, user_sid, waiter=None):
+    category, user_friendly_msg = classify_murf_error(error)
+    metrics.murf_errors.inc(category=category)
+    log.warning('murf_error', category=category, error=str(error), sid=user_sid)
     
+    if waiter and waiter.get('speculative'):
+        return
+    if waiter and waiter.get('chunk'):
+        complete_dubbed_chunk(waiter, error=user_friendly_msg)
+        return
     socketio.emit('dubbing_error', {
         'error': user_friendly_msg,
         'speaker': speaker_name
@@ -140,6 +553,176 @@ def serve_react_app(path):
 def health_check():
     return jsonify({'status': 'ok', 'message': 'Backend is running'})
 
+@app.route('/api/write-queue/stats')
+def write_queue_stats():
+    return jsonify(write_queue.stats())
+
+@app.route('/api/translation-cache/stats')
+def translation_cache_stats():
+    return jsonify(translation_cache.stats())
+
+@app.route('/api/translation-providers/stats')
+def translation_provider_stats():
+    return jsonify(translation_router.stats())
+
+@app.route('/api/dubbing-cache/stats')
+def dubbing_cache_stats():
+    return jsonify(dubbing_cache.stats())
+
+@app.route('/api/executors/stats')
+def executor_stats():
+    return jsonify({pool.name: pool.stats() for pool in executor_pools})
+
+@app.route('/api/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/traces/slowest')
+def slowest_traces():
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    return jsonify({'traces': tracer.slowest(limit)})
+
+@app.route('/api/traces/stages')
+def trace_stage_percentiles():
+    return jsonify({'traces': len(tracer), 'stages': tracer.stage_percentiles()})
+
+@app.route('/api/traces/<trace_id>')
+def get_trace(trace_id):
+    trace = tracer.get(trace_id)
+    if not trace:
+        return jsonify({'error': 'Trace not found'}), 404
+    return jsonify(trace)
+
+@app.route('/api/circle-summary/stats')
+def circle_summary_stats():
+    return jsonify(circle_summary.stats())
+
+@app.route('/api/typing/stats')
+def typing_stats():
+    return jsonify(typing_aggregator.stats())
+
+@app.route('/api/circles/<circle_id>/archive')
+def circle_archive_stats(circle_id):
+    stats = chat_archive.stats(circle_id)
+    stats['retention'] = retention_worker.stats() if retention_worker else None
+    return jsonify(stats)
+
+@app.route('/api/dubbing-scheduler/stats')
+def dubbing_scheduler_stats():
+    return jsonify(dict(dubbing_scheduler.stats(), predub_budget=predub_budget.stats()))
+
+@app.route('/api/audio/<audio_hash>')
+def get_audio(audio_hash):
+    if not BlobStore.is_valid_hash(audio_hash) or not blob_store.exists(audio_hash):
+        return jsonify({'error': 'Audio not found'}), 404
+    
+    # Blobs are immutable, so the hash doubles as a strong ETag; send_file handles Range/304
+    response = send_file(
+        blob_store.path(audio_hash),
+        mimetype=guess_audio_mimetype(blob_store.head(audio_hash)),
+        conditional=True,
+        etag=audio_hash,
+        max_age=365 * 24 * 3600
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+@app.route('/api/messages/<message_id>/audio')
+def get_message_audio(message_id):
+    with app.app_context():
+        msg = ChatMessage.query.filter_by(message_uuid=message_id, message_type='voice').first()
+        if not msg:
+            return jsonify({'error': 'Audio not found'}), 404
+        if msg.audio_hash:
+            return redirect(audio_url(msg.audio_hash))
+        if not msg.audio_data:
+            return jsonify({'error': 'Audio not found'}), 404
+        
+        audio_bytes = decode_audio_payload(msg.audio_data)
+        response = send_file(
+            io.BytesIO(audio_bytes),
+            mimetype=guess_audio_mimetype(audio_bytes[:16]),
+            conditional=True,
+            etag=hashlib.sha256(audio_bytes).hexdigest()
+        )
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+@app.route('/api/circles/<circle_id>/messages')
+def get_circle_messages(circle_id):
+    flush_pending_writes()
+    try:
+        with app.app_context():
+            messages, next_cursor = chat_history.load_page(
+                circle_id,
+                before=request.args.get('before'),
+                limit=request.args.get('limit', chat_history.DEFAULT_PAGE_SIZE),
+                archive=chat_archive
+            )
+            translations = chat_history.load_translations(messages)
+            entries = [history_entry(msg, translations) for msg in messages]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'messages': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+@app.route('/api/circles/<circle_id>/search')
+def search_circle_messages(circle_id):
+    if not message_search.is_supported():
+        return jsonify({'error': 'Search needs the SQLite database'}), 501
+    
+    flush_pending_writes()
+    try:
+        with app.app_context():
+            results, next_cursor = message_search.search(
+                circle_id,
+                request.args.get('q'),
+                username=request.args.get('username'),
+                language=request.args.get('language'),
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                sort=request.args.get('sort', 'relevance'),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', message_search.DEFAULT_PAGE_SIZE)
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'results': results,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+@app.route('/api/murf/webhook', methods=['POST'])
+def murf_webhook():
+    payload = request.get_data(as_text=True)
+    timestamp = request.headers.get(WEBHOOK_TIMESTAMP_HEADER, '')
+    signature = request.headers.get(WEBHOOK_SIGNATURE_HEADER, '')
+    
+    if not validate_hmac(WEBHOOK_SECRET, payload, timestamp, signature, WEBHOOK_TOLERANCE_SECONDS):
+        return jsonify({'error': 'Invalid signature'}), 401
+    
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        return jsonify({'error': 'Invalid payload'}), 400
+    
+    job_id = data.get('job_id')
+    status = data.get('status')
+    download_details = data.get('download_details') or []
+    download_url = next((detail.get('download_url') for detail in download_details if detail.get('download_url')), None)
+    
+    handled = False
+    if job_id and status in ('COMPLETED', 'FAILED'):
+        handled = complete_dubbing_job(job_id, status, download_url, data.get('failure_reason'))
+    
+    return jsonify({'success': True, 'handled': handled})
+
 @app.route('/api/circles', methods=['POST'])
 def create_circle():
     data = request.get_json()
@@ -149,42 +732,64 @@ def create_circle():
             id=data['id'],
             name=data['name'],
             description=data.get('description', ''),
-            image=data.get('image'),
             color=data.get('color'),
             emoji=data.get('emoji'),
+            auto_dub=bool(data.get('auto_dub', False)),
             owner_username=data['owner_username']
         )
+        try:
+            apply_circle_image(circle, data.get('image'))
+            apply_circle_retention(circle, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         db.session.add(circle)
         db.session.commit()
+        circle_info_cache.pop(circle.id, None)
+    circle_summary.record_presence(data['id'], active_rooms.count(data['id']))
     
     return jsonify({'success': True})
 
+@app.route('/api/circles', methods=['GET'])
+def list_circles():
+    # ?ids=a,b,c returns the dashboard's joined circles in one request; otherwise all created circles
+    ids = request.args.get('ids')
+    room_ids = [room_id for room_id in ids.split(',') if room_id] if ids is not None else None
+    circle_summary.flush()
+    try:
+        with app.app_context():
+            rows, next_cursor = circle_summary.load_page(
+                sort=request.args.get('sort', 'recent'),
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit'),
+                room_ids=room_ids
+            )
+            entries = [circle_summary_entry(summary, circle) for summary, circle in rows]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'circles': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
 @app.route('/api/circles/<circle_id>')
 def get_circle_info(circle_id):
-    with app.app_context():
-        circle = Circle.query.filter_by(id=circle_id).first()
-        if circle:
-            return jsonify({
-                'id': circle.id,
-                'name': circle.name,
-                'description': circle.description,
-                'image': circle.image,
-                'color': circle.color,
-                'emoji': circle.emoji,
-                'owner_username': circle.owner_username,
-                'created_at': circle.created_at.isoformat()
-            })
-        else:
-            return jsonify({
-                'id': circle_id,
-                'name': f"Circle {circle_id.split('-')[-1]}",
-                'description': '',
-                'image': None,
-                'color': '#64ffda',
-                'emoji': '🌍',
-                'owner_username': None,
-                'created_at': None
-            })
+    info = cached_circle_info(circle_id)
+    if info:
+        return jsonify(info)
+    else:
+        return jsonify({
+            'id': circle_id,
+            'name': f"Circle {circle_id.split('-')[-1]}",
+            'description': '',
+            'image': None,
+            'thumbnail': None,
+            'color': '#64ffda',
+            'emoji': '🌍',
+            'owner_username': None,
+            'created_at': None
+        })
 
 @app.route('/api/circles/<circle_id>', methods=['PUT'])
 def update_circle(circle_id):
@@ -195,20 +800,53 @@ def update_circle(circle_id):
         if circle:
             circle.name = data.get('name', circle.name)
             circle.description = data.get('description', circle.description)
-            circle.image = data.get('image', circle.image)
+            if 'image' in data:
+                try:
+                    apply_circle_image(circle, data['image'])
+                except ValueError as e:
+                    db.session.rollback()
+                    return jsonify({'error': str(e)}), 400
+            try:
+                apply_circle_retention(circle, data)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
             circle.color = data.get('color', circle.color)
             circle.emoji = data.get('emoji', circle.emoji)
+            circle.auto_dub = bool(data.get('auto_dub', circle.auto_dub))
             db.session.commit()
+            circle_info_cache.pop(circle_id, None)
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Circle not found'}), 404
 
+@app.route('/api/images/<image_hash>')
+def get_image(image_hash):
+    if not BlobStore.is_valid_hash(image_hash) or not blob_store.exists(image_hash):
+        return jsonify({'error': 'Image not found'}), 404
+    mimetype = guess_image_mimetype(blob_store.head(image_hash))
+    if mimetype == 'application/octet-stream':
+        return jsonify({'error': 'Image not found'}), 404
+    
+    # Content-addressed, so the hash is a strong ETag; send_file adds Last-Modified and answers 304s
+    response = send_file(
+        blob_store.path(image_hash),
+        mimetype=mimetype,
+        conditional=True,
+        etag=image_hash,
+        max_age=365 * 24 * 3600
+    )
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
 @socketio.on('join_circle')
+@instrument_handler('join_circle')
 def handle_join_circle(data):
     room_id = data['room_id']
     username = data['username']
     language = data['language']
     bot_language = data.get('bot_language')
+    audio_transport = 'binary' if data.get('audio_transport') == 'binary' else 'base64'
     is_bot_mode = 'translationbot-' in room_id
     
     with app.app_context():
@@ -220,6 +858,8 @@ def handle_join_circle(data):
             db.session.commit()
     
     join_room(room_id)
+    join_room(transport_room(room_id, audio_transport))
+    join_room(language_room(room_id, language))
     user_languages[request.sid] = language
     
     user_sessions[request.sid] = {
@@ -227,83 +867,151 @@ def handle_join_circle(data):
         'room_id': room_id,
         'language': language,
         'is_bot_mode': is_bot_mode,
-        'bot_language': bot_language
+        'bot_language': bot_language,
+        'audio_transport': audio_transport
     }
     
-    if room_id not in active_rooms:
-        active_rooms[room_id] = []
-    
     if room_id not in chat_rooms:
         chat_rooms[room_id] = {'messages': [], 'participants': []}
         chat_messages[room_id] = []
     
-    active_rooms[room_id] = [user for user in active_rooms[room_id] 
-                            if user['username'] != username]
+    active_rooms.join(room_id, request.sid, username, language=language, audio_transport=audio_transport)
+    circle_summary.record_presence(room_id, active_rooms.count(room_id), language)
     
-    active_rooms[room_id].append({
-        'sid': request.sid,
-        'username': username,
-        'language': language
-    })
+    flush_pending_writes()
     
     with app.app_context():
         # Load chat history from database
-        messages = ChatMessage.query.filter_by(room_id=room_id).order_by(ChatMessage.timestamp.desc()).limit(50).all()
-        print(f"[DB] Found {len(messages)} messages for room {room_id}")
+        messages, next_cursor = chat_history.load_page(room_id, archive=chat_archive)
+        translations = chat_history.load_translations(messages)
+        log.debug('history_loaded', room_id=room_id, messages=len(messages))
+        
+        paged_history = data.get('history_mode') == 'paged'
+        if paged_history:
+            # One frame of stubs; voice audio is fetched lazily via audio_url/load_voice_audio
+            emit('history', {
+                'messages': [history_entry(msg, translations) for msg in messages],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
         
         text_messages = []
         voice_messages = []
         
-        for msg in reversed(messages):
+        for msg in ([] if paged_history else messages):
+            if msg.message_type == 'voice' and getattr(msg, 'archived', False):
+                # Nothing to play once the audio is past retention
+                continue
             if msg.message_type == 'voice':
-                voice_messages.append({
-                    'speaker': msg.username,
-                    'audio_data': msg.audio_data,
-                    'language': msg.language,
-                    'timestamp': msg.timestamp.isoformat(),
-                    'message_id': msg.message_uuid,
-                    'source_language': msg.language,
-                    'format': 'audio/webm'
-                })
+                voice_messages.append(dict(
+                    history_entry(msg),
+                    audio_data=voice_audio_payload(msg, audio_transport),
+                    audio_encoding=audio_transport
+                ))
             else:
-                text_messages.append({
-                    'id': msg.message_uuid,
-                    'username': msg.username,
-                    'message': msg.message,
-                    'timestamp': msg.timestamp.isoformat(),
-                    'language': msg.language
-                })
+                entry = history_entry(msg, translations)
+                if language in entry['translations']:
+                    entry['translated_text'] = entry['translations'][language]
+                text_messages.append(entry)
         
         if text_messages:
-            print(f"[DB] Sending {len(text_messages)} text messages to client")
             emit('chat_history', {'messages': text_messages})
         
         if voice_messages:
-            print(f"[DB] Sending {len(voice_messages)} voice messages to client")
             for voice_msg in voice_messages:
                 emit('voice_message', voice_msg, room=request.sid)
-        
-        if not text_messages and not voice_messages:
-            print(f"[DB] No chat history found for room {room_id}")
+    
+    # The joiner gets the full list once; everyone else only gets the delta
+    emit('room_users', {'users': active_rooms.members(room_id)})
     
     # Only announce user joins for regular circles, not Translation Bot rooms
     if not is_bot_mode:
         emit('user_joined', {
             'username': username,
             'language': language,
-            'users': active_rooms[room_id]
+            'sid': request.sid,
+            'participant_count': active_rooms.count(room_id)
         }, room=room_id)
 
+@socketio.on('load_history')
+@instrument_handler('load_history')
+def handle_load_history(data):
+    user_info = user_sessions.get(request.sid)
+    if not user_info:
+        emit('error', {'message': 'User not authenticated'})
+        return
+    
+    flush_pending_writes()
+    try:
+        with app.app_context():
+            messages, next_cursor = chat_history.load_page(
+                user_info['room_id'],
+                before=data.get('before'),
+                limit=data.get('limit', chat_history.DEFAULT_PAGE_SIZE),
+                archive=chat_archive
+            )
+            translations = chat_history.load_translations(messages)
+            entries = [history_entry(msg, translations) for msg in messages]
+    except ValueError as e:
+        emit('error', {'message': str(e)})
+        return
+    
+    emit('history', {
+        'messages': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        'before': data.get('before')
+    })
+
+@socketio.on('load_voice_audio')
+@instrument_handler('load_voice_audio')
+def handle_load_voice_audio(data):
+    user_info = user_sessions.get(request.sid)
+    if not user_info:
+        return
+    
+    transport = user_info.get('audio_transport', 'base64')
+    flush_pending_writes()
+    with app.app_context():
+        msg = ChatMessage.query.filter_by(
+            message_uuid=data['message_id'],
+            room_id=user_info['room_id'],
+            message_type='voice'
+        ).first()
+        audio = voice_audio_payload(msg, transport) if msg else None
+    
+    if audio is None:
+        emit('error', {'message': 'Audio not found'})
+        return
+    
+    emit('voice_audio', {
+        'message_id': data['message_id'],
+        'audio_data': audio,
+        'audio_encoding': transport
+    })
+
+@socketio.on('connect')
+@instrument_handler('connect')
+def handle_connect(auth=None):
+    connected_sids.add(request.sid)
+
 @socketio.on('disconnect')
+@instrument_handler('disconnect')
 def handle_disconnect():
-    user_info = user_sessions.get(request.sid)
+    connected_sids.discard(request.sid)
     
-    for room_id in active_rooms:
-        active_rooms[room_id] = [user for user in active_rooms[room_id] 
-                                if user['sid'] != request.sid]
-        
+    # Drop work still queued on behalf of this client
+    for pool in executor_pools:
+        pool.cancel_owner(request.sid)
+    dubbing_streams.close(request.sid)
+    
+    for room_id, entry in active_rooms.disconnect(request.sid):
+        circle_summary.record_presence(room_id, active_rooms.count(room_id))
+        typing_aggregator.remove(room_id, entry['username'])
         emit('user_left', {
-            'users': active_rooms[room_id]
+            'username': entry['username'],
+            'sid': request.sid,
+            'participant_count': active_rooms.count(room_id)
         }, room=room_id)
     
     if request.sid in user_languages:
@@ -312,59 +1020,168 @@ def handle_disconnect():
         del user_sessions[request.sid]
 
 @socketio.on('audio_data')
+@instrument_handler('audio_data')
 def handle_meeting_audio(data):
     room_id = data['room_id']
     audio_data = data['audio']
     speaker_name = data['username']
     source_language = data.get('source_language', 'en')
+    audio_format = data.get('format', 'audio/webm')
     
     user_info = user_sessions.get(request.sid)
     if not user_info:
         return
     
+    try:
+        audio_bytes = decode_audio_payload(audio_data) if audio_data else b''
+    except Exception as e:
+        log.warning('audio_decode_failed', room_id=room_id, speaker=speaker_name, error=str(e))
+        socketio.emit('error', {'message': 'Invalid audio data'}, room=request.sid)
+        return
+    
     # Validate audio data
-    if not audio_data or len(audio_data) < 100:
+    if len(audio_bytes) < MIN_AUDIO_BYTES:
         socketio.emit('error', {'message': 'Audio data too short or empty'}, room=request.sid)
         return
     
     message_id = f"msg_{int(datetime.now().timestamp() * 1000)}"
+    with tracer.span(message_id, 'blob_store', bytes=len(audio_bytes)):
+        audio_hash = blob_store.put(audio_bytes)
+    audio_length = len(audio_bytes)
     
-    with app.app_context():
-        # Save voice message to database
-        voice_msg = ChatMessage(
+    # Save voice message to database (batched by the write-behind queue)
+    created_at = datetime.utcnow()
+    with tracer.span(message_id, 'db_enqueue'):
+        write_queue.put(
             room_id=room_id,
             username=speaker_name,
             message=None,
             language=source_language,
+            timestamp=created_at,
             message_uuid=message_id,
             message_type='voice',
-            audio_data=audio_data
+            audio_hash=audio_hash,
+            audio_length=audio_length
         )
-        db.session.add(voice_msg)
-        db.session.commit()
-        print(f"[DB] Saved voice message: {speaker_name} in {room_id}")
-        
-        timestamp = voice_msg.timestamp.isoformat()
+    circle_summary.record_message(room_id, speaker_name, 'voice', None, source_language, created_at)
+    
+    timestamp = created_at.isoformat()
     
-    print(f"[AUDIO] Received audio from {speaker_name}, size: {len(audio_data)} chars")
+    log.info('voice_message', sample=LOG_SAMPLE_RATE, room_id=room_id, message_id=message_id, bytes=audio_length)
     
     # Send original voice message to all users in the room
-    socketio.emit('voice_message', {
-        'speaker': speaker_name,
-        'audio_data': audio_data,
-        'language': source_language,
-        'timestamp': timestamp,
-        'message_id': message_id,
-        'source_language': source_language,
-        'format': data.get('format', 'audio/webm')
-    }, room=room_id)
+    with tracer.span(message_id, 'broadcast'):
+        emit_voice_message(room_id, {
+            'speaker': speaker_name,
+            'audio_url': audio_url(audio_hash),
+            'audio_length': audio_length,
+            'language': source_language,
+            'timestamp': timestamp,
+            'message_id': message_id,
+            'source_language': source_language,
+            'format': audio_format
+        }, audio_bytes, audio_data if isinstance(audio_data, str) else None)
+    
+    if (cached_circle_info(room_id) or {}).get('auto_dub'):
+        socketio.start_background_task(predub_voice_message, audio_bytes, speaker_name, source_language, room_id, message_id)
     
     # Translation Bot voice response - only in Translation Bot rooms
     if user_info.get('is_bot_mode', False) and 'translationbot-' in room_id:
         bot_language = user_info.get('bot_language', 'es')
-        socketio.start_background_task(handle_translation_bot_voice_response, audio_data, source_language, bot_language, room_id, speaker_name, message_id)
+        socketio.start_background_task(handle_translation_bot_voice_response, audio_bytes, audio_hash, source_language, bot_language, room_id, speaker_name, message_id)
 
-def process_dubbing_for_user(audio_data, speaker_name, source_language, target_user, message_id=None):
+def take_parked_chunk(result):
+    # Dubbed on this worker: still in dubbing_cache. Otherwise this listener's own parked copy
+    audio = dubbing_cache.get(result['dub_key'])
+    if result.get('parked'):
+        if audio is None:
+            audio = parked_chunks.take(result['parked'])
+            if audio is not None:
+                dubbing_cache.put(result['dub_key'], audio)
+        else:
+            parked_chunks.discard(result['parked'])
+    return audio
+
+def discard_parked_chunk(result):
+    if result.get('parked'):
+        parked_chunks.discard(result['parked'])
+
+def complete_dubbed_chunk(waiter, audio_bytes=None, error=None):
+    chunk = waiter['chunk']
+    
+    def park(result):
+        # Waits for an earlier chunk that may finish on another worker; the stream entry only keeps the name.
+        # Parked per stream and listener, never by content, so one listener's release can't delete another's
+        if 'dub_key' in result:
+            name = ParkedChunks.name(chunk['stream_id'], waiter['sid'], chunk['index'])
+            result = dict(result, parked=parked_chunks.put(name, audio_bytes))
+        return result
+    
+    def release(index, total, result):
+        transport = waiter.get('audio_transport', 'base64')
+        payload = {
+            'speaker': waiter['speaker_name'],
+            'target_language': waiter['target_language'],
+            'message_id': waiter.get('message_id'),
+            'stream_id': chunk['stream_id'],
+            'index': index,
+            'total': total,
+            'final': index == total - 1
+        }
+        if result.get('error'):
+            # The listener skips this part instead of waiting on it forever
+            payload['error'] = result['error']
+        else:
+            audio = audio_bytes if index == chunk['index'] else take_parked_chunk(result)
+            if audio is None:
+                payload['error'] = 'Translated audio expired - please try again'
+            else:
+                payload.update(audio_data=encode_audio_payload(audio, transport), audio_encoding=transport)
+        socketio.emit('translated_audio_chunk', payload, room=waiter['sid'])
+    
+    result = {'error': error} if error else {'dub_key': chunk['dub_key']}
+    dubbing_streams.complete(chunk['stream_id'], waiter['sid'], chunk['index'], result, release, park=park)
+
+def emit_translated_audio(audio_bytes, waiter):
+    if waiter.get('speculative'):
+        # Pre-dub: the result is already in dubbing_cache for whoever asks
+        return
+    if waiter.get('chunk'):
+        complete_dubbed_chunk(waiter, audio_bytes=audio_bytes)
+        return
+    transport = waiter.get('audio_transport', 'base64')
+    socketio.emit('translated_audio', {
+        'audio_data': encode_audio_payload(audio_bytes, transport),
+        'audio_encoding': transport,
+        'speaker': waiter['speaker_name'],
+        'target_language': waiter['target_language'],
+        'message_id': waiter.get('message_id')
+    }, room=waiter['sid'])
+
+def fail_dubbing_waiters(dub_key, error):
+    for waiter in dubbing_cache.finish(dub_key):
+        if waiter.get('speculative'):
+            log.info('predub_failed', room_id=waiter['room_id'], target_language=waiter['target_language'], error=error)
+            continue
+        if waiter.get('chunk'):
+            complete_dubbed_chunk(waiter, error=error)
+            continue
+        socketio.emit('dubbing_error', {
+            'error': error,
+            'speaker': waiter['speaker_name']
+        }, room=waiter['sid'])
+
+def dubbing_waiter_live(waiter):
+    # A pre-dub is worth finishing while anyone is left in its circle
+    if waiter.get('speculative'):
+        return waiter['room_id'] in active_rooms
+    return waiter['sid'] in user_sessions
+
+def process_dubbing_for_user(audio_bytes, speaker_name, source_language, target_user, message_id=None, priority=None,
+                             chunk=None, clip=None):
+    # chunk/clip: one already prepared part of a streamed dub (see stream_dubbing_for_user).
+    # target_user without a sid is a pre-dub for a circle (see predub_voice_message).
+    # Returns 'cached', 'coalesced', 'over_budget', 'queued' or 'rejected'
     if not murf_dub_client:
         socketio.emit('dubbing_error', {
             'error': 'Service unavailable',
@@ -373,155 +1190,388 @@ def process_dubbing_for_user(audio_data, speaker_name, source_language, target_u
         return
     
     target_language = target_user['language']
-    print(f"[DUBBING] Processing for user with target language: {target_language}")
+    target_locale = DUBBING_LANGUAGE_MAP.get(target_language, 'en_US')
     
-    socketio.emit('dubbing_status', {
-        'status': 'processing',
-        'message': f'Translating {speaker_name}\'s voice to {target_language}...',
-        'speaker': speaker_name
-    }, room=target_user['sid'])
+    dub_key = dubbing_key(audio_bytes, target_locale)
+    waiter = {
+        'sid': target_user['sid'],
+        'speaker_name': speaker_name,
+        'target_language': target_language,
+        'message_id': message_id,
+        'audio_transport': session_transport(target_user['sid'])
+    }
+    if chunk:
+        waiter['chunk'] = dict(chunk, dub_key=list(dub_key))
+    speculative = target_user['sid'] is None
+    if speculative:
+        waiter.update(speculative=True, room_id=target_user['room_id'])
+    
+    cached_audio = dubbing_cache.get(dub_key)
+    if cached_audio is not None:
+        log.info('dubbing_cache_hit', sample=LOG_SAMPLE_RATE, audio_hash=dub_key[0][:12], locale=target_locale)
+        with tracer.span(message_id, 'emit', cache_hit=True, target_language=target_language):
+            emit_translated_audio(cached_audio, waiter)
+        return 'cached'
+    
+    # Before trimming: exact for WAV, a size estimate otherwise, and never less than what gets sent
+    if clip is not None and clip.seconds is not None:
+        audio_seconds = clip.seconds
+    else:
+        audio_seconds = estimate_audio_seconds(clip.data if clip is not None else audio_bytes)
+    
+    # Pre-dubs are paid from predub_budget alone, and only while they hold a queued job
+    if speculative and not predub_budget.try_spend(audio_seconds):
+        return 'over_budget'
+    
+    def refund_predub():
+        if speculative:
+            predub_budget.refund(audio_seconds)
+    
+    if not chunk and not waiter.get('speculative'):
+        socketio.emit('dubbing_status', {
+            'status': 'processing',
+            'message': f'Translating {speaker_name}\'s voice to {target_language}...',
+            'speaker': speaker_name
+        }, room=target_user['sid'])
+    
+    if not dubbing_cache.attach(dub_key, waiter):
+        log.info('dubbing_coalesced', sample=LOG_SAMPLE_RATE, audio_hash=dub_key[0][:12], locale=target_locale)
+        refund_predub()
+        if not speculative and dubbing_cache.promote(dub_key):
+            # The first listener to join a pre-dub makes it real work, paid from the interactive budget
+            dubbing_scheduler.charge(audio_seconds)
+        return 'coalesced'
+    
+    # A job for this key may have finished between the cache check and attach
+    cached_audio = dubbing_cache.get(dub_key)
+    if cached_audio is not None:
+        refund_predub()
+        for cached_waiter in dubbing_cache.finish(dub_key):
+            emit_translated_audio(cached_audio, cached_waiter)
+        return 'cached'
     
     def create_dubbing():
-        temp_file_path = None
+        # Nobody left to deliver to, e.g. every listener disconnected while queued
+        if not any(dubbing_waiter_live(job_waiter) for job_waiter in dubbing_cache.waiters(dub_key)):
+            drop_dubbing()
+            return
+        
+        # Time spent behind the scheduler and the upload pool
+        tracer.record(message_id, 'queue_wait', queued_at, time.time(), priority=priority)
+        # Trim and shrink the clip in memory here on the pool, not on the socket handler;
+        # silent clips never cost a job
+        job_clip = clip
+        if job_clip is None:
+            try:
+                with tracer.span(message_id, 'audio_prepare', bytes=len(audio_bytes)):
+                    job_clip = prepare_for_dubbing(audio_bytes)
+            except NoSpeechError:
+                for job_waiter in dubbing_cache.finish(dub_key):
+                    handle_murf_error('SPEECH_NOT_PRESENT', job_waiter['speaker_name'], job_waiter['sid'], job_waiter)
+                return
         try:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                audio_bytes = base64.b64decode(audio_data)
-                temp_file.write(audio_bytes)
-                temp_file.flush()
-            
-            target_locale = DUBBING_LANGUAGE_MAP.get(target_language, 'en_US')
-            print(f"[DUBBING] Using target locale: {target_locale} for language: {target_language}")
+            webhook_options = {}
+            if MURF_WEBHOOK_URL:
+                webhook_options = {'webhook_url': MURF_WEBHOOK_URL, 'webhook_secret': WEBHOOK_SECRET}
             
-            with open(temp_file_path, "rb") as audio_file:
+            file_name = f"voice_{speaker_name}_{int(datetime.now().timestamp())}"
+            with timed_call('murf', 'create_job'), tracer.span(message_id, 'job_create', locale=target_locale):
                 response = murf_dub_client.dubbing.jobs.create(
                     target_locales=[target_locale],
-                    file_name=f"voice_{speaker_name}_{int(datetime.now().timestamp())}",
-                    file=audio_file,
-                    priority="LOW"
+                    file_name=file_name,
+                    file=(f"{file_name}.{job_clip.extension}", job_clip.data, job_clip.mimetype),
+                    priority="LOW",
+                    request_options=MURF_REQUEST_OPTIONS,
+                    **webhook_options
                 )
+            
+            if hasattr(response, 'job_id'):
+                pending_jobs[response.job_id] = {
+                    'user_sid': target_user['sid'],
+                    'speaker_name': speaker_name,
+                    'target_language': target_language,
+                    'status': 'processing',
+                    'created_at': datetime.now().isoformat(),
+                    'message_id': message_id,
+                    'dub_key': dub_key,
+                    'created_ts': time.time()
+                }
                 
-                if hasattr(response, 'job_id'):
-                    pending_jobs[response.job_id] = {
-                        'user_sid': target_user['sid'],
-                        'speaker_name': speaker_name,
-                        'target_language': target_language,
-                        'status': 'processing',
-                        'created_at': datetime.now().isoformat(),
-                        'message_id': message_id
-                    }
-                    
-                    print(f"[DUBBING] Stored job info: {pending_jobs[response.job_id]}")
-                    
-                    print(f"[DUBBING] Job created: {response.job_id} for {speaker_name}")
+                log.info('dubbing_job_created', job_id=response.job_id, locale=target_locale, message_id=message_id,
+                         seconds=job_clip.seconds)
+                for job_waiter in dubbing_cache.waiters(dub_key):
+                    if job_waiter.get('chunk') or job_waiter.get('speculative'):
+                        continue
                     socketio.emit('dubbing_status', {
                         'status': 'processing',
                         'message': f'Translating {speaker_name}\'s voice...',
                         'speaker': speaker_name,
                         'job_id': response.job_id
-                    }, room=target_user['sid'])
-                    
-                    socketio.start_background_task(poll_job_status, response.job_id)
-                else:
-                    socketio.emit('dubbing_error', {
-                        'error': 'Failed to create translation job',
-                        'speaker': speaker_name
-                    }, room=target_user['sid'])
-                    
+                    }, room=job_waiter['sid'])
+                
+                schedule_job_poll(response.job_id)
+            else:
+                refund_predub()
+                fail_dubbing_waiters(dub_key, 'Failed to create translation job')
+                
         except Exception as e:
-            socketio.emit('dubbing_error', {
-                'error': 'Dubbing service unavailable',
+            category, _ = classify_murf_error(e)
+            if category in ('rate_limited', 'credits_exhausted'):
+                # Hold the whole queue back rather than failing every job behind this one
+                dubbing_scheduler.pause(DUBBING_PROVIDER_BACKOFF_SECONDS)
+            refund_predub()
+            for job_waiter in dubbing_cache.finish(dub_key):
+                handle_murf_error(e, job_waiter['speaker_name'], job_waiter['sid'], job_waiter)
+    
+    def create_dubbing_done(future):
+        # Expired in the queue before it could start
+        if future.cancelled() or isinstance(future.exception(), ExecutorTimeout):
+            refund_predub()
+            fail_dubbing_waiters(dub_key, 'Dubbing service busy - please try again')
+    
+    def start_dubbing():
+        try:
+            dubbing_pool.submit(create_dubbing).add_done_callback(create_dubbing_done)
+        except ExecutorBusy:
+            refund_predub()
+            fail_dubbing_waiters(dub_key, 'Dubbing service busy - please try again')
+    
+    def drop_dubbing():
+        # Everyone who asked for it has gone
+        refund_predub()
+        dubbing_cache.finish(dub_key)
+    
+    def report_queue_position(position):
+        for job_waiter in dubbing_cache.waiters(dub_key):
+            if job_waiter.get('speculative'):
+                continue
+            socketio.emit('dubbing_status', {
+                'status': 'queued',
+                'position': position,
+                'message': f'Waiting to translate {speaker_name}\'s voice (position {position} in queue)',
                 'speaker': speaker_name
-            }, room=target_user['sid'])
-        finally:
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            }, room=job_waiter['sid'])
     
-    socketio.start_background_task(create_dubbing)
+    if priority is None:
+        priority = PRIORITY_INTERACTIVE if audio_seconds <= DUBBING_SHORT_CLIP_SECONDS else PRIORITY_NORMAL
+    
+    queued_at = time.time()
+    try:
+        dubbing_scheduler.submit(
+            start_dubbing,
+            room_id=target_user.get('room_id') or (user_sessions.get(target_user['sid']) or {}).get('room_id'),
+            user=target_user['sid'] or 'predub',
+            priority=priority,
+            # Pre-dubs stay out of the interactive budget unless a listener joins them
+            cost=0 if speculative else audio_seconds,
+            is_live=lambda: any(dubbing_waiter_live(job_waiter) for job_waiter in dubbing_cache.waiters(dub_key)),
+            on_position=report_queue_position,
+            on_drop=drop_dubbing
+        )
+    except BudgetExceeded as e:
+        refund_predub()
+        fail_dubbing_waiters(dub_key, str(e))
+        return 'rejected'
+    except ExecutorBusy:
+        refund_predub()
+        fail_dubbing_waiters(dub_key, 'Dubbing service busy - please try again')
+        return 'rejected'
+    return 'queued'
 
-def poll_job_status(job_id):
-    import time
-    max_attempts = 30
-    attempt = 0
+def predub_voice_message(audio_bytes, speaker_name, source_language, room_id, message_id=None):
+    # One bulk-priority job per reading language in the circle, so a later
+    # request_dub is answered from dubbing_cache (or joins the running job)
+    languages = {language for language in active_rooms.languages(room_id) - {source_language}
+                 if language in DUBBING_LANGUAGE_MAP}
+    if not languages or not murf_dub_client:
+        return
+    
+    try:
+        with tracer.span(message_id, 'audio_prepare', bytes=len(audio_bytes)):
+            clip = prepare_for_dubbing(audio_bytes)
+    except NoSpeechError:
+        predub_jobs.inc(result='no_speech')
+        return
+    seconds = clip.seconds if clip.seconds is not None else estimate_audio_seconds(clip.data)
+    if seconds > PREDUB_MAX_SECONDS:
+        predub_jobs.inc(result='too_long')
+        return
+    
+    for language in sorted(languages):
+        result = process_dubbing_for_user(audio_bytes, speaker_name, source_language,
+                                          {'sid': None, 'language': language, 'room_id': room_id},
+                                          message_id, priority=PRIORITY_BULK, clip=clip)
+        predub_jobs.inc(result='started' if result == 'queued' else result)
+        if result == 'over_budget':
+            log.info('predub_over_budget', sample=LOG_SAMPLE_RATE, room_id=room_id, seconds=seconds)
+            return
+
+def stream_dubbing_for_user(audio_bytes, speaker_name, source_language, target_user, message_id=None):
+    # Each chunk is its own job, so the first part plays while the rest are still being dubbed
+    if not murf_dub_client:
+        socketio.emit('dubbing_error', {
+            'error': 'Service unavailable',
+            'speaker': speaker_name
+        }, room=target_user['sid'])
+        return
+    
+    try:
+        with tracer.span(message_id, 'audio_split', bytes=len(audio_bytes)) as span:
+            clips = split_for_dubbing(audio_bytes)
+            span['chunks'] = len(clips)
+    except NoSpeechError:
+        handle_murf_error('SPEECH_NOT_PRESENT', speaker_name, target_user['sid'])
+        return
+    
+    stream_id = uuid.uuid4().hex
+    dubbing_streams.open(stream_id, target_user['sid'], len(clips))
+    socketio.emit('dubbing_status', {
+        'status': 'processing',
+        'message': f'Translating {speaker_name}\'s voice to {target_user["language"]}...',
+        'speaker': speaker_name,
+        'stream_id': stream_id,
+        'chunks': len(clips)
+    }, room=target_user['sid'])
     
-    while attempt < max_attempts:
+    for index, clip in enumerate(clips):
+        process_dubbing_for_user(clip.data, speaker_name, source_language, target_user, message_id,
+                                 chunk={'stream_id': stream_id, 'index': index}, clip=clip)
+
+def deliver_dubbed_audio(job_info, download_url):
+    # Download and hand the dubbed audio to everyone waiting on this job
+    trace_id = job_info.get('message_id')
+    for retry in range(3):
         try:
-            if murf_dub_client and job_id in pending_jobs:
-                print(f"[DUBBING] Polling job {job_id}, attempt {attempt + 1}")
-                status_response = murf_dub_client.dubbing.jobs.get_status(job_id=job_id)
-                print(f"[DUBBING] Status response: {status_response}")
-                
-                if hasattr(status_response, 'status'):
-                    job_info = pending_jobs[job_id]
-                    
-                    print(f"[DUBBING] Job {job_id} status: {status_response.status}")
-                    if status_response.status == 'COMPLETED':
-                        if hasattr(status_response, 'download_details') and status_response.download_details:
-                            download_url = status_response.download_details[0].download_url
-                            print(f"[DUBBING] Job {job_id} completed, downloading audio")
-                            
-                            # Download and convert audio to base64 for browser playback
-                            download_success = False
-                            for retry in range(3):
-                                try:
-                                    import requests
-                                    audio_response = requests.get(download_url, timeout=30)
-                                    if audio_response.status_code == 200:
-                                        audio_base64 = base64.b64encode(audio_response.content).decode('utf-8')
-                                        
-                                        socketio.emit('translated_audio', {
-                                            'audio_data': audio_base64,
-                                            'speaker': job_info['speaker_name'],
-                                            'target_language': job_info['target_language'],
-                                            'message_id': job_info.get('message_id')
-                                        }, room=job_info['user_sid'])
-                                        download_success = True
-                                        break
-                                    else:
-                                        print(f"Download failed with status: {audio_response.status_code}")
-                                except Exception as e:
-                                    print(f"Audio download error (attempt {retry + 1}): {e}")
-                                    if retry < 2:
-                                        time.sleep(2)
-                            
-                            if not download_success:
-                                socketio.emit('dubbing_error', {
-                                    'error': 'Network error - please try again',
-                                    'speaker': job_info['speaker_name']
-                                }, room=job_info['user_sid'])
-                        
-                        del pending_jobs[job_id]
-                        break
-                    elif status_response.status == 'FAILED':
-                        socketio.emit('dubbing_error', {
-                            'error': 'Translation job failed',
-                            'speaker': job_info['speaker_name']
-                        }, room=job_info['user_sid'])
-                        del pending_jobs[job_id]
-                        break
-            
-            print(f"[DUBBING] Waiting 5 seconds before next poll...")
-            time.sleep(5)
-            attempt += 1
-            
+            with timed_call('murf', 'download'), tracer.span(trace_id, 'download', attempt=retry + 1) as span:
+                audio_response = requests.get(download_url, timeout=30)
+                span['status_code'] = audio_response.status_code
+            if audio_response.status_code == 200:
+                dubbing_cache.put(job_info['dub_key'], audio_response.content)
+                with tracer.span(trace_id, 'emit') as span:
+                    waiters = dubbing_cache.finish(job_info['dub_key'])
+                    for waiter in waiters:
+                        emit_translated_audio(audio_response.content, waiter)
+                    span['listeners'] = len(waiters)
+                return
+            else:
+                log.warning('dubbing_download_failed', status_code=audio_response.status_code, attempt=retry + 1)
         except Exception as e:
-            print(f"Job polling error: {e}")
-            error_str = str(e).lower()
-            
-            # Handle network errors and timeouts
-            if any(keyword in error_str for keyword in ["504", "gateway timeout", "timeout", "name resolution", "network", "connection"]):
-                print(f"Network/timeout error, retrying in 15 seconds...")
-                time.sleep(15)
-                attempt += 1
-                continue
-            
-            if job_id in pending_jobs:
-                job_info = pending_jobs[job_id]
-                handle_murf_error(e, job_info['speaker_name'], job_info['user_sid'])
-                del pending_jobs[job_id]
-            break
+            log.warning('dubbing_download_failed', error=str(e), attempt=retry + 1)
+            if retry < 2:
+                socketio.sleep(2)
+    
+    fail_dubbing_waiters(job_info['dub_key'], 'Network error - please try again')
+
+def complete_dubbing_job(job_id, status, download_url=None, failure_reason=None):
+    # Webhook and poller race to finish a job; whoever pops it first handles it
+    job_info = pending_jobs.pop(job_id, None)
+    if not job_info:
+        return False
+    
+    log.info('dubbing_job_finished', job_id=job_id, status=status)
+    if job_info.get('created_ts'):
+        # From job creation until we learned the provider was done
+        tracer.record(job_info.get('message_id'), 'provider_complete', job_info['created_ts'], time.time(),
+                      job_id=job_id, status=status)
+    if status == 'COMPLETED' and download_url:
+        try:
+            download_pool.submit(deliver_dubbed_audio, job_info, download_url)
+        except ExecutorBusy:
+            fail_dubbing_waiters(job_info['dub_key'], 'Dubbing service busy - please try again')
+    elif failure_reason:
+        for waiter in dubbing_cache.finish(job_info['dub_key']):
+            handle_murf_error(failure_reason, waiter['speaker_name'], waiter['sid'], waiter)
+    else:
+        fail_dubbing_waiters(job_info['dub_key'], 'Translation job failed')
+    return True
+
+def schedule_job_poll(job_id):
+    # Each worker polls the jobs it created; pending_jobs itself stays shared
+    # so the webhook can land on any worker
+    first_delay = JOB_POLL_WEBHOOK_GRACE if MURF_WEBHOOK_URL else JOB_POLL_INITIAL_DELAY
+    job_poll_state[job_id] = {
+        'attempts': 0,
+        'delay': JOB_POLL_INITIAL_DELAY,
+        'next_poll_at': time.time() + first_delay
+    }
+    ensure_job_poller()
+
+def ensure_job_poller():
+    global job_poller_running
+    with job_poller_lock:
+        if job_poller_running:
+            return
+        job_poller_running = True
+    socketio.start_background_task(poll_pending_jobs)
+
+def poll_pending_jobs():
+    # Single shared poller: one sweep over every outstanding job per wake-up
+    global job_poller_running
+    while True:
+        now = time.time()
+        for job_id, poll_state in list(job_poll_state.items()):
+            if job_id not in pending_jobs:
+                # Finished elsewhere, e.g. by a webhook delivered to another worker
+                job_poll_state.pop(job_id, None)
+            elif poll_state['next_poll_at'] <= now:
+                poll_job_status(job_id)
+        
+        with job_poller_lock:
+            if not job_poll_state:
+                job_poller_running = False
+                return
+        
+        next_poll_at = min((poll_state['next_poll_at'] for poll_state in list(job_poll_state.values())), default=now)
+        socketio.sleep(min(max(next_poll_at - time.time(), 0.5), JOB_POLL_MAX_DELAY))
+
+def poll_job_status(job_id):
+    job_info = pending_jobs.get(job_id)
+    poll_state = job_poll_state.get(job_id)
+    if not job_info or not poll_state or not murf_dub_client:
+        job_poll_state.pop(job_id, None)
+        return
+    
+    poll_state['attempts'] += 1
+    try:
+        with timed_call('murf', 'get_status'), tracer.span(job_info.get('message_id'), 'poll', job_id=job_id, attempt=poll_state['attempts']) as span:
+            status_response = murf_dub_client.dubbing.jobs.get_status(job_id=job_id, request_options=MURF_REQUEST_OPTIONS)
+            span['status'] = getattr(status_response, 'status', None)
+    except Exception as e:
+        log.warning('dubbing_poll_failed', job_id=job_id, attempt=poll_state['attempts'], error=str(e))
+        error_str = str(e).lower()
+        
+        # Handle network errors and timeouts by backing off harder
+        if poll_state['attempts'] < JOB_POLL_MAX_ATTEMPTS and any(keyword in error_str for keyword in ["504", "gateway timeout", "timeout", "name resolution", "network", "connection"]):
+            poll_state['delay'] = min(poll_state['delay'] * 2, JOB_POLL_MAX_DELAY)
+            poll_state['next_poll_at'] = time.time() + poll_state['delay']
+            return
+        
+        job_poll_state.pop(job_id, None)
+        job_info = pending_jobs.pop(job_id, None)
+        if job_info:
+            for waiter in dubbing_cache.finish(job_info['dub_key']):
+                handle_murf_error(e, waiter['speaker_name'], waiter['sid'], waiter)
+        return
+    
+    status = getattr(status_response, 'status', None)
+    log.debug('dubbing_poll', sample=LOG_SAMPLE_RATE, job_id=job_id, status=status, attempt=poll_state['attempts'])
+    
+    if status in ('COMPLETED', 'FAILED'):
+        job_poll_state.pop(job_id, None)
+        download_details = getattr(status_response, 'download_details', None) or []
+        download_url = next((detail.download_url for detail in download_details if detail.download_url), None)
+        complete_dubbing_job(job_id, status, download_url, getattr(status_response, 'failure_reason', None))
+    elif poll_state['attempts'] >= JOB_POLL_MAX_ATTEMPTS:
+        job_poll_state.pop(job_id, None)
+        job_info = pending_jobs.pop(job_id, None)
+        if job_info:
+            fail_dubbing_waiters(job_info['dub_key'], 'Translation timed out - please try again')
+    else:
+        poll_state['delay'] = min(poll_state['delay'] * JOB_POLL_BACKOFF, JOB_POLL_MAX_DELAY)
+        poll_state['next_poll_at'] = time.time() + poll_state['delay']
 
 @socketio.on('send_message')
+@instrument_handler('send_message')
 def handle_send_message(data):
     user_info = user_sessions.get(request.sid)
     if not user_info:
@@ -540,35 +1590,80 @@ def handle_send_message(data):
     message_language = data.get('language') or user_info.get('circle_language', user_info.get('language', 'en'))
     message_id = str(uuid.uuid4())
     
-    with app.app_context():
-        # Save message to database
-        chat_msg = ChatMessage(
+    # Save message to database (batched by the write-behind queue)
+    created_at = datetime.utcnow()
+    with tracer.span(message_id, 'db_enqueue'):
+        write_queue.put(
             room_id=room_id,
             username=username,
             message=message_text,
             language=message_language,
-            message_uuid=message_id
+            timestamp=created_at,
+            message_uuid=message_id,
+            message_type='text'
         )
-        db.session.add(chat_msg)
-        db.session.commit()
-        print(f"[DB] Saved message: {username} in {room_id}: {message_text}")
-        
-        message = {
-            'id': message_id,
-            'username': username,
-            'message': message_text,
-            'timestamp': chat_msg.timestamp.isoformat(),
-            'language': message_language
-        }
+    circle_summary.record_message(room_id, username, 'text', message_text, message_language, created_at)
+    log.info('chat_message', sample=LOG_SAMPLE_RATE, room_id=room_id, message_id=message_id, length=len(message_text))
     
-    emit('new_message', message, room=room_id)
+    message = {
+        'id': message_id,
+        'username': username,
+        'message': message_text,
+        'timestamp': created_at.isoformat(),
+        'language': message_language
+    }
+    
+    with tracer.span(message_id, 'broadcast'):
+        broadcast_batcher.send(room_id, message)
     
     # Translation Bot response - only in Translation Bot rooms
     if is_bot_mode and 'translationbot-' in room_id:
         bot_language = user_info.get('bot_language', 'es')
-        socketio.start_background_task(handle_translation_bot_response, message_text, message_language, bot_language, room_id)
+        try:
+            handle_translation_bot_response(message_text, message_language, bot_language, room_id, owner=request.sid)
+        except ExecutorBusy:
+            emit('error', {'message': 'Translation service busy - please try again'})
+        return
+    
+    # Translate once per language present in the room, in parallel
+    for target_language in active_rooms.languages(room_id) - {message_language}:
+        try:
+            translation_pool.submit(fan_out_translation, room_id, message_id, message_text, message_language, target_language)
+        except ExecutorBusy:
+            # Clients can still ask for this message with translate_text
+            log.warning('translation_fan_out_busy', room_id=room_id, message_id=message_id, target_language=target_language)
+
+def fan_out_translation(room_id, message_id, text, source_language, target_language):
+    try:
+        with tracer.span(message_id, 'translate', target_language=target_language):
+            translated_text = translate_message(text, source_language, target_language)
+    except Exception as e:
+        # Clients can still ask for this message with translate_text
+        log.warning('translation_fan_out_failed', message_id=message_id, target_language=target_language, error=str(e))
+        return
+    
+    def emit_translation():
+        sent_at = time.time()
+        socketio.emit('translated_text', {
+            'message_id': message_id,
+            'translated_text': translated_text,
+            'audio_data': None,
+            'target_language': target_language
+        }, room=language_room(room_id, target_language))
+        tracer.record(message_id, 'emit', sent_at, time.time(), target_language=target_language)
+    
+    # After the message itself, which may still be waiting for its batch frame
+    broadcast_batcher.follow(room_id, emit_translation)
+    
+    translation_queue.put(
+        message_uuid=message_id,
+        language=target_language,
+        translated_text=translated_text,
+        created_at=datetime.utcnow()
+    )
 
 @socketio.on('typing')
+@instrument_handler('typing')
 def handle_typing(data):
     user_info = user_sessions.get(request.sid)
     if not user_info:
@@ -576,22 +1671,19 @@ def handle_typing(data):
     
     room_id = user_info['room_id']
     username = user_info['username']
-    is_typing = data.get('typing', False)
-    
-    emit('user_typing', {
-        'username': username,
-        'typing': is_typing
-    }, room=room_id, include_self=False)
+    typing_aggregator.update(room_id, username, bool(data.get('typing', False)))
 
 @socketio.on('get_pending_jobs')
+@instrument_handler('get_pending_jobs')
 def handle_get_pending_jobs():
     user_info = user_sessions.get(request.sid)
     if not user_info:
         return
     
     user_jobs = []
-    for job_id, job_info in pending_jobs.items():
-        if job_info['user_sid'] == request.sid:
+    for job_id, job_info in list(pending_jobs.items()):
+        waiter_sids = [waiter['sid'] for waiter in dubbing_cache.waiters(job_info['dub_key'])]
+        if request.sid in waiter_sids:
             user_jobs.append({
                 'job_id': job_id,
                 'speaker': job_info['speaker_name'],
@@ -602,9 +1694,10 @@ def handle_get_pending_jobs():
     emit('pending_jobs_list', {'jobs': user_jobs})
 
 @socketio.on('request_dub')
+@instrument_handler('request_dub')
 def handle_request_dub(data):
     message_id = data['message_id']
-    audio_data = data['audio_data']
+    audio_data = data.get('audio_data')
     speaker_name = data['speaker_name']
     source_language = data['source_language']
     target_language = data['target_language']  # Use target language from frontend
@@ -613,20 +1706,45 @@ def handle_request_dub(data):
     if not user_info:
         return
     
-    print(f"[DUB REQUEST] User {user_info['username']} requested dubbing:")
-    print(f"  - Speaker: {speaker_name}")
-    print(f"  - Source Language: {source_language}")
-    print(f"  - Target Language: {target_language}")
-    print(f"  - Message ID: {message_id}")
-    print(f"  - Audio Data Size: {len(audio_data)} chars")
+    log.info('dub_requested', sample=LOG_SAMPLE_RATE, message_id=message_id, source_language=source_language,
+             target_language=target_language)
+    
+    # Binary clients may send only the message_id; the audio is already stored
+    try:
+        if audio_data:
+            audio_bytes = decode_audio_payload(audio_data)
+        else:
+            flush_pending_writes()
+            with app.app_context():
+                msg = ChatMessage.query.filter_by(message_uuid=message_id).first()
+                audio_bytes = voice_audio_payload(msg, 'binary') if msg else None
+    except Exception:
+        audio_bytes = None
+    
+    if not audio_bytes:
+        emit('dubbing_error', {
+            'error': 'Invalid audio data',
+            'speaker': speaker_name
+        })
+        return
     
     # Process dubbing for the requesting user only
-    process_dubbing_for_user(audio_data, speaker_name, source_language, {
-        'sid': request.sid,
-        'language': target_language
-    }, message_id)
+    target_user = {'sid': request.sid, 'language': target_language}
+    if data.get('stream'):
+        # Splitting decodes the whole clip; do it on the pool so the handler only enqueues
+        try:
+            dubbing_pool.submit(stream_dubbing_for_user, audio_bytes, speaker_name, source_language, target_user, message_id,
+                                owner=request.sid)
+        except ExecutorBusy:
+            emit('dubbing_error', {
+                'error': 'Dubbing service busy - please try again',
+                'speaker': speaker_name
+            })
+    else:
+        process_dubbing_for_user(audio_bytes, speaker_name, source_language, target_user, message_id)
 
 @socketio.on('set_circle_language')
+@instrument_handler('set_circle_language')
 def handle_set_circle_language(data):
     language = data['language']
     user_info = user_sessions.get(request.sid)
@@ -635,25 +1753,33 @@ def handle_set_circle_language(data):
         emit('error', {'message': 'User not authenticated'})
         return
     
+    # Move the user into the language group that receives fan-out translations
+    leave_room(language_room(user_info['room_id'], user_info.get('circle_language', user_info['language'])))
+    join_room(language_room(user_info['room_id'], language))
+    
     user_info['circle_language'] = language
     user_sessions[request.sid] = user_info
+    active_rooms.update(request.sid, circle_language=language)
     
-    print(f"[CIRCLE_LANG] User {user_info['username']} set circle language to: {language}")
+    log.info('circle_language_set', room_id=user_info['room_id'], language=language)
     emit('circle_language_updated', {'language': language})
 
 @socketio.on('translate_text')
+@instrument_handler('translate_text')
 def handle_translate_text(data):
-    text = data['text']
-    source_language = data.get('source_language', 'en')
-    message_id = data['message_id']
-    
     user_info = user_sessions.get(request.sid)
     if not user_info:
         return
     
     target_language = user_info.get('circle_language', user_info.get('language', 'en'))
     
-    print(f"[TRANSLATE] Text: {text}, Source: {source_language}, Target: {target_language}")
+    if 'messages' in data:
+        translate_text_batch(data['messages'], target_language)
+        return
+    
+    text = data['text']
+    source_language = data.get('source_language', 'en')
+    message_id = data['message_id']
     
     if source_language == target_language:
         emit('translated_text', {
@@ -665,15 +1791,7 @@ def handle_translate_text(data):
         return
     
     try:
-        from deep_translator import GoogleTranslator
-        
-        source_lang = TRANSLATE_LANGUAGE_MAP.get(source_language, 'auto')
-        target_lang = TRANSLATE_LANGUAGE_MAP.get(target_language, 'en')
-        
-        translator = GoogleTranslator(source=source_lang, target=target_lang)
-        translated_text = translator.translate(text)
-        
-        print(f"[TRANSLATE] Success: '{text}' -> '{translated_text}'")
+        translated_text = translation_pool.run(translate_message, text, source_language, target_language, owner=request.sid)
         
         emit('translated_text', {
             'message_id': message_id,
@@ -683,15 +1801,56 @@ def handle_translate_text(data):
         })
         
     except Exception as e:
-        print(f"[TRANSLATE] Failed: {str(e)}")
+        log.warning('translate_text_failed', message_id=message_id, target_language=target_language, error=str(e))
+        error = 'failed'
+        if isinstance(e, ExecutorBusy):
+            error = 'busy'
+        elif isinstance(e, ExecutorTimeout):
+            error = 'timeout'
         emit('translated_text', {
             'message_id': message_id,
             'translated_text': f"Translation failed: {text}",
             'audio_data': None,
-            'target_language': target_language
+            'target_language': target_language,
+            'error': error
         })
 
+def translate_text_batch(messages, target_language):
+    # History backfill: [{message_id, text, source_language}, ...] answered as one provider call per source language
+    groups = {}
+    for item in messages:
+        groups.setdefault(item.get('source_language', 'en'), []).append(item)
+    
+    for source_language, items in groups.items():
+        texts = [item['text'] for item in items]
+        error = None
+        if source_language == target_language:
+            translated = texts
+        else:
+            try:
+                translated = translation_pool.run(translate_messages, texts, source_language, target_language, owner=request.sid)
+            except Exception as e:
+                log.warning('translate_text_batch_failed', target_language=target_language, count=len(items), error=str(e))
+                error = 'failed'
+                if isinstance(e, ExecutorBusy):
+                    error = 'busy'
+                elif isinstance(e, ExecutorTimeout):
+                    error = 'timeout'
+                translated = [f"Translation failed: {text}" for text in texts]
+        
+        for item, translated_text in zip(items, translated):
+            payload = {
+                'message_id': item['message_id'],
+                'translated_text': translated_text,
+                'audio_data': None,
+                'target_language': target_language
+            }
+            if error:
+                payload['error'] = error
+            emit('translated_text', payload)
+
 @socketio.on('leave_circle')
+@instrument_handler('leave_circle')
 def handle_leave_circle():
     user_info = user_sessions.get(request.sid)
     if user_info:
@@ -699,16 +1858,17 @@ def handle_leave_circle():
         username = user_info['username']
         
         leave_room(room_id)
+        leave_room(transport_room(room_id, user_info.get('audio_transport', 'base64')))
+        leave_room(language_room(room_id, user_info.get('circle_language', user_info['language'])))
         
-        # Remove user from active rooms
-        if room_id in active_rooms:
-            active_rooms[room_id] = [user for user in active_rooms[room_id] 
-                                    if user['sid'] != request.sid]
-            
-            # Notify others
+        # Remove user from active rooms and notify others
+        typing_aggregator.remove(room_id, username)
+        if active_rooms.leave(room_id, request.sid):
+            circle_summary.record_presence(room_id, active_rooms.count(room_id))
             emit('user_left', {
                 'username': username,
-                'users': active_rooms[room_id]
+                'sid': request.sid,
+                'participant_count': active_rooms.count(room_id)
             }, room=room_id)
         
         # Clean up session
@@ -718,81 +1878,88 @@ def handle_leave_circle():
             del user_sessions[request.sid]
 
 
-def handle_translation_bot_response(message_text, source_language, bot_language, room_id):
-    import time
-    time.sleep(1)  # Simulate typing delay
+def handle_translation_bot_response(message_text, source_language, bot_language, room_id, owner=None):
+    # Only the translation takes a translation_pool worker; the typing delay is
+    # slept off in a background task. Raises ExecutorBusy when the pool is full
+    started_at = time.time()
     
-    try:
-        if source_language != bot_language:
-            from deep_translator import GoogleTranslator
-            source_lang = TRANSLATE_LANGUAGE_MAP.get(source_language, 'auto')
-            target_lang = TRANSLATE_LANGUAGE_MAP.get(bot_language, 'en')
-            translator = GoogleTranslator(source=source_lang, target=target_lang)
-            bot_response = translator.translate(message_text)
-        else:
-            bot_response = message_text
-        
-        bot_message_id = str(uuid.uuid4())
-        
-        with app.app_context():
-            # Save bot message to database
-            bot_msg = ChatMessage(
-                room_id=room_id,
-                username='Translation Bot',
-                message=bot_response,
-                language=bot_language,
-                message_uuid=bot_message_id
-            )
-            db.session.add(bot_msg)
-            db.session.commit()
-            
-            bot_message = {
-                'id': bot_message_id,
-                'username': 'Translation Bot',
-                'message': bot_response,
-                'timestamp': bot_msg.timestamp.isoformat(),
-                'language': bot_language
-            }
-        
-        socketio.emit('new_message', bot_message, room=room_id)
-        
-    except Exception as e:
-        print(f"Translation Bot text response error: {e}")
+    def reply(bot_response):
+        delay = max(BOT_TYPING_DELAY_SECONDS - (time.time() - started_at), 0)
+        socketio.start_background_task(send_translation_bot_message, bot_response, bot_language, room_id, delay)
+    
+    if source_language == bot_language:
+        reply(message_text)
+        return
+    
+    def translated(future):
+        if future.cancelled():
+            return
+        try:
+            reply(future.result())
+        except Exception as e:
+            log.warning('translation_bot_failed', room_id=room_id, error=str(e))
+    
+    translation_pool.submit(translate_message, message_text, source_language, bot_language, owner=owner).add_done_callback(translated)
 
-def handle_translation_bot_voice_response(audio_data, source_language, bot_language, room_id, original_speaker, original_message_id):
-    import time
-    time.sleep(1.5)  # Simulate processing delay
+def send_translation_bot_message(bot_response, bot_language, room_id, delay=0):
+    socketio.sleep(delay)  # Simulate typing delay
+    bot_message_id = str(uuid.uuid4())
     
-    print(f"[TRANSLATION_BOT] Processing voice message from {original_speaker}")
-    print(f"[TRANSLATION_BOT] Audio data size: {len(audio_data)} chars")
+    # Save bot message to database
+    created_at = datetime.utcnow()
+    write_queue.put(
+        room_id=room_id,
+        username='Translation Bot',
+        message=bot_response,
+        language=bot_language,
+        timestamp=created_at,
+        message_uuid=bot_message_id,
+        message_type='text'
+    )
+    circle_summary.record_message(room_id, 'Translation Bot', 'text', bot_response, bot_language, created_at)
+    
+    bot_message = {
+        'id': bot_message_id,
+        'username': 'Translation Bot',
+        'message': bot_response,
+        'timestamp': created_at.isoformat(),
+        'language': bot_language
+    }
+    
+    broadcast_batcher.send(room_id, bot_message)
+
+def handle_translation_bot_voice_response(audio_bytes, audio_hash, source_language, bot_language, room_id, original_speaker, original_message_id):
+    socketio.sleep(1.5)  # Simulate processing delay
     
     bot_message_id = f"bot_voice_{int(datetime.now().timestamp() * 1000)}"
     
     # Always echo back the original audio first (so it's playable)
-    with app.app_context():
-        bot_voice_msg = ChatMessage(
-            room_id=room_id,
-            username='Translation Bot',
-            message=None,
-            language=source_language,
-            message_uuid=bot_message_id,
-            message_type='voice',
-            audio_data=audio_data
-        )
-        db.session.add(bot_voice_msg)
-        db.session.commit()
-        timestamp = bot_voice_msg.timestamp.isoformat()
+    created_at = datetime.utcnow()
+    write_queue.put(
+        room_id=room_id,
+        username='Translation Bot',
+        message=None,
+        language=source_language,
+        timestamp=created_at,
+        message_uuid=bot_message_id,
+        message_type='voice',
+        audio_hash=audio_hash,
+        audio_length=len(audio_bytes)
+    )
+    circle_summary.record_message(room_id, 'Translation Bot', 'voice', None, source_language, created_at)
+    timestamp = created_at.isoformat()
     
     # Emit the original audio as Translation Bot message (playable with dub option)
-    socketio.emit('voice_message', {
+    emit_voice_message(room_id, {
         'speaker': 'Translation Bot',
-        'audio_data': audio_data,
+        'audio_url': audio_url(audio_hash),
+        'audio_length': len(audio_bytes),
         'language': source_language,
         'timestamp': timestamp,
         'message_id': bot_message_id,
         'source_language': source_language,
         'format': 'audio/webm'
-    }, room=room_id)
+    }, audio_bytes)
 
 
 
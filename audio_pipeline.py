@@ -0,0 +1,219 @@
+import io
+import sys
+import wave
+from array import array
+
+from blob_store import guess_audio_mimetype
+
+AUDIO_EXTENSIONS = {
+    'audio/webm': 'webm',
+    'audio/ogg': 'ogg',
+    'audio/wav': 'wav',
+    'audio/mpeg': 'mp3',
+    'audio/flac': 'flac',
+    'audio/mp4': 'm4a',
+}
+
+# Smallest PCM the dubbing API takes without losing speech quality
+TARGET_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+SILENCE_RMS = 500
+PADDING_SECONDS = 0.2
+MIN_SPEECH_SECONDS = 0.3
+# A compressed clip this small is container headers with no room for speech
+MIN_COMPRESSED_SPEECH_BYTES = 1024
+# Streaming dubbing cuts at the first pause after CHUNK_SECONDS, and at the
+# quietest frame if nobody pauses before MAX_CHUNK_SECONDS
+CHUNK_SECONDS = 6
+MAX_CHUNK_SECONDS = 12
+MIN_PAUSE_SECONDS = 0.3
+
+
+class NoSpeechError(Exception):
+    pass
+
+
+class PreparedAudio:
+    def __init__(self, data, mimetype, seconds=None):
+        self.data = data
+        self.mimetype = mimetype
+        self.seconds = seconds
+
+    @property
+    def extension(self):
+        return AUDIO_EXTENSIONS.get(self.mimetype, 'bin')
+
+
+def _pcm16_samples(raw, sample_width):
+    if sample_width == 2:
+        samples = array('h', raw)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        return samples
+    if sample_width == 1:
+        return array('h', ((sample - 128) << 8 for sample in raw))
+    if sample_width == 3:
+        return array('h', (int.from_bytes(raw[i:i + 3], 'little', signed=True) >> 8 for i in range(0, len(raw) - 2, 3)))
+    if sample_width == 4:
+        samples = array('i', raw)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        return array('h', (sample >> 16 for sample in samples))
+    raise ValueError(f"Unsupported sample width: {sample_width}")
+
+
+def _downmix(samples, channels):
+    if channels == 1:
+        return samples
+    return array('h', (sum(frame) // channels for frame in zip(*(samples[c::channels] for c in range(channels)))))
+
+
+def _resample(samples, rate, target_rate):
+    if rate <= target_rate or not samples:
+        return samples, rate
+    step = rate / target_rate
+    if step == int(step):
+        # Whole-number ratios (48k, 32k) average each block, which also filters out aliasing
+        step = int(step)
+        return array('h', (sum(samples[i:i + step]) // step for i in range(0, len(samples) - step + 1, step))), target_rate
+    last = len(samples) - 1
+    resampled = array('h')
+    for i in range(int(last / step) + 1):
+        position = i * step
+        index = int(position)
+        following = samples[min(index + 1, last)]
+        resampled.append(int(samples[index] + (following - samples[index]) * (position - index)))
+    return resampled, target_rate
+
+
+def _frame_rms(samples, rate):
+    frame = max(int(rate * FRAME_SECONDS), 1)
+    return frame, [(sum(sample * sample for sample in samples[start:start + frame]) / frame) ** 0.5
+                   for start in range(0, len(samples), frame)]
+
+
+def _trim_silence(samples, rate):
+    frame, levels = _frame_rms(samples, rate)
+    voiced = [index * frame for index, level in enumerate(levels) if level >= SILENCE_RMS]
+    if len(voiced) * FRAME_SECONDS < MIN_SPEECH_SECONDS:
+        raise NoSpeechError('No speech detected in audio')
+    padding = int(rate * PADDING_SECONDS)
+    return samples[max(voiced[0] - padding, 0):voiced[-1] + frame + padding]
+
+
+def _decode_wav(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes), 'rb') as source:
+        channels = source.getnchannels()
+        sample_width = source.getsampwidth()
+        rate = source.getframerate()
+        raw = source.readframes(source.getnframes())
+
+    samples = _downmix(_pcm16_samples(raw, sample_width), channels)
+    return _resample(samples, rate, TARGET_SAMPLE_RATE)
+
+
+def _encode_wav(samples, rate):
+    seconds = len(samples) / rate
+    if sys.byteorder == 'big':
+        samples = array('h', samples)
+        samples.byteswap()
+
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as target:
+        target.setnchannels(1)
+        target.setsampwidth(2)
+        target.setframerate(rate)
+        target.writeframes(samples.tobytes())
+    return PreparedAudio(output.getvalue(), 'audio/wav', seconds)
+
+
+def _prepare_wav(audio_bytes):
+    samples, rate = _decode_wav(audio_bytes)
+    return _encode_wav(_trim_silence(samples, rate), rate)
+
+
+def _cut_points(levels, frame, rate):
+    """Sample offsets to split at: the middle of the first pause after
+    CHUNK_SECONDS, or the quietest frame before MAX_CHUNK_SECONDS."""
+    frames_per_second = rate / frame
+    target = int(CHUNK_SECONDS * frames_per_second)
+    longest = int(MAX_CHUNK_SECONDS * frames_per_second)
+    min_pause = max(int(MIN_PAUSE_SECONDS * frames_per_second), 1)
+
+    cuts = []
+    start = 0
+    index = start + target
+    while len(levels) - start > longest:
+        pause_start = None
+        cut = None
+        while index < min(start + longest, len(levels)):
+            if levels[index] < SILENCE_RMS:
+                if pause_start is None:
+                    pause_start = index
+                if index - pause_start + 1 >= min_pause:
+                    # Keep going to the end of the pause, then cut in its middle
+                    end = index
+                    while end + 1 < len(levels) and levels[end + 1] < SILENCE_RMS:
+                        end += 1
+                    cut = (pause_start + end + 1) // 2
+                    break
+            else:
+                pause_start = None
+            index += 1
+        if cut is None:
+            window = range(start + target, start + longest)
+            cut = min(window, key=lambda position: levels[position])
+        cuts.append(cut * frame)
+        start = cut
+        index = start + target
+    return cuts
+
+
+def split_for_dubbing(audio_bytes):
+    """Split a clip at pauses into chunks that can be dubbed independently.
+
+    Returns a list of PreparedAudio, each trimmed like prepare_for_dubbing.
+    Only PCM WAV can be cut without a codec library; other formats come back
+    as a single chunk. Chunks that turn out to be silence are dropped, and
+    NoSpeechError is raised if nothing is left.
+    """
+    mimetype = guess_audio_mimetype(audio_bytes[:16])
+    if mimetype != 'audio/wav' or audio_bytes[8:12] != b'WAVE':
+        return [prepare_for_dubbing(audio_bytes)]
+    try:
+        samples, rate = _decode_wav(audio_bytes)
+    except (wave.Error, EOFError, ValueError):
+        return [prepare_for_dubbing(audio_bytes)]
+
+    frame, levels = _frame_rms(samples, rate)
+    bounds = [0] + _cut_points(levels, frame, rate) + [len(samples)]
+    chunks = []
+    for start, end in zip(bounds, bounds[1:]):
+        try:
+            chunks.append(_encode_wav(_trim_silence(samples[start:end], rate), rate))
+        except NoSpeechError:
+            continue
+    if not chunks:
+        raise NoSpeechError('No speech detected in audio')
+    return chunks
+
+
+def prepare_for_dubbing(audio_bytes):
+    """Get a clip ready for upload without touching disk.
+
+    PCM WAV is downmixed to mono, resampled to 16 kHz 16-bit and trimmed of
+    leading and trailing silence. Compressed containers (webm/opus, ogg, mp3)
+    can't be decoded without a codec library, so they are only sniffed and
+    uploaded as they are. Raises NoSpeechError for clips that would come back
+    from the API as SPEECH_NOT_PRESENT.
+    """
+    mimetype = guess_audio_mimetype(audio_bytes[:16])
+    if mimetype == 'audio/wav' and audio_bytes[8:12] == b'WAVE':
+        try:
+            return _prepare_wav(audio_bytes)
+        except (wave.Error, EOFError, ValueError):
+            # Float or compressed WAV payloads: leave them to the API
+            pass
+    if len(audio_bytes) < MIN_COMPRESSED_SPEECH_BYTES:
+        raise NoSpeechError('No speech detected in audio')
+    return PreparedAudio(audio_bytes, mimetype)
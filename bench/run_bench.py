@@ -0,0 +1,432 @@
+"""Load benchmark for The Circle backend.
+
+Starts app.py in a subprocess against stub Murf and translator servers, then
+drives simulated Socket.IO clients spread across several circles. They join,
+chat, type, upload voice and request dubs. Writes a JSON report that can be
+kept as a baseline and compared against later runs:
+
+    python bench/run_bench.py --clients 20 --circles 4 --duration 30 --output baseline.json
+    python bench/run_bench.py --compare baseline.json
+"""
+import argparse
+import base64
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from array import array
+
+import requests
+import socketio
+
+from stub_servers import Faults, StubServer, create_murf_stub, create_translator_stub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LANGUAGES = ['en', 'es', 'fr', 'de']
+ACTIONS = [('chat', 0.5), ('typing', 0.25), ('voice', 0.15), ('dub', 0.1)]
+# Events the server never acknowledges to the sender; only counted as sent
+FIRE_AND_FORGET = {'typing'}
+REPORT_VERSION = 1
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def voice_clip(seconds=1.0, rate=16000):
+    # A tone at a random pitch, so every upload is a distinct dubbing key
+    frequency = random.uniform(180, 400)
+    samples = array('h', (int(6000 * math.sin(2 * math.pi * frequency * i / rate)) for i in range(int(rate * seconds))))
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(rate)
+        clip.writeframes(samples.tobytes())
+    return output.getvalue()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)]
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = {}
+        self.latencies = {}
+        self.errors = {}
+
+    def sent_one(self, kind):
+        with self._lock:
+            self.sent[kind] = self.sent.get(kind, 0) + 1
+
+    def completed(self, kind, started):
+        with self._lock:
+            self.latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+
+    def failed(self, kind):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self):
+        events = {}
+        with self._lock:
+            for kind in sorted(set(self.sent) | set(self.latencies)):
+                values = sorted(self.latencies.get(kind, []))
+                sent = self.sent.get(kind, 0)
+                events[kind] = {
+                    'sent': sent,
+                    'completed': len(values),
+                    'errors': self.errors.get(kind, 0),
+                    'lost': None if kind in FIRE_AND_FORGET else max(sent - len(values) - self.errors.get(kind, 0), 0),
+                    'p50_ms': round(percentile(values, 50), 3) if values else None,
+                    'p99_ms': round(percentile(values, 99), 3) if values else None,
+                    'mean_ms': round(sum(values) / len(values), 3) if values else None
+                }
+        return events
+
+
+class SimulatedClient:
+    def __init__(self, index, url, room_id, recorder, think_ms, transport):
+        self.username = f"bench{index}"
+        self.language = LANGUAGES[index % len(LANGUAGES)]
+        self.url = url
+        self.room_id = room_id
+        self.recorder = recorder
+        self.think_ms = think_ms
+        self.transport = transport
+        self.sio = socketio.Client(reconnection=False)
+        self._lock = threading.Lock()
+        self._pending_chats = {}
+        self._pending_voice = []
+        self._pending_dubs = {}
+        self._join_started = None
+        self._voice_from_others = []
+        self._register()
+
+    def _register(self):
+        sio = self.sio
+
+        @sio.on('room_users')
+        def on_room_users(data):
+            if self._join_started is not None:
+                self.recorder.completed('join', self._join_started)
+                self._join_started = None
+
+        @sio.on('new_message')
+        def on_new_message(data):
+            with self._lock:
+                started = self._pending_chats.pop(data.get('message'), None)
+            if started is not None:
+                self.recorder.completed('chat', started)
+
+        @sio.on('new_messages')
+        def on_new_messages(data):
+            for message in data.get('messages', []):
+                on_new_message(message)
+
+        @sio.on('voice_message')
+        def on_voice_message(data):
+            if data.get('speaker') == self.username:
+                with self._lock:
+                    started = self._pending_voice.pop(0) if self._pending_voice else None
+                if started is not None:
+                    self.recorder.completed('voice', started)
+            elif data.get('message_id'):
+                with self._lock:
+                    self._voice_from_others.append(data)
+                    del self._voice_from_others[:-20]
+
+        @sio.on('translated_audio')
+        def on_translated_audio(data):
+            with self._lock:
+                started = self._pending_dubs.pop(data.get('message_id'), None)
+            if started is not None:
+                self.recorder.completed('dub', started)
+
+        @sio.on('dubbing_error')
+        def on_dubbing_error(data):
+            with self._lock:
+                if not self._pending_dubs:
+                    return
+                self._pending_dubs.pop(next(iter(self._pending_dubs)))
+            self.recorder.failed('dub')
+
+    def connect(self):
+        self.sio.connect(self.url, transports=['websocket', 'polling'] if self._has_websocket() else ['polling'])
+        self._join_started = time.perf_counter()
+        self.recorder.sent_one('join')
+        self.sio.emit('join_circle', {
+            'room_id': self.room_id,
+            'username': self.username,
+            'language': self.language,
+            'audio_transport': self.transport,
+            'history_mode': 'paged'
+        })
+
+    @staticmethod
+    def _has_websocket():
+        try:
+            import websocket  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def chat(self):
+        text = f"{self.username} says {random.getrandbits(48):x}"
+        with self._lock:
+            self._pending_chats[text] = time.perf_counter()
+        self.recorder.sent_one('chat')
+        self.sio.emit('send_message', {'message': text})
+
+    def typing(self):
+        self.recorder.sent_one('typing')
+        self.sio.emit('typing', {'typing': random.random() < 0.7})
+
+    def voice(self):
+        clip = voice_clip()
+        with self._lock:
+            self._pending_voice.append(time.perf_counter())
+        self.recorder.sent_one('voice')
+        self.sio.emit('audio_data', {
+            'room_id': self.room_id,
+            'audio': clip if self.transport == 'binary' else base64.b64encode(clip).decode(),
+            'username': self.username,
+            'source_language': self.language,
+            'format': 'audio/wav'
+        })
+
+    def dub(self):
+        with self._lock:
+            candidates = [message for message in self._voice_from_others if message.get('language') != self.language]
+        if not candidates:
+            return self.chat()
+        message = random.choice(candidates)
+        with self._lock:
+            self._pending_dubs[message['message_id']] = time.perf_counter()
+        self.recorder.sent_one('dub')
+        self.sio.emit('request_dub', {
+            'message_id': message['message_id'],
+            'speaker_name': message['speaker'],
+            'source_language': message.get('language', 'en'),
+            'target_language': self.language
+        })
+
+    def run(self, deadline):
+        actions, weights = zip(*ACTIONS)
+        while time.time() < deadline:
+            getattr(self, random.choices(actions, weights)[0])()
+            time.sleep(random.expovariate(1000.0 / self.think_ms))
+
+    def close(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def start_app(port, workdir, murf_url, translator_url, webhook):
+    env = dict(
+        os.environ,
+        DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'),
+        BLOB_STORE_PATH=os.path.join(workdir, 'blobs'),
+        MURFDUB_API_KEY='bench',
+        MURF_BASE_URL=murf_url,
+        TRANSLATE_API_URL=translator_url + '/translate',
+        TRANSLATION_PROVIDERS='libre',
+        LOG_LEVEL='warning',
+        PYTHONUNBUFFERED='1'
+    )
+    if webhook:
+        env['MURF_WEBHOOK_URL'] = f"http://127.0.0.1:{port}/api/murf/webhook"
+    else:
+        env.pop('MURF_WEBHOOK_URL', None)
+    launcher = (
+        "import app; "
+        f"app.socketio.run(app.app, host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)"
+    )
+    process = subprocess.Popen([sys.executable, '-c', launcher], cwd=REPO_ROOT, env=env,
+                               stdout=open(os.path.join(workdir, 'app.log'), 'w'), stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited early, see {workdir}/app.log")
+        try:
+            if requests.get(url + '/api/health', timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('app did not become healthy')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    random.seed(args.seed)
+    murf = StubServer(create_murf_stub(Faults(args.murf_latency_ms, args.murf_jitter_ms, args.murf_failure_rate),
+                                       job_seconds=args.job_seconds)).start()
+    translator = StubServer(create_translator_stub(Faults(args.translate_latency_ms, args.translate_jitter_ms,
+                                                          args.translate_failure_rate))).start()
+    workdir = tempfile.mkdtemp(prefix='circle-bench-')
+    process, url = start_app(args.port or free_port(), workdir, murf.url, translator.url, args.webhook)
+
+    recorder = Recorder()
+    clients = []
+    try:
+        rss_start = rss_kb(process.pid)
+        for index in range(args.clients):
+            client = SimulatedClient(index, url, f"bench-circle-{index % args.circles}", recorder, args.think_ms, args.transport)
+            client.connect()
+            clients.append(client)
+
+        started = time.time()
+        threads = [threading.Thread(target=client.run, args=(started + args.duration,), daemon=True) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Let in-flight dubs and broadcasts land before counting losses
+        time.sleep(args.drain)
+        elapsed = time.time() - started
+
+        events = recorder.summary()
+        completed = sum(event['sent'] if kind in FIRE_AND_FORGET else event['completed']
+                        for kind, event in events.items() if kind != 'join')
+        report = {
+            'version': REPORT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': git_commit(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'tolerance')},
+            'elapsed_s': round(elapsed, 3),
+            'throughput_events_per_s': round(completed / args.duration, 3),
+            'events': events,
+            'server': {
+                'rss_start_kb': rss_start,
+                'rss_end_kb': rss_kb(process.pid),
+                'db_bytes': os.path.getsize(os.path.join(workdir, 'bench.db')) if os.path.exists(os.path.join(workdir, 'bench.db')) else 0,
+                'blob_bytes': directory_bytes(os.path.join(workdir, 'blobs'))
+            },
+            'stubs': {'murf': murf.stats(), 'translator': translator.stats()}
+        }
+        if report['server']['rss_start_kb'] and report['server']['rss_end_kb']:
+            report['server']['rss_growth_kb'] = report['server']['rss_end_kb'] - report['server']['rss_start_kb']
+        try:
+            report['server_stages'] = requests.get(url + '/api/traces/stages', timeout=5).json()['stages']
+        except (requests.RequestException, ValueError, KeyError):
+            report['server_stages'] = None
+        return report
+    finally:
+        for client in clients:
+            client.close()
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        murf.stop()
+        translator.stop()
+
+
+def compare(report, baseline, tolerance):
+    """Print metric deltas against a baseline. Returns the regressions."""
+    checks = [('throughput_events_per_s', report.get('throughput_events_per_s'), baseline.get('throughput_events_per_s'), True)]
+    for kind, event in sorted(report['events'].items()):
+        base = baseline.get('events', {}).get(kind, {})
+        for key in ('p50_ms', 'p99_ms'):
+            checks.append((f"{kind}.{key}", event.get(key), base.get(key), False))
+    checks.append(('server.rss_growth_kb', report['server'].get('rss_growth_kb'), baseline.get('server', {}).get('rss_growth_kb'), False))
+
+    regressions = []
+    print(f"{'metric':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, current, previous, higher_is_better in checks:
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        flag = ' REGRESSION' if worse > tolerance else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<28}{previous:>14}{current:>14}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark The Circle backend against stub Murf and translator servers.')
+    parser.add_argument('--clients', type=int, default=20, help='simulated Socket.IO clients')
+    parser.add_argument('--circles', type=int, default=4, help='circles the clients are spread across')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--drain', type=float, default=5, help='seconds to wait for in-flight events after load stops')
+    parser.add_argument('--think-ms', type=float, default=500, help='mean pause between a client\'s actions')
+    parser.add_argument('--transport', choices=['binary', 'base64'], default='binary', help='audio transport clients join with')
+    parser.add_argument('--webhook', action='store_true', help='complete dubbing jobs by webhook instead of polling')
+    parser.add_argument('--job-seconds', type=float, default=1.0, help='how long the stub takes to finish a dubbing job')
+    parser.add_argument('--murf-latency-ms', type=float, default=50)
+    parser.add_argument('--murf-jitter-ms', type=float, default=20)
+    parser.add_argument('--murf-failure-rate', type=float, default=0.0)
+    parser.add_argument('--translate-latency-ms', type=float, default=30)
+    parser.add_argument('--translate-jitter-ms', type=float, default=10)
+    parser.add_argument('--translate-failure-rate', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=0, help='port for the app (default: any free port)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression before failing')
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
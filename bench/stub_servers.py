@@ -0,0 +1,164 @@
+"""Stand-ins for the Murf dubbing API and a LibreTranslate-style translator.
+
+Both run in-process on background threads with configurable latency, jitter
+and failure rate, so bench runs are repeatable and never spend credits.
+Point the app at them with MURF_BASE_URL and TRANSLATE_API_URL.
+"""
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class Faults:
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+    def should_fail(self):
+        return random.random() < self.failure_rate
+
+
+def create_murf_stub(faults, job_seconds=1.0, dubbed_bytes=16000):
+    app = Flask('murf_stub')
+    jobs = {}
+    lock = threading.Lock()
+    app.config['STATS'] = stats = {'jobs_created': 0, 'status_polls': 0, 'downloads': 0, 'webhooks': 0, 'injected_failures': 0}
+
+    def job_payload(job_id, job):
+        if time.time() - job['created'] < job_seconds:
+            return {'job_id': job_id, 'status': 'IN_PROGRESS'}
+        if job['fail']:
+            return {'job_id': job_id, 'status': 'FAILED', 'failure_reason': 'SERVER_ERROR', 'failure_code': 'SERVER_ERROR'}
+        return {
+            'job_id': job_id,
+            'status': 'COMPLETED',
+            'download_details': [{
+                'locale': locale,
+                'status': 'COMPLETED',
+                'download_url': f"{job['base_url']}/download/{job_id}"
+            } for locale in job['locales']]
+        }
+
+    def deliver_webhook(job_id):
+        job = jobs[job_id]
+        payload = json.dumps(job_payload(job_id, job))
+        timestamp = str(int(time.time()) * 1000)
+        signature = hmac.new(job['webhook_secret'].encode(), f"{payload}.{timestamp}".encode(), hashlib.sha256).hexdigest()
+        try:
+            requests.post(job['webhook_url'], data=payload, timeout=10, headers={
+                'Content-Type': 'application/json',
+                'X-Murf-Signature': signature,
+                'X-Murf-Timestamp': timestamp
+            })
+            with lock:
+                stats['webhooks'] += 1
+        except requests.RequestException:
+            pass
+
+    @app.route('/v1/murfdub/jobs/create', methods=['POST'])
+    def create_job():
+        faults.delay()
+        if faults.should_fail():
+            with lock:
+                stats['injected_failures'] += 1
+            return jsonify({'error_message': 'SERVER_ERROR'}), 500
+
+        upload = request.files.get('file')
+        if upload:
+            upload.read()
+        job_id = uuid.uuid4().hex
+        job = {
+            'created': time.time(),
+            'locales': request.form.getlist('target_locales') or ['en_US'],
+            'base_url': request.host_url.rstrip('/'),
+            'webhook_url': request.form.get('webhook_url'),
+            'webhook_secret': request.form.get('webhook_secret') or '',
+            'fail': faults.should_fail()
+        }
+        with lock:
+            jobs[job_id] = job
+            stats['jobs_created'] += 1
+        if job['webhook_url']:
+            timer = threading.Timer(job_seconds, deliver_webhook, [job_id])
+            timer.daemon = True
+            timer.start()
+        return jsonify({'job_id': job_id, 'target_locales': job['locales'], 'dubbing_type': 'AUTOMATED'})
+
+    @app.route('/v1/murfdub/jobs/<job_id>/status')
+    def job_status(job_id):
+        faults.delay()
+        job = jobs.get(job_id)
+        if not job:
+            return jsonify({'error_message': 'JOB_NOT_FOUND'}), 404
+        with lock:
+            stats['status_polls'] += 1
+        return jsonify(job_payload(job_id, job))
+
+    @app.route('/download/<job_id>')
+    def download(job_id):
+        faults.delay()
+        with lock:
+            stats['downloads'] += 1
+        return b'RIFF' + job_id.encode()[:4] + b'\0' * dubbed_bytes, 200, {'Content-Type': 'audio/wav'}
+
+    return app
+
+
+def create_translator_stub(faults):
+    app = Flask('translator_stub')
+    lock = threading.Lock()
+    app.config['STATS'] = stats = {'requests': 0, 'injected_failures': 0}
+
+    @app.route('/translate', methods=['POST'])
+    def translate():
+        faults.delay()
+        failed = faults.should_fail()
+        with lock:
+            stats['requests'] += 1
+            stats['injected_failures'] += failed
+        if failed:
+            return jsonify({'error': 'injected failure'}), 503
+        data = request.get_json()
+        q = data.get('q', '')
+        if isinstance(q, list):
+            return jsonify({'translatedText': [f"[{data.get('target')}] {text}" for text in q]})
+        return jsonify({'translatedText': f"[{data.get('target')}] {q}"})
+
+    return app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class StubServer:
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.app = app
+        self.server = make_server(host, port, app, threaded=True, request_handler=QuietRequestHandler)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def stats(self):
+        return dict(self.app.config['STATS'])
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import tempfile
+import time
+
+
+AUDIO_SIGNATURES = [
+    (b'\x1a\x45\xdf\xa3', 'audio/webm'),
+    (b'OggS', 'audio/ogg'),
+    (b'RIFF', 'audio/wav'),
+    (b'ID3', 'audio/mpeg'),
+    (b'fLaC', 'audio/flac'),
+]
+
+
+def guess_audio_mimetype(head, default='audio/webm'):
+    for signature, mimetype in AUDIO_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[4:8] == b'ftyp':
+        return 'audio/mp4'
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return 'audio/mpeg'
+    return default
+
+
+class BlobStore:
+    """Content-addressed file store: blobs live at <root>/<aa>/<bb>/<sha256>."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def is_valid_hash(blob_hash):
+        return len(blob_hash) == 64 and all(c in '0123456789abcdef' for c in blob_hash)
+
+    def path(self, blob_hash):
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def exists(self, blob_hash):
+        return os.path.exists(self.path(blob_hash))
+
+    def put(self, data):
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_hash)
+        if os.path.exists(path):
+            # Refresh the mtime so retention's grace period counts from the latest reference
+            os.utime(path)
+            return blob_hash
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file in the same shard and rename so readers never see partial blobs
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return blob_hash
+
+    def get(self, blob_hash):
+        try:
+            with open(self.path(blob_hash), 'rb') as blob_file:
+                return blob_file.read()
+        except FileNotFoundError:
+            return None
+
+    def head(self, blob_hash, size=16):
+        with open(self.path(blob_hash), 'rb') as blob_file:
+            return blob_file.read(size)
+
+    def age(self, blob_hash):
+        """Seconds since the blob was last written, or None if it doesn't exist."""
+        try:
+            return time.time() - os.stat(self.path(blob_hash)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def delete(self, blob_hash):
+        try:
+            os.unlink(self.path(blob_hash))
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,185 @@
+import atexit
+import heapq
+import threading
+import time
+from collections import deque
+
+import structured_log
+
+log = structured_log.get_logger('broadcast_batcher')
+
+
+class BroadcastBatcher:
+    """Adaptive batching of chat broadcasts per room.
+
+    While a room stays below threshold messages per second, every message
+    goes out at once as its own frame. Above it, messages are held for up
+    to window_ms and sent as one frame carrying the whole window, so each
+    client gets one packet per window instead of one per message. A room
+    goes back to single frames when it quietens down. Ordering is kept:
+    once a room has a batch pending, later messages join that batch.
+
+    Frames are put in a per-room outbox in the order they are decided, and
+    whichever thread finds the room idle sends them, so a slow emit holds up
+    its own room only.
+    """
+
+    def __init__(self, emit_single, emit_batch, threshold_per_second=5, window_ms=100, rate_window_seconds=2,
+                 frames=None):
+        self.emit_single = emit_single
+        self.emit_batch = emit_batch
+        self.threshold = threshold_per_second
+        self.window = window_ms / 1000.0
+        self.rate_window = rate_window_seconds
+        # Optional metrics counter of frames sent, by kind
+        self.frames = frames
+        self._recent = {}
+        self._pending = {}
+        # Callbacks waiting for a room's pending batch to go out
+        self._followers = {}
+        self._deadlines = []
+        self._outbox = {}
+        self._sending = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.batched_messages = 0
+        self._pruned_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='broadcast-batcher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _rate(self, room_id, now):
+        recent = self._recent.get(room_id)
+        if recent is None:
+            recent = self._recent[room_id] = deque()
+        recent.append(now)
+        while recent and recent[0] <= now - self.rate_window:
+            recent.popleft()
+        return len(recent) / self.rate_window
+
+    def _queue(self, room_id, kind, payload):
+        # Caller holds _cond. Returns True if the caller must drain the room
+        self._outbox.setdefault(room_id, deque()).append((kind, payload))
+        if room_id in self._sending:
+            return False
+        self._sending.add(room_id)
+        return True
+
+    def _release_batch(self, room_id):
+        # Caller holds _cond
+        messages = self._pending.pop(room_id, None)
+        drain = self._queue(room_id, 'batch', messages) if messages else False
+        for callback in self._followers.pop(room_id, ()):
+            drain = self._queue(room_id, 'call', callback) or drain
+        return drain
+
+    def _drain(self, room_id):
+        while True:
+            with self._cond:
+                outbox = self._outbox.get(room_id)
+                if not outbox:
+                    self._outbox.pop(room_id, None)
+                    self._sending.discard(room_id)
+                    return
+                kind, payload = outbox.popleft()
+            try:
+                if kind == 'single':
+                    self.emit_single(room_id, payload)
+                elif kind == 'batch':
+                    self.emit_batch(room_id, payload)
+                else:
+                    payload()
+            except Exception as e:
+                log.warning('broadcast_failed', room_id=room_id, kind=kind, error=str(e))
+                continue
+            if kind != 'call':
+                self._count(kind)
+
+    def send(self, room_id, message):
+        now = time.monotonic()
+        with self._cond:
+            rate = self._rate(room_id, now)
+            pending = self._pending.get(room_id)
+            if pending is None and (rate < self.threshold or self._closed):
+                drain = self._queue(room_id, 'single', message)
+            else:
+                if pending is None:
+                    pending = self._pending[room_id] = []
+                    heapq.heappush(self._deadlines, (now + self.window, room_id))
+                    self._cond.notify()
+                pending.append(message)
+                self.batched_messages += 1
+                drain = False
+        if drain:
+            self._drain(room_id)
+
+    def follow(self, room_id, callback):
+        """Call callback once every message already sent to room_id has gone out.
+
+        For frames that refer to those messages, e.g. their translations, which
+        clients can only apply to messages they already have.
+        """
+        with self._cond:
+            if room_id in self._pending:
+                self._followers.setdefault(room_id, []).append(callback)
+                return
+            drain = self._queue(room_id, 'call', callback)
+        if drain:
+            self._drain(room_id)
+
+    def _count(self, kind):
+        if self.frames is not None:
+            self.frames.inc(kind=kind)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._deadlines and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._deadlines:
+                    return
+                delay = self._deadlines[0][0] - time.monotonic()
+                if delay > 0 and not self._closed:
+                    self._cond.wait(delay)
+                    continue
+                _, room_id = heapq.heappop(self._deadlines)
+                drain = self._release_batch(room_id)
+                self._prune()
+            if drain:
+                self._drain(room_id)
+
+    def _prune(self):
+        # Forget rate history of rooms that went quiet, so the map doesn't grow with every room ever seen
+        now = time.monotonic()
+        if now - self._pruned_at < self.rate_window:
+            return
+        self._pruned_at = now
+        cutoff = now - self.rate_window
+        for room_id in [room_id for room_id, recent in self._recent.items() if not recent or recent[-1] <= cutoff]:
+            del self._recent[room_id]
+
+    def flush(self):
+        # Send everything pending now, e.g. before shutdown
+        with self._cond:
+            rooms = [room_id for room_id in list(self._pending) if self._release_batch(room_id)]
+            self._deadlines = []
+        for room_id in rooms:
+            self._drain(room_id)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending_rooms': len(self._pending),
+                'pending_messages': sum(len(messages) for messages in self._pending.values()),
+                'queued_frames': sum(len(outbox) for outbox in self._outbox.values()),
+                'batched_messages': self.batched_messages,
+                'threshold_per_second': self.threshold,
+                'window_ms': self.window * 1000
+            }
@@ -0,0 +1,233 @@
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+class ArchivedMessage:
+    """Read-only stand-in for a ChatMessage row that now lives in an archive segment."""
+    archived = True
+    audio_data = None
+
+    def __init__(self, room_id, entry):
+        self.room_id = room_id
+        self.id = entry['id']
+        self.message_uuid = entry['message_uuid']
+        self.username = entry['username']
+        self.message = entry.get('message')
+        self.language = entry.get('language')
+        self.message_type = entry.get('message_type') or 'text'
+        self.timestamp = datetime.fromisoformat(entry['timestamp'])
+        self.audio_hash = entry.get('audio_hash')
+        self.audio_length = entry.get('audio_length')
+        self.translations = entry.get('translations') or {}
+
+    @property
+    def sort_key(self):
+        return (self.timestamp, self.id)
+
+
+def archive_entry(msg, translations=None):
+    # Voice rows are archived once their audio has expired, so the audio is not carried over
+    return {
+        'id': msg.id,
+        'message_uuid': msg.message_uuid,
+        'username': msg.username,
+        'message': msg.message,
+        'language': msg.language,
+        'message_type': msg.message_type,
+        'timestamp': msg.timestamp.isoformat(),
+        'audio_length': msg.audio_length,
+        'translations': (translations or {}).get(msg.message_uuid) or None
+    }
+
+
+class ArchiveStore:
+    """Append-only, gzip-compressed history segments per room.
+
+    <root>/<aa>/<sha256(room_id)>/ holds seg-*.jsonl.gz files (entries oldest
+    first) and index.jsonl, one line per segment with its time and id range,
+    so readers open only the segments that can hold the page they need.
+    Segments are never rewritten: they are added by compaction and deleted
+    whole once every entry in them is past the retention period.
+    """
+
+    def __init__(self, root, cache_segments=32):
+        self.root = root
+        self.cache_segments = cache_segments
+        self._cache = OrderedDict()
+        self._indexes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def room_path(self, room_id):
+        room_hash = hashlib.sha256(room_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, room_hash[:2], room_hash)
+
+    def _index_path(self, room_id):
+        return os.path.join(self.room_path(room_id), 'index.jsonl')
+
+    def segments(self, room_id):
+        """Index entries for the room, oldest segment first. Cached until the index file changes."""
+        path = self._index_path(room_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cached = self._indexes.get(room_id)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, encoding='utf-8') as index_file:
+            segments = [json.loads(line) for line in index_file if line.strip()]
+        with self._lock:
+            self._indexes[room_id] = (mtime, segments)
+        return segments
+
+    def has_room(self, room_id):
+        return os.path.exists(self._index_path(room_id))
+
+    def append_segment(self, room_id, entries):
+        if not entries:
+            return None
+        entries = sorted(entries, key=lambda entry: (entry['timestamp'], entry['id']))
+        directory = self.room_path(room_id)
+        os.makedirs(directory, exist_ok=True)
+        name = f"seg-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+
+        # Temp file + rename, so a crash never leaves a truncated segment behind
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as raw_file:
+                with gzip.GzipFile(fileobj=raw_file, mode='wb', mtime=0) as segment_file:
+                    for entry in entries:
+                        segment_file.write(json.dumps(entry, separators=(',', ':')).encode('utf-8') + b'\n')
+                raw_file.flush()
+                os.fsync(raw_file.fileno())
+            os.replace(temp_path, os.path.join(directory, name))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        segment = {
+            'file': name,
+            'room_id': room_id,
+            'count': len(entries),
+            'first': [entries[0]['timestamp'], entries[0]['id']],
+            'last': [entries[-1]['timestamp'], entries[-1]['id']],
+            'bytes': os.path.getsize(os.path.join(directory, name))
+        }
+        with open(self._index_path(room_id), 'a', encoding='utf-8') as index_file:
+            index_file.write(json.dumps(segment) + '\n')
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        return segment
+
+    def _read(self, room_id, segment):
+        path = os.path.join(self.room_path(room_id), segment['file'])
+        with self._lock:
+            messages = self._cache.get(path)
+            if messages is not None:
+                self._cache.move_to_end(path)
+                return messages
+        with gzip.open(path, 'rt', encoding='utf-8') as segment_file:
+            messages = [ArchivedMessage(room_id, json.loads(line)) for line in segment_file if line.strip()]
+        with self._lock:
+            self._cache[path] = messages
+            while len(self._cache) > self.cache_segments:
+                self._cache.popitem(last=False)
+        return messages
+
+    @staticmethod
+    def _key(pair):
+        return (datetime.fromisoformat(pair[0]), pair[1])
+
+    def load_before(self, room_id, before=None, after=None, limit=50):
+        """Up to limit archived messages with (timestamp, id) < before and > after, newest first.
+
+        Segments are read newest first and only until none of the rest can hold
+        anything newer than the limit-th message found so far, so a page costs a
+        few segments however long the room's history is.
+        """
+        segments = [
+            segment for segment in self.segments(room_id)
+            if (before is None or self._key(segment['first']) < before)
+            and (after is None or self._key(segment['last']) > after)
+        ]
+        segments.sort(key=lambda segment: self._key(segment['last']), reverse=True)
+        # Min-heap of the newest limit messages so far; the counter breaks ties between duplicates
+        newest = []
+        counter = itertools.count()
+        for segment in segments:
+            if len(newest) >= limit and self._key(segment['last']) < newest[0][0]:
+                break
+            for msg in self._read(room_id, segment):
+                if (before is not None and msg.sort_key >= before) or (after is not None and msg.sort_key <= after):
+                    continue
+                item = (msg.sort_key, next(counter), msg)
+                if len(newest) < limit:
+                    heapq.heappush(newest, item)
+                elif item[0] > newest[0][0]:
+                    heapq.heapreplace(newest, item)
+        return [msg for _, _, msg in sorted(newest, key=lambda item: item[:2], reverse=True)]
+
+    def expire(self, room_id, cutoff):
+        """Delete segments whose newest entry is older than cutoff. Returns messages dropped."""
+        segments = self.segments(room_id)
+        keep = [segment for segment in segments if self._key(segment['last'])[0] >= cutoff]
+        if len(keep) == len(segments):
+            return 0
+
+        index_path = self._index_path(room_id)
+        fd, temp_path = tempfile.mkstemp(dir=self.room_path(room_id), prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as index_file:
+            index_file.writelines(json.dumps(segment) + '\n' for segment in keep)
+        os.replace(temp_path, index_path)
+
+        dropped = 0
+        for segment in segments:
+            if segment not in keep:
+                path = os.path.join(self.room_path(room_id), segment['file'])
+                with self._lock:
+                    self._cache.pop(path, None)
+                if os.path.exists(path):
+                    os.unlink(path)
+                dropped += segment['count']
+        if not keep:
+            os.unlink(index_path)
+        return dropped
+
+    def rooms(self):
+        # Room ids come from the index files, since directories are named by hash
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for room_hash in os.listdir(shard_path):
+                index_path = os.path.join(shard_path, room_hash, 'index.jsonl')
+                try:
+                    with open(index_path, encoding='utf-8') as index_file:
+                        first = index_file.readline()
+                except FileNotFoundError:
+                    continue
+                if first.strip():
+                    yield json.loads(first)['room_id']
+
+    def stats(self, room_id):
+        segments = self.segments(room_id)
+        return {
+            'segments': len(segments),
+            'messages': sum(segment['count'] for segment in segments),
+            'bytes': sum(segment['bytes'] for segment in segments),
+            'oldest': segments and min(segment['first'][0] for segment in segments) or None,
+            'newest': segments and max(segment['last'][0] for segment in segments) or None
+        }
@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime
+
+from models import db, ChatMessage, MessageTranslation
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(msg):
+    raw = f"{msg.timestamp.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, message_pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(message_pk)
+    except Exception:
+        raise ValueError('Invalid history cursor')
+
+
+def clamp_page_size(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def load_page(room_id, before=None, limit=DEFAULT_PAGE_SIZE, archive=None):
+    """Return (messages oldest-first, next_cursor) for the page ending before the cursor.
+
+    Walks ix_chat_message_room_timestamp with a keyset condition instead of
+    OFFSET, and leaves legacy inline audio unloaded. With an archive, pages
+    continue seamlessly into the room's compacted history.
+    """
+    limit = clamp_page_size(limit)
+    query = ChatMessage.query.options(db.defer(ChatMessage.audio_data)).filter(ChatMessage.room_id == room_id)
+
+    before_key = None
+    if before:
+        timestamp, message_pk = decode_cursor(before)
+        before_key = (timestamp, message_pk)
+        query = query.filter(db.or_(
+            ChatMessage.timestamp < timestamp,
+            db.and_(ChatMessage.timestamp == timestamp, ChatMessage.id < message_pk)
+        ))
+
+    rows = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+    if archive is not None and archive.has_room(room_id):
+        rows = _merge_archived(rows, archive, room_id, before_key, limit)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return list(reversed(rows[:limit])), next_cursor
+
+
+def _merge_archived(rows, archive, room_id, before_key, limit):
+    # A full hot page only needs archived entries newer than its oldest row,
+    # which the index rules out without opening a segment in the usual case
+    floor = (rows[-1].timestamp, rows[-1].id) if len(rows) > limit else None
+    archived = archive.load_before(room_id, before=before_key, after=floor, limit=limit + 1)
+    if not archived:
+        return rows
+    # A row can briefly exist in both while compaction is between its two steps
+    hot_uuids = {row.message_uuid for row in rows}
+    merged = rows + [msg for msg in archived if msg.message_uuid not in hot_uuids]
+    merged.sort(key=lambda msg: (msg.timestamp, msg.id), reverse=True)
+    return merged[:limit + 1]
+
+
+def load_translations(messages):
+    """Map message_uuid -> {language: translated_text} for the given rows."""
+    # Archived messages carry their translations with them
+    translations = {msg.message_uuid: dict(msg.translations) for msg in messages
+                    if getattr(msg, 'archived', False) and msg.translations}
+    message_uuids = [msg.message_uuid for msg in messages
+                     if msg.message_type != 'voice' and not getattr(msg, 'archived', False)]
+    if not message_uuids:
+        return translations
+
+    rows = MessageTranslation.query.filter(MessageTranslation.message_uuid.in_(message_uuids)).all()
+    for row in rows:
+        translations.setdefault(row.message_uuid, {})[row.language] = row.translated_text
+    return translations
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import io
+import re
+
+
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+THUMBNAIL_SIZE = 128
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+IMAGE_URL_PATTERN = re.compile(r'/api/images/([0-9a-f]{64})$')
+
+
+def guess_image_mimetype(head, default='application/octet-stream'):
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return default
+
+
+def image_url(image_hash):
+    return f"/api/images/{image_hash}" if image_hash else None
+
+
+def decode_data_url(value):
+    """Bytes of a base64 image data URL (what the create page sends), or None for anything else."""
+    if not value or not value.startswith('data:image/'):
+        return None
+    header, _, payload = value.partition(',')
+    if ';base64' not in header:
+        raise ValueError('Image data URLs must be base64 encoded')
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid image data')
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError('Image is too large')
+    return data
+
+
+def hash_from_url(value):
+    match = IMAGE_URL_PATTERN.search(value or '')
+    return match.group(1) if match else None
+
+
+def thumbnails_available():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    """Downscaled copy of the image, or None when Pillow is missing or can't read it."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width <= size and image.height <= size:
+            return None
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image.save(output, format='PNG', optimize=True)
+        else:
+            image.convert('RGB').save(output, format='JPEG', quality=85)
+        return output.getvalue()
+    except Exception:
+        return None
+
+
+def store_image(blob_store, data):
+    """Store an image and its thumbnail; returns (image_hash, thumbnail_hash)."""
+    if guess_image_mimetype(data[:16]) == 'application/octet-stream':
+        raise ValueError('Unsupported image format')
+    image_hash = blob_store.put(data)
+    thumbnail = make_thumbnail(data)
+    # Small images (or no Pillow) serve as their own thumbnail
+    thumbnail_hash = blob_store.put(thumbnail) if thumbnail else image_hash
+    return image_hash, thumbnail_hash
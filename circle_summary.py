@@ -0,0 +1,251 @@
+import atexit
+import base64
+import threading
+from datetime import datetime
+
+import structured_log
+from models import db, ChatMessage, Circle, CircleSummary
+
+log = structured_log.get_logger('circle_summary')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PREVIEW_LENGTH = 120
+SORT_COLUMNS = {
+    'recent': CircleSummary.last_activity_at,
+    'active': CircleSummary.participant_count,
+}
+
+
+def _split_languages(value):
+    return set(filter(None, (value or '').split(',')))
+
+
+def encode_cursor(sort, summary):
+    value = summary.last_activity_at.isoformat() if sort == 'recent' else str(summary.participant_count)
+    return base64.urlsafe_b64encode(f"{value}|{summary.room_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(sort, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        value, room_id = raw.split('|', 1)
+        return (datetime.fromisoformat(value) if sort == 'recent' else int(value)), room_id
+    except Exception:
+        raise ValueError('Invalid circle cursor')
+
+
+class CircleSummaryStore:
+    """Per-circle activity summary kept in CircleSummary.
+
+    Handlers record messages and presence changes in memory; a background
+    thread folds them into the table every flush_interval_ms using additive
+    UPDATEs, so several worker processes can feed the same rows. Listings read
+    the summary table only and never COUNT ChatMessage.
+    """
+
+    def __init__(self, app, flush_interval_ms=1000):
+        self.app = app
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.flushes = 0
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, name='circle-summary', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _delta(self, room_id):
+        if not self._pending:
+            # Only wake the flusher for the first change; later ones ride along with its batch
+            self._cond.notify()
+        delta = self._pending.get(room_id)
+        if delta is None:
+            delta = self._pending[room_id] = {'messages': 0, 'last': None, 'languages': set(), 'participants': None, 'activity': None}
+        return delta
+
+    def record_message(self, room_id, username, message_type, text, language, timestamp):
+        preview = text[:PREVIEW_LENGTH] if text else None
+        with self._cond:
+            delta = self._delta(room_id)
+            delta['messages'] += 1
+            if delta['last'] is None or delta['last']['timestamp'] <= timestamp:
+                delta['last'] = {'timestamp': timestamp, 'username': username, 'type': message_type, 'preview': preview}
+            if language:
+                delta['languages'].add(language)
+            delta['activity'] = max(delta['activity'] or timestamp, timestamp)
+
+    def record_presence(self, room_id, participant_count, language=None):
+        now = datetime.utcnow()
+        with self._cond:
+            delta = self._delta(room_id)
+            delta['participants'] = participant_count
+            if language:
+                delta['languages'].add(language)
+            delta['activity'] = max(delta['activity'] or now, now)
+
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                if not self._closed:
+                    # Let a burst of messages collapse into one UPDATE per room
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            with self.app.app_context():
+                try:
+                    for room_id, delta in pending.items():
+                        self._apply(room_id, delta)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self.failures += 1
+                    log.warning('summary_flush_failed', circles=len(pending), error=str(e))
+                    self._apply_one_by_one(pending)
+            self.flushes += 1
+            return len(pending)
+
+    def _apply_one_by_one(self, pending):
+        # e.g. another worker inserted the same new circle first; the retry then updates its row
+        for room_id, delta in pending.items():
+            try:
+                self._apply(room_id, delta)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.failures += 1
+                log.warning('summary_update_dropped', room_id=room_id, error=str(e))
+
+    def _apply(self, room_id, delta):
+        summary = db.session.get(CircleSummary, room_id)
+        if summary is None:
+            summary = CircleSummary(room_id=room_id, message_count=0, participant_count=0, languages='',
+                                    last_activity_at=delta['activity'] or datetime.utcnow())
+            db.session.add(summary)
+            db.session.flush()
+
+        values = {}
+        if delta['messages']:
+            values['message_count'] = CircleSummary.message_count + delta['messages']
+        if delta['participants'] is not None:
+            values['participant_count'] = delta['participants']
+        languages = _split_languages(summary.languages) | delta['languages']
+        if languages != _split_languages(summary.languages):
+            values['languages'] = ','.join(sorted(languages))[:200]
+        if delta['activity'] and (summary.last_activity_at is None or delta['activity'] > summary.last_activity_at):
+            values['last_activity_at'] = delta['activity']
+        last = delta['last']
+        if last and (summary.last_message_at is None or last['timestamp'] >= summary.last_message_at):
+            values.update(
+                last_message_at=last['timestamp'],
+                last_message_username=last['username'],
+                last_message_type=last['type'],
+                last_message_preview=last['preview']
+            )
+        if values:
+            db.session.execute(db.update(CircleSummary).where(CircleSummary.room_id == room_id).values(**values))
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+        self.flush()
+
+    def reset_participants(self):
+        # Presence kept in process memory doesn't survive a restart, so stored counts are stale
+        with self.app.app_context():
+            db.session.execute(db.update(CircleSummary).where(CircleSummary.participant_count != 0).values(participant_count=0))
+            db.session.commit()
+
+    def backfill(self):
+        """Build the summary once for databases created before it existed."""
+        with self.app.app_context():
+            if db.session.query(CircleSummary.room_id).first() is not None:
+                return 0
+
+            summaries = {}
+            counts = db.session.query(ChatMessage.room_id, db.func.count(ChatMessage.id), db.func.max(ChatMessage.id)).group_by(ChatMessage.room_id)
+            last_ids = {}
+            for room_id, count, last_id in counts:
+                summaries[room_id] = CircleSummary(room_id=room_id, message_count=count, participant_count=0, languages='')
+                last_ids[last_id] = room_id
+            for row in ChatMessage.query.options(db.defer(ChatMessage.audio_data)).filter(ChatMessage.id.in_(list(last_ids))):
+                summary = summaries[row.room_id]
+                summary.last_message_at = summary.last_activity_at = row.timestamp
+                summary.last_message_username = row.username
+                summary.last_message_type = row.message_type
+                summary.last_message_preview = row.message[:PREVIEW_LENGTH] if row.message else None
+            for room_id, language in db.session.query(ChatMessage.room_id, ChatMessage.language).distinct():
+                if language:
+                    summaries[room_id].languages = ','.join(sorted(_split_languages(summaries[room_id].languages) | {language}))[:200]
+            for circle in db.session.query(Circle.id, Circle.created_at):
+                if circle.id not in summaries:
+                    summaries[circle.id] = CircleSummary(room_id=circle.id, message_count=0, participant_count=0, languages='',
+                                                         last_activity_at=circle.created_at or datetime.utcnow())
+
+            db.session.add_all(summaries.values())
+            try:
+                db.session.commit()
+            except Exception as e:
+                # Another worker backfilled at the same time
+                db.session.rollback()
+                log.warning('summary_backfill_skipped', error=str(e))
+                return 0
+            return len(summaries)
+
+    def load_page(self, sort='recent', cursor=None, limit=None, room_ids=None):
+        """Return ([(summary, circle or None)], next_cursor), most recent or most populated first.
+
+        Keyset pagination over ix_circle_summary_activity / _participants. Without
+        room_ids only created circles are listed; with them any room can be asked for.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError('Unknown sort')
+        column = SORT_COLUMNS[sort]
+        if room_ids is not None:
+            room_ids = room_ids[:MAX_PAGE_SIZE]
+        try:
+            limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        except (TypeError, ValueError):
+            limit = max(len(room_ids), 1) if room_ids else DEFAULT_PAGE_SIZE
+
+        query = db.session.query(CircleSummary, Circle)
+        if room_ids is not None:
+            query = query.outerjoin(Circle, Circle.id == CircleSummary.room_id).filter(CircleSummary.room_id.in_(room_ids))
+        else:
+            query = query.join(Circle, Circle.id == CircleSummary.room_id)
+
+        if cursor:
+            value, room_id = decode_cursor(sort, cursor)
+            query = query.filter(db.or_(column < value, db.and_(column == value, CircleSummary.room_id < room_id)))
+
+        rows = query.order_by(column.desc(), CircleSummary.room_id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(sort, rows[limit - 1][0]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def stats(self):
+        return {
+            'pending': self.depth(),
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'flush_interval_ms': self.flush_interval * 1000
+        }
@@ -0,0 +1,40 @@
+"""Apply retention: compact aged chat history into archive segments and expire old data.
+
+Usage:
+    python compact_history.py [--room ROOM_ID] [--vacuum]
+
+Text older than ARCHIVE_AFTER_DAYS and voice messages past their circle's
+audio retention move to the archive; archived segments past the text
+retention are deleted. Safe to re-run, and safe to interrupt.
+"""
+import argparse
+
+from app import app, blob_store, chat_archive, flush_pending_writes
+from models import db, Circle
+from retention import RetentionPolicy, compact_room, run_retention
+
+
+def vacuum():
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--room', help='only compact this circle')
+    parser.add_argument('--vacuum', action='store_true', help='reclaim freed space in the database file afterwards')
+    args = parser.parse_args()
+
+    flush_pending_writes()
+    with app.app_context():
+        if args.room:
+            policy = RetentionPolicy.for_circle(db.session.get(Circle, args.room))
+            result = compact_room(args.room, policy, chat_archive, blob_store)
+        else:
+            result = run_retention(chat_archive, blob_store)
+    print(f"[RETENTION] Done: {result}")
+
+    if args.vacuum:
+        print("[RETENTION] Running VACUUM...")
+        vacuum()
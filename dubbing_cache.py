@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def dubbing_key(audio_bytes, target_locale):
+    return (hashlib.sha256(audio_bytes).hexdigest(), target_locale)
+
+
+class DubbingCache:
+    """Dubbed audio keyed by (audio hash, locale), plus the jobs still in flight.
+
+    Listeners asking for a key that is already being dubbed are attached as
+    waiters to the running job instead of starting a new one. Results are
+    cached per process; in-flight waiters live in the shared state backend so
+    any worker can finish a job.
+    """
+
+    def __init__(self, backend, max_bytes=200 * 1024 * 1024):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self._results = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _inflight_name(key):
+        return f"{key[0]}:{key[1]}"
+
+    def get(self, key):
+        key = tuple(key)
+        with self._lock:
+            audio = self._results.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio):
+        key = tuple(key)
+        with self._lock:
+            if key in self._results:
+                self._size -= len(self._results.pop(key))
+            if len(audio) > self.max_bytes:
+                return
+            self._results[key] = audio
+            self._size += len(audio)
+            while self._size > self.max_bytes:
+                _, evicted = self._results.popitem(last=False)
+                self._size -= len(evicted)
+
+    def attach(self, key, waiter):
+        """Register interest in key. Returns True if the caller must start the job."""
+        name = self._inflight_name(key)
+        with self.backend.lock('dubbing:' + name):
+            self.backend.rpush('dubbing:waiters:' + name, waiter)
+            if not self.backend.hsetnx('dubbing:inflight', name, 'speculative' if waiter.get('speculative') else 'listener'):
+                self.coalesced += 1
+                return False
+            return True
+
+    def promote(self, key):
+        """A listener joined an in-flight speculative job. True only for the first one."""
+        name = self._inflight_name(key)
+        with self.backend.lock('dubbing:' + name):
+            if self.backend.hget('dubbing:inflight', name) != 'speculative':
+                return False
+            self.backend.hset('dubbing:inflight', name, 'listener')
+            return True
+
+    def waiters(self, key):
+        return self.backend.lrange('dubbing:waiters:' + self._inflight_name(key))
+
+    def finish(self, key):
+        """Stop tracking the in-flight job and return everyone waiting on it."""
+        name = self._inflight_name(key)
+        with self.backend.lock('dubbing:' + name):
+            waiters = self.backend.lrange('dubbing:waiters:' + name)
+            self.backend.delete('dubbing:waiters:' + name)
+            self.backend.hdel('dubbing:inflight', name)
+            return waiters
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._results),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'inflight': self.backend.hlen('dubbing:inflight'),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,296 @@
+import atexit
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+import structured_log
+from executors import ExecutorBusy
+
+log = structured_log.get_logger('dubbing_scheduler')
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_NORMAL: 'normal', PRIORITY_BULK: 'bulk'}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def estimate_audio_seconds(audio_bytes, bytes_per_second=4000):
+    # WAV headers say exactly how long the clip is; compressed formats are
+    # estimated from size at a typical voice bitrate
+    if len(audio_bytes) >= 44 and audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE':
+        byte_rate = struct.unpack('<I', audio_bytes[28:32])[0]
+        if byte_rate:
+            return (len(audio_bytes) - 44) / byte_rate
+    return len(audio_bytes) / bytes_per_second
+
+
+class CreditBudget:
+    """Seconds of audio that may be spent per window, e.g. on speculative dubs."""
+
+    def __init__(self, credits, window_seconds=3600):
+        self.credits = credits
+        self.window = window_seconds
+        self._spent = 0.0
+        self._window_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_spend(self, cost):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_started >= self.window:
+                self._window_started = now
+                self._spent = 0.0
+            if self._spent + cost > self.credits:
+                return False
+            self._spent += cost
+            return True
+
+    def refund(self, cost):
+        # Credit taken for work that never ran
+        with self._lock:
+            self._spent = max(self._spent - cost, 0.0)
+
+    def stats(self):
+        with self._lock:
+            return {'credits': self.credits, 'spent': round(self._spent, 1), 'window_seconds': self.window}
+
+
+class ScheduledJob:
+    def __init__(self, run, room_id, user, priority, cost, is_live=None, on_position=None, on_drop=None):
+        self.run = run
+        self.room_id = room_id
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.is_live = is_live
+        self.on_position = on_position
+        self.on_drop = on_drop
+        self.position = None
+        self.enqueued_at = time.time()
+
+
+class DubbingScheduler:
+    """Admission control in front of dubbing job creation.
+
+    Jobs are queued by priority level, then round-robin across rooms and,
+    within a room, across users, so one busy circle or one user clicking
+    every clip can't starve the rest. A token bucket limits how fast jobs are
+    submitted and a credit budget (in seconds of audio) caps spend per window.
+    Limits are per process. Queue positions are reported at most once every
+    position_interval_seconds, however fast jobs come and go.
+    """
+
+    def __init__(self, rate_per_second=1.0, burst=5, credit_budget=0, credit_window_seconds=3600, max_queue=200,
+                 position_interval_seconds=2):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.credit_budget = credit_budget
+        self.credit_window = credit_window_seconds
+        self.max_queue = max_queue
+        self.position_interval = position_interval_seconds
+        self._positions_due = 0.0
+        self._positions_pending = False
+        self._queues = {}
+        self._size = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._window_started = time.monotonic()
+        self._spent = 0.0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.submitted = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_wait_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='dubbing-scheduler', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, run, room_id, user, priority=PRIORITY_NORMAL, cost=0, is_live=None, on_position=None, on_drop=None):
+        job = ScheduledJob(run, room_id, user, priority, cost, is_live, on_position, on_drop)
+        with self._cond:
+            if self.credit_budget and cost > self.credit_budget:
+                self.rejected += 1
+                raise BudgetExceeded('Clip is longer than the dubbing budget allows')
+            if self._size >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy('dubbing queue is full')
+            rooms = self._queues.setdefault(priority, OrderedDict())
+            rooms.setdefault(room_id, OrderedDict()).setdefault(user, deque()).append(job)
+            self._size += 1
+            self.submitted += 1
+            self._cond.notify()
+        self._report_positions()
+        return job
+
+    def charge(self, cost):
+        # Spend for work that was let through at no cost but turned out to be needed,
+        # e.g. a pre-dub a listener joined
+        with self._cond:
+            self._refill(time.monotonic())
+            self._spent += cost
+
+    def pause(self, seconds):
+        # Back off after the provider reports rate limiting or exhausted credits
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _peek(self):
+        for priority in sorted(self._queues):
+            rooms = self._queues[priority]
+            if rooms:
+                users = next(iter(rooms.values()))
+                return next(iter(users.values()))[0]
+        return None
+
+    def _pop(self, job):
+        rooms = self._queues[job.priority]
+        users = rooms[job.room_id]
+        jobs = users[job.user]
+        jobs.popleft()
+        # Rotate so the next pick comes from another user, then another room
+        if jobs:
+            users.move_to_end(job.user)
+        else:
+            del users[job.user]
+        if users:
+            rooms.move_to_end(job.room_id)
+        else:
+            del rooms[job.room_id]
+        if not rooms:
+            del self._queues[job.priority]
+        self._size -= 1
+
+    def _ordered(self):
+        # Dispatch order if nothing else arrived: mirrors the rotation in _pop
+        order = []
+        for priority in sorted(self._queues):
+            rooms = [[list(jobs) for jobs in users.values()] for users in self._queues[priority].values()]
+            while rooms:
+                next_rooms = []
+                for users in rooms:
+                    order.append(users[0].pop(0))
+                    if users[0]:
+                        users.append(users.pop(0))
+                    else:
+                        users.pop(0)
+                    if users:
+                        next_rooms.append(users)
+                rooms = next_rooms
+        return order
+
+    def _report_positions(self):
+        with self._cond:
+            now = time.monotonic()
+            if now < self._positions_due:
+                # Reported recently; _run sends this one when the interval is up
+                self._positions_pending = True
+                return
+            self._positions_due = now + self.position_interval
+            self._positions_pending = False
+            changed = []
+            for position, job in enumerate(self._ordered(), 1):
+                if job.position != position:
+                    job.position = position
+                    changed.append(job)
+        for job in changed:
+            if job.on_position:
+                job.on_position(job.position)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if now - self._window_started >= self.credit_window:
+            self._window_started = now
+            self._spent = 0.0
+
+    def _wait_time(self, job, now):
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.credit_budget and self._spent + job.cost > self.credit_budget:
+            return self._window_started + self.credit_window - now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0
+
+    def _run(self):
+        while True:
+            if self._positions_pending and time.monotonic() >= self._positions_due:
+                self._report_positions()
+            with self._cond:
+                while not self._closed and not self._size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._peek()
+            # Outside the lock: is_live looks at shared session state
+            live = job.is_live() if job.is_live else True
+            with self._cond:
+                if self._closed:
+                    return
+                if not live:
+                    # Everyone who asked for it has gone; don't spend a token on it.
+                    # Only this thread pops, so the job is still at the head of its user's queue
+                    self._pop(job)
+                    self.dropped += 1
+                    dispatch = False
+                elif self._peek() is not job:
+                    # A more urgent job arrived meanwhile
+                    continue
+                else:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(job, now)
+                    if wait > 0:
+                        if self._positions_pending:
+                            wait = min(wait, max(self._positions_due - now, 0.01))
+                        self._cond.wait(wait)
+                        continue
+                    self._pop(job)
+                    self._tokens -= 1
+                    self._spent += job.cost
+                    self.dispatched += 1
+                    self.max_wait_seconds = max(self.max_wait_seconds, time.time() - job.enqueued_at)
+                    dispatch = True
+            try:
+                if dispatch:
+                    job.run()
+                elif job.on_drop:
+                    job.on_drop()
+            except Exception as e:
+                log.error('job_start_failed', room_id=job.room_id, error=str(e))
+            self._report_positions()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'queued': self._size,
+                'queued_by_priority': {PRIORITY_NAMES.get(priority, priority): sum(len(jobs) for users in rooms.values() for jobs in users.values())
+                                       for priority, rooms in self._queues.items()},
+                'max_queue': self.max_queue,
+                'tokens': round(self._tokens, 3),
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'credits_spent': round(self._spent, 3),
+                'credit_budget': self.credit_budget,
+                'credit_window_seconds': self.credit_window,
+                'paused_seconds': round(max(self._paused_until - time.monotonic(), 0), 3),
+                'submitted': self.submitted,
+                'dispatched': self.dispatched,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'max_wait_seconds': round(self.max_wait_seconds, 3)
+            }
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+import time
+
+
+class ChunkSequencer:
+    """Hands streamed dubbing chunks to each listener in order.
+
+    Chunks of one recording are dubbed in parallel and finish in any order,
+    possibly on different workers (a webhook can land anywhere). Each
+    (stream, listener) keeps its next expected index and the results that
+    arrived early in the shared state backend; complete() releases every
+    result that is now in sequence. The stream entry is rewritten on every
+    completion, so results must be small JSON references, not audio: a
+    result that has to wait goes through park() first, and discard() is
+    called for parked results of streams that are dropped.
+    """
+
+    def __init__(self, backend, ttl_seconds=600, discard=None):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.discard = discard
+
+    @staticmethod
+    def _key(stream_id, sid):
+        return f"{stream_id}:{sid}"
+
+    def open(self, stream_id, sid, total):
+        self._prune()
+        self.backend.hset('dubbing_streams', self._key(stream_id, sid), {
+            'total': total,
+            'next': 0,
+            'ready': {},
+            'opened_at': time.time()
+        })
+
+    def complete(self, stream_id, sid, index, result, release, park=None):
+        """Record chunk index and call release(index, total, result) for each chunk now in order.
+
+        If index can't be released yet, park(result) is stored in its place.
+        """
+        key = self._key(stream_id, sid)
+        with self.backend.lock('dubbing_stream:' + key):
+            stream = self.backend.hget('dubbing_streams', key)
+            if stream is None:
+                # Listener went away, or the stream expired
+                return 0
+            if index != stream['next'] and park is not None:
+                result = park(result)
+            # Keys are strings so the entry round-trips through JSON
+            stream['ready'][str(index)] = result
+            released = 0
+            # Released while holding the lock so two workers can't interleave their emits
+            while str(stream['next']) in stream['ready']:
+                release(stream['next'], stream['total'], stream['ready'].pop(str(stream['next'])))
+                stream['next'] += 1
+                released += 1
+            if stream['next'] >= stream['total']:
+                self.backend.hdel('dubbing_streams', key)
+            else:
+                self.backend.hset('dubbing_streams', key, stream)
+            return released
+
+    def close(self, sid):
+        # The listener disconnected; their streams are never released
+        suffix = ':' + sid
+        for key in self.backend.hkeys('dubbing_streams'):
+            if key.endswith(suffix):
+                self._drop(key)
+
+    def _prune(self):
+        # A chunk whose job was lost never completes; don't hold its stream forever
+        cutoff = time.time() - self.ttl_seconds
+        for key, stream in self.backend.hgetall('dubbing_streams').items():
+            if stream['opened_at'] < cutoff:
+                self._drop(key)
+
+    def _drop(self, key):
+        with self.backend.lock('dubbing_stream:' + key):
+            stream = self.backend.hget('dubbing_streams', key)
+            self.backend.hdel('dubbing_streams', key)
+        if stream and self.discard:
+            for result in stream['ready'].values():
+                self.discard(result)
+
+    def __len__(self):
+        return self.backend.hlen('dubbing_streams')
+
+
+class ParkedChunks:
+    """Audio of dubbed chunks that are waiting for an earlier chunk, one file per (stream, listener, index).
+
+    Kept out of the content-addressed blob store on purpose: listeners of the
+    same stream park identical bytes, and each has to be able to take or
+    discard its own copy without deleting the other's.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def name(stream_id, sid, index):
+        return f"{stream_id}:{sid}:{index}"
+
+    def _path(self, name):
+        name_hash = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, name_hash[:2], name_hash)
+
+    def put(self, name, data):
+        path = self._path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+    def take(self, name):
+        """The parked audio, removed from the store, or None if it is gone."""
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as chunk_file:
+                data = chunk_file.read()
+        except FileNotFoundError:
+            return None
+        self.discard(name)
+        return data
+
+    def discard(self, name):
+        try:
+            os.unlink(self._path(name))
+        except FileNotFoundError:
+            pass
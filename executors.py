@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class ExecutorTimeout(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on queued work, per-call deadlines and
+    cancellation of everything a given owner (socket sid) submitted.
+
+    Work that is still queued when its deadline passes, or whose owner went
+    away, is dropped without running. Work that is already running cannot be
+    interrupted, so blocking calls made inside it need their own timeouts.
+    """
+
+    def __init__(self, name, max_workers, max_queue, default_timeout):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._by_owner = {}
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def submit(self, fn, *args, owner=None, timeout=None, **kwargs):
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy(f"{self.name} pool is busy")
+            self._pending += 1
+            self.submitted += 1
+
+        future = self._pool.submit(self._run, fn, args, kwargs, deadline)
+        future.deadline = deadline
+        if owner is not None:
+            with self._lock:
+                self._by_owner.setdefault(owner, set()).add(future)
+        future.add_done_callback(lambda done: self._done(done, owner))
+        return future
+
+    def run(self, fn, *args, owner=None, timeout=None, **kwargs):
+        """Submit and wait for the result, raising ExecutorTimeout past the deadline."""
+        future = self.submit(fn, *args, owner=owner, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout=max(future.deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise ExecutorTimeout(f"{self.name} call exceeded its deadline")
+        except CancelledError:
+            raise ExecutorTimeout(f"{self.name} call was cancelled")
+
+    def _run(self, fn, args, kwargs, deadline):
+        if time.monotonic() > deadline:
+            with self._lock:
+                self.timed_out += 1
+            raise ExecutorTimeout(f"{self.name} call expired in the queue")
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _done(self, future, owner):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+            if owner is not None:
+                futures = self._by_owner.get(owner)
+                if futures:
+                    futures.discard(future)
+                    if not futures:
+                        del self._by_owner[owner]
+
+    def cancel_owner(self, owner):
+        """Drop queued work submitted on behalf of owner. Returns how many were cancelled."""
+        with self._lock:
+            futures = list(self._by_owner.get(owner, ()))
+        return sum(1 for future in futures if future.cancel())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queued': self._pending - self._running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'cancelled': self.cancelled
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
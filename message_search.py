@@ -0,0 +1,281 @@
+import base64
+import html
+import os
+import re
+from datetime import datetime, timedelta
+
+from models import db
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Relevance ranks the newest matches only, so a common word costs the same in a
+# room with a thousand messages as in one with millions
+RELEVANCE_WINDOW = 500
+
+# BM25 term-frequency part, original text weighing more than translations
+BM25_K1 = 1.2
+BM25_B = 0.75
+COLUMN_WEIGHTS = (1.0, 0.5)
+SNIPPET_TOKENS = 12
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+# chat_message ids follow write-behind flush order, not timestamp order: a row can
+# get its id up to a flush interval (plus clock skew between workers) after its
+# timestamp. Date filters turn into rowid bounds taken this far outside the range.
+ROWID_SLACK_SECONDS = int(os.getenv('SEARCH_ROWID_SLACK_SECONDS', 300))
+
+# One row per text message, rowid = chat_message.id. Translations are folded
+# into the same row by trigger, whichever of the two rows is flushed first.
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+        message, translations, room_key, user_key, language_key,
+        room_id UNINDEXED, message_uuid UNINDEXED, username UNINDEXED, language UNINDEXED, timestamp UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS message_search_insert AFTER INSERT ON chat_message
+    WHEN new.message IS NOT NULL BEGIN
+        INSERT INTO message_search(rowid, message, translations, room_key, user_key, language_key,
+                                   room_id, message_uuid, username, language, timestamp)
+        VALUES (new.id, new.message,
+                (SELECT group_concat(translated_text, char(10)) FROM message_translation WHERE message_uuid = new.message_uuid),
+                'r' || hex(new.room_id), 'u' || hex(new.username), 'l' || hex(new.language), new.room_id, new.message_uuid, new.username, new.language, new.timestamp);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_search_delete AFTER DELETE ON chat_message BEGIN
+        DELETE FROM message_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_search_translation AFTER INSERT ON message_translation BEGIN
+        UPDATE message_search SET translations = coalesce(translations || char(10), '') || new.translated_text
+        WHERE rowid = (SELECT id FROM chat_message WHERE message_uuid = new.message_uuid);
+    END""",
+]
+
+BACKFILL = """
+    INSERT INTO message_search(rowid, message, translations, room_key, user_key, language_key,
+                               room_id, message_uuid, username, language, timestamp)
+    SELECT m.id, m.message,
+           (SELECT group_concat(translated_text, char(10)) FROM message_translation t WHERE t.message_uuid = m.message_uuid),
+           'r' || hex(m.room_id), 'u' || hex(m.username), 'l' || hex(m.language), m.room_id, m.message_uuid, m.username, m.language, m.timestamp
+    FROM chat_message m WHERE m.message IS NOT NULL
+"""
+
+QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def is_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def setup():
+    """Create the index and its triggers; fills it from existing rows the first time."""
+    if not is_supported():
+        return False
+    with db.engine.begin() as connection:
+        created = not connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'message_search'").first()
+        for statement in SCHEMA:
+            connection.exec_driver_sql(statement)
+        if created:
+            connection.exec_driver_sql(BACKFILL)
+    return True
+
+
+def key_token(prefix, value):
+    # One exact token per room/user/language (the hex SQLite's hex() produces), so
+    # filters intersect doclists instead of scanning, and "circle-a" never matches "circle-a-b"
+    return prefix + value.encode('utf-8').hex().upper()
+
+
+def build_match(query):
+    """Turn user input into a safe FTS5 expression: every word or "quoted phrase"
+    must appear; the last bare word also matches as a prefix (search as you type)."""
+    terms = []
+    for phrase, word in QUERY_TERM.findall(query or ''):
+        text = (phrase or word).replace('"', ' ').strip()
+        if text:
+            terms.append((text, bool(word)))
+    if not terms:
+        raise ValueError('Search query is empty')
+    parts = [f'"{text}"' for text, _ in terms]
+    if terms[-1][1] and len(terms[-1][0]) >= 2:
+        # Prefixes shorter than the smallest prefix index would expand to half the vocabulary
+        parts[-1] += '*'
+    return '{message translations}: (' + ' AND '.join(parts) + ')'
+
+
+def _db_timestamp(value, name):
+    # Same text format SQLAlchemy stores DateTime in, so UNINDEXED values compare correctly
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} date")
+
+
+def encode_cursor(sort, value):
+    return base64.urlsafe_b64encode(f"{sort}|{value}".encode('ascii')).decode('ascii')
+
+
+def decode_cursor(sort, cursor):
+    try:
+        cursor_sort, value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|', 1)
+        value = int(value)
+    except Exception:
+        raise ValueError('Invalid search cursor')
+    if cursor_sort != sort or value < 0:
+        raise ValueError('Invalid search cursor')
+    return value
+
+
+def highlight(snippet):
+    # Escape the user's text first, then turn the markers into <mark> tags
+    return html.escape(snippet or '').replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def _column_score(highlighted, weight, average_tokens):
+    matches = (highlighted or '').count(HIGHLIGHT_START)
+    if not matches:
+        return 0.0
+    length = len(highlighted.split()) / average_tokens if average_tokens else 1.0
+    return weight * matches * (BM25_K1 + 1) / (matches + BM25_K1 * (1 - BM25_B + BM25_B * length))
+
+
+def _rank(rows):
+    """BM25-style scores from the highlighted columns.
+
+    Every candidate matched every query term (terms are ANDed), so the
+    collection-wide idf part of BM25 adds little and is left out. bm25()
+    would need a pass over each term's full doclist.
+    """
+    averages = []
+    for column in range(len(COLUMN_WEIGHTS)):
+        lengths = [len(row[column + 1].split()) for row in rows if row[column + 1]]
+        averages.append(sum(lengths) / len(lengths) if lengths else 0)
+    scored = [(sum(_column_score(row[column + 1], weight, averages[column])
+                   for column, weight in enumerate(COLUMN_WEIGHTS)), row[0]) for row in rows]
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return scored
+
+
+def _outside_rowid(room_id, timestamp, operator, direction):
+    """id of the room's row nearest to timestamp on the far side of it, or None.
+
+    With timestamp at least ROWID_SLACK_SECONDS outside the searched range, that
+    row was flushed before (or after) every row in the range, so its id bounds
+    theirs. One seek on ix_chat_message_room_timestamp, no scan of the range.
+    """
+    sql = (f'SELECT id FROM chat_message WHERE room_id = :room_id AND timestamp {operator} :timestamp'
+           f' ORDER BY timestamp {direction}, id {direction} LIMIT 1')
+    row = db.session.execute(db.text(sql), {'room_id': room_id, 'timestamp': timestamp}).first()
+    return row[0] if row else None
+
+
+def _shift(timestamp, seconds):
+    return (datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f') + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def search(room_id, query, username=None, language=None, since=None, until=None,
+           sort='relevance', cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return (results, next_cursor) for one room.
+
+    sort='recent' walks matches newest first with a rowid keyset cursor.
+    sort='relevance' ranks the newest RELEVANCE_WINDOW matches and pages
+    through them by offset. Both only ever stream rowids in descending order,
+    which FTS5 does without touching the rest of the doclist.
+    """
+    if sort not in ('relevance', 'recent'):
+        raise ValueError('Unknown sort')
+    try:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+
+    keys = [f"room_key: {key_token('r', room_id)}"]
+    params = {'room_id': room_id}
+    conditions = ['message_search MATCH :match', 'room_id = :room_id']
+    if username:
+        keys.append(f"user_key: {key_token('u', username)}")
+        conditions.append('username = :username')
+        params['username'] = username
+    if language:
+        keys.append(f"language_key: {key_token('l', language)}")
+        conditions.append('language = :language')
+        params['language'] = language
+    if since:
+        params['since'] = _db_timestamp(since, 'since')
+        conditions.append('timestamp >= :since')
+    if until:
+        params['until'] = _db_timestamp(until, 'until')
+        conditions.append('timestamp <= :until')
+    # Rows are inserted roughly in time order, so the date range also becomes a rowid
+    # range FTS5 can seek to; the timestamp conditions above stay exact
+    if since:
+        after_rowid = _outside_rowid(room_id, _shift(params['since'], -ROWID_SLACK_SECONDS), '<', 'DESC')
+        if after_rowid is not None:
+            conditions.append('rowid > :after_rowid')
+            params['after_rowid'] = after_rowid
+    if until:
+        before_rowid = _outside_rowid(room_id, _shift(params['until'], ROWID_SLACK_SECONDS), '>', 'ASC')
+        if before_rowid is not None:
+            conditions.append('rowid < :before_rowid')
+            params['before_rowid'] = before_rowid
+    params['match'] = ' AND '.join(keys) + ' AND ' + build_match(query)
+
+    scores = {}
+    next_cursor = None
+    if sort == 'recent':
+        if cursor:
+            conditions.append('rowid < :before')
+            params['before'] = decode_cursor(sort, cursor)
+        params['limit'] = limit + 1
+        rowids = [row[0] for row in db.session.execute(db.text(
+            f"SELECT rowid FROM message_search WHERE {' AND '.join(conditions)} ORDER BY rowid DESC LIMIT :limit"
+        ), params)]
+        if len(rowids) > limit:
+            rowids = rowids[:limit]
+            next_cursor = encode_cursor(sort, rowids[-1])
+    else:
+        offset = decode_cursor(sort, cursor) if cursor else 0
+        params['limit'] = RELEVANCE_WINDOW
+        candidates = db.session.execute(db.text(f"""
+            SELECT rowid, highlight(message_search, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}'),
+                   highlight(message_search, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}')
+            FROM message_search WHERE {' AND '.join(conditions)} ORDER BY rowid DESC LIMIT :limit
+        """), params).fetchall()
+        ranked = _rank(candidates)
+        page = ranked[offset:offset + limit]
+        rowids = [rowid for _, rowid in page]
+        scores = {rowid: score for score, rowid in page}
+        if offset + limit < len(ranked):
+            next_cursor = encode_cursor(sort, offset + limit)
+
+    if not rowids:
+        return [], None
+
+    # Snippets only for the rows on this page
+    rowid_params = {f'rowid{i}': rowid for i, rowid in enumerate(rowids)}
+    rows = db.session.execute(db.text(f"""
+        SELECT rowid, message_uuid, username, language, timestamp,
+               snippet(message_search, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}) AS message_snippet,
+               snippet(message_search, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}) AS translation_snippet
+        FROM message_search
+        WHERE message_search MATCH :match AND rowid IN ({', '.join(':' + name for name in rowid_params)})
+    """), dict(rowid_params, match=params['match'])).fetchall()
+    by_rowid = {row.rowid: row for row in rows}
+
+    results = []
+    for rowid in rowids:
+        row = by_rowid.get(rowid)
+        if row is None:
+            continue
+        result = {
+            'id': row.message_uuid,
+            'username': row.username,
+            'language': row.language,
+            'timestamp': datetime.fromisoformat(row.timestamp).isoformat(),
+            # Prefer the original text; fall back to the translation that matched
+            'snippet': highlight(row.message_snippet if HIGHLIGHT_START in (row.message_snippet or '') else row.translation_snippet),
+            'matched_translation': HIGHLIGHT_START not in (row.message_snippet or '')
+        }
+        if sort == 'relevance':
+            result['score'] = round(scores[rowid], 4)
+        results.append(result)
+    return results, next_cursor
@@ -0,0 +1,169 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name + '_total', key, (), value
+
+
+class Gauge:
+    """Value read from a callback at scrape time, so it can't drift from the source."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ()
+        self.function = function
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception:
+            return
+        yield self.name, (), (), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield self.name + '_bucket', key, (('le', _format_value(bound)),), cumulative
+            yield self.name + '_sum', key, (), total
+            yield self.name + '_count', key, (), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, function):
+        return self.register(Gauge(name, documentation, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+handler_seconds = registry.histogram(
+    'circle_socketio_handler_seconds', 'Time spent in Socket.IO event handlers.', ['event'])
+handler_errors = registry.counter(
+    'circle_socketio_handler_errors', 'Socket.IO event handlers that raised.', ['event'])
+outbound_seconds = registry.histogram(
+    'circle_outbound_request_seconds', 'Latency of calls to Murf, the translator and audio downloads.',
+    ['provider', 'operation'])
+outbound_errors = registry.counter(
+    'circle_outbound_request_errors', 'Failed calls to Murf, the translator and audio downloads.',
+    ['provider', 'operation'])
+murf_errors = registry.counter(
+    'circle_murf_errors', 'Dubbing errors reported to users, by category.', ['category'])
+
+
+def instrument_handler(event):
+    """Record latency and errors for a Socket.IO handler."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(event=event)
+                raise
+            finally:
+                handler_seconds.observe(time.perf_counter() - started, event=event)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def timed_call(provider, operation):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        outbound_errors.inc(provider=provider, operation=operation)
+        raise
+    finally:
+        outbound_seconds.observe(time.perf_counter() - started, provider=provider, operation=operation)
@@ -0,0 +1,67 @@
+"""Move base64 voice audio out of ChatMessage.audio_data into the blob store.
+
+Usage:
+    python migrate_audio_blobs.py [--batch-size 200] [--vacuum]
+
+Safe to re-run: rows that already have an audio_hash are skipped, and the
+blob store deduplicates identical recordings.
+"""
+import argparse
+import base64
+
+from app import app, blob_store
+from models import db, ChatMessage
+
+
+def migrate(batch_size=200):
+    migrated = 0
+    failed = 0
+    last_id = 0
+
+    with app.app_context():
+        while True:
+            rows = ChatMessage.query.filter(
+                ChatMessage.id > last_id,
+                ChatMessage.audio_data.isnot(None)
+            ).order_by(ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            for row in rows:
+                last_id = row.id
+                try:
+                    audio_bytes = base64.b64decode(row.audio_data)
+                except Exception as e:
+                    print(f"[MIGRATE] Skipping message {row.message_uuid}: {e}")
+                    failed += 1
+                    continue
+
+                row.audio_hash = blob_store.put(audio_bytes)
+                row.audio_length = len(audio_bytes)
+                row.audio_data = None
+                migrated += 1
+
+            db.session.commit()
+            print(f"[MIGRATE] Migrated {migrated} voice messages so far")
+
+    return migrated, failed
+
+
+def vacuum():
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--vacuum', action='store_true', help='reclaim freed space in the database file afterwards')
+    args = parser.parse_args()
+
+    migrated, failed = migrate(args.batch_size)
+    print(f"[MIGRATE] Done: {migrated} migrated, {failed} skipped")
+
+    if args.vacuum:
+        print("[MIGRATE] Running VACUUM...")
+        vacuum()
@@ -14,10 +14,18 @@ class Circle(db.Model):
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     image = db.Column(db.Text, nullable=True)
+    image_hash = db.Column(db.String(64), nullable=True)
+    thumbnail_hash = db.Column(db.String(64), nullable=True)
     color = db.Column(db.String(20), nullable=True)
     emoji = db.Column(db.String(200), nullable=True)
     owner_username = db.Column(db.String(80), nullable=False)
+    # Per-circle overrides of AUDIO_RETENTION_DAYS / TEXT_RETENTION_DAYS; NULL uses the default
+    audio_retention_days = db.Column(db.Integer, nullable=True)
+    text_retention_days = db.Column(db.Integer, nullable=True)
+    # Dub every voice message into the listeners' languages before anyone asks
+    auto_dub = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,4 +36,79 @@ class ChatMessage(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     message_uuid = db.Column(db.String(36), unique=True)
     message_type = db.Column(db.String(10), default='text')
-    audio_data = db.Column(db.Text, nullable=True)
\ No newline at end of file
+    audio_data = db.Column(db.Text, nullable=True)
+    audio_hash = db.Column(db.String(64), nullable=True)
+    audio_length = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_chat_message_room_timestamp', 'room_id', 'timestamp', 'id'),
+    )
+
+class MessageTranslation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    message_uuid = db.Column(db.String(36), nullable=False)
+    language = db.Column(db.String(10), nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_message_translation_message', 'message_uuid', 'language'),
+    )
+
+class CircleSummary(db.Model):
+    # Maintained incrementally by circle_summary.CircleSummaryStore, never recomputed from ChatMessage
+    room_id = db.Column(db.String(100), primary_key=True)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    participant_count = db.Column(db.Integer, nullable=False, default=0)
+    languages = db.Column(db.String(200), nullable=False, default='')
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    last_message_username = db.Column(db.String(80), nullable=True)
+    last_message_type = db.Column(db.String(10), nullable=True)
+    last_message_preview = db.Column(db.String(200), nullable=True)
+    last_activity_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_circle_summary_activity', 'last_activity_at', 'room_id'),
+        db.Index('ix_circle_summary_participants', 'participant_count', 'room_id'),
+    )
+
+class CachedTranslation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text_hash = db.Column(db.String(64), nullable=False)
+    source_language = db.Column(db.String(10), nullable=False)
+    target_language = db.Column(db.String(10), nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('text_hash', 'source_language', 'target_language'),
+    )
+
+# Columns and indexes added after the first release; db.create_all() only creates missing tables
+ADDED_COLUMNS = {
+    'chat_message': [
+        ('audio_hash', 'VARCHAR(64)'),
+        ('audio_length', 'INTEGER'),
+    ],
+    'circle': [
+        ('image_hash', 'VARCHAR(64)'),
+        ('thumbnail_hash', 'VARCHAR(64)'),
+        ('updated_at', 'DATETIME'),
+        ('audio_retention_days', 'INTEGER'),
+        ('text_retention_days', 'INTEGER'),
+        ('auto_dub', 'BOOLEAN NOT NULL DEFAULT 0'),
+    ],
+}
+
+def upgrade_schema():
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    connection.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
@@ -0,0 +1,119 @@
+class PresenceRegistry:
+    """Who is in which room, with a sid -> rooms reverse index.
+
+    Every operation touches only the rooms the sid is actually in, so a
+    disconnect costs O(rooms of that sid) rather than O(all rooms). State lives
+    in a state_store backend so every worker process sees the same rooms.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _room_key(room_id):
+        return f"presence:room:{room_id}"
+
+    @staticmethod
+    def _names_key(room_id):
+        return f"presence:names:{room_id}"
+
+    @staticmethod
+    def _languages_key(room_id):
+        return f"presence:languages:{room_id}"
+
+    @staticmethod
+    def _sid_key(sid):
+        return f"presence:sid:{sid}"
+
+    @staticmethod
+    def effective_language(entry):
+        # The language a member reads the circle in
+        return entry.get('circle_language') or entry.get('language') or 'en'
+
+    def _count_language(self, room_id, language, amount):
+        if self.backend.hincrby(self._languages_key(room_id), language, amount) <= 0:
+            self.backend.hdel(self._languages_key(room_id), language)
+
+    def join(self, room_id, sid, username, **info):
+        """Add sid to room_id. Returns entries replaced because the same username rejoined."""
+        entry = dict(info, sid=sid, username=username)
+        with self.backend.lock(self._room_key(room_id)):
+            replaced = []
+            previous_sid = self.backend.hget(self._names_key(room_id), username)
+            if previous_sid and previous_sid != sid:
+                previous = self._remove(room_id, previous_sid)
+                if previous:
+                    replaced.append(previous)
+            previous = self.backend.hget(self._room_key(room_id), sid)
+            if previous:
+                self._count_language(room_id, self.effective_language(previous), -1)
+            self.backend.hset(self._room_key(room_id), sid, entry)
+            self.backend.hset(self._names_key(room_id), username, sid)
+            self._count_language(room_id, self.effective_language(entry), 1)
+            self.backend.sadd(self._sid_key(sid), room_id)
+            self.backend.sadd('presence:rooms', room_id)
+        return replaced
+
+    def leave(self, room_id, sid):
+        with self.backend.lock(self._room_key(room_id)):
+            return self._remove(room_id, sid)
+
+    def disconnect(self, sid):
+        """Remove sid everywhere. Returns [(room_id, entry)] for the rooms it was in."""
+        left = []
+        for room_id in self.backend.smembers(self._sid_key(sid)):
+            entry = self.leave(room_id, sid)
+            if entry:
+                left.append((room_id, entry))
+        self.backend.delete(self._sid_key(sid))
+        return left
+
+    def _remove(self, room_id, sid):
+        entry = self.backend.hget(self._room_key(room_id), sid)
+        if entry and self.backend.hdel(self._room_key(room_id), sid):
+            if self.backend.hget(self._names_key(room_id), entry['username']) == sid:
+                self.backend.hdel(self._names_key(room_id), entry['username'])
+            self._count_language(room_id, self.effective_language(entry), -1)
+        else:
+            entry = None
+        self.backend.srem(self._sid_key(sid), room_id)
+        if not self.backend.hlen(self._room_key(room_id)):
+            self.backend.srem('presence:rooms', room_id)
+        return entry
+
+    def update(self, sid, **info):
+        for room_id in self.backend.smembers(self._sid_key(sid)):
+            with self.backend.lock(self._room_key(room_id)):
+                entry = self.backend.hget(self._room_key(room_id), sid)
+                if entry:
+                    updated = dict(entry, **info)
+                    self.backend.hset(self._room_key(room_id), sid, updated)
+                    if self.effective_language(updated) != self.effective_language(entry):
+                        self._count_language(room_id, self.effective_language(entry), -1)
+                        self._count_language(room_id, self.effective_language(updated), 1)
+
+    def members(self, room_id):
+        return [dict(entry) for entry in self.backend.hgetall(self._room_key(room_id)).values()]
+
+    def has_member(self, room_id, **match):
+        return any(all(entry.get(key) == value for key, value in match.items())
+                   for entry in self.backend.hgetall(self._room_key(room_id)).values())
+
+    def languages(self, room_id):
+        """Distinct reading languages in the room, maintained incrementally."""
+        return {language for language, count in self.backend.hgetall(self._languages_key(room_id)).items() if count > 0}
+
+    def count(self, room_id):
+        return self.backend.hlen(self._room_key(room_id))
+
+    def rooms_of(self, sid):
+        return self.backend.smembers(self._sid_key(sid))
+
+    def room_ids(self):
+        return list(self.backend.smembers('presence:rooms'))
+
+    def __contains__(self, room_id):
+        return self.backend.hlen(self._room_key(room_id)) > 0
+
+    def __len__(self):
+        return self.backend.scard('presence:rooms')
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import structured_log
+from chat_archive import archive_entry
+from chat_history import load_translations
+from models import db, ChatMessage, MessageTranslation, Circle
+
+log = structured_log.get_logger('retention')
+
+# Voice audio is the bulk of the database and blob store, so it goes first
+AUDIO_RETENTION_DAYS = int(os.getenv('AUDIO_RETENTION_DAYS', 30))
+TEXT_RETENTION_DAYS = int(os.getenv('TEXT_RETENTION_DAYS', 365))
+# Text older than this leaves ChatMessage for the archive, where it stays readable
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+# A blob written again within this window may be about to gain a new reference
+BLOB_GRACE_SECONDS = int(os.getenv('BLOB_GRACE_SECONDS', 3600))
+SEGMENT_SIZE = 1000
+
+
+class RetentionPolicy:
+    def __init__(self, audio_days=AUDIO_RETENTION_DAYS, text_days=TEXT_RETENTION_DAYS, archive_after_days=ARCHIVE_AFTER_DAYS):
+        self.audio_days = audio_days
+        self.text_days = text_days
+        # Text can't stay hot longer than it is kept at all
+        self.archive_after_days = min(archive_after_days, text_days)
+
+    @classmethod
+    def for_circle(cls, circle):
+        if circle is None:
+            return cls()
+        return cls(
+            audio_days=circle.audio_retention_days if circle.audio_retention_days is not None else AUDIO_RETENTION_DAYS,
+            text_days=circle.text_retention_days if circle.text_retention_days is not None else TEXT_RETENTION_DAYS
+        )
+
+    def to_dict(self):
+        return {'audio_days': self.audio_days, 'text_days': self.text_days, 'archive_after_days': self.archive_after_days}
+
+
+def parse_retention_days(value):
+    """Validate a per-circle override from the API; None/'' resets it to the default."""
+    if value is None or value == '':
+        return None
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Retention must be a whole number of days')
+    if days < 1:
+        raise ValueError('Retention must be at least one day')
+    return days
+
+
+def _candidate_rooms(now):
+    # Rooms holding anything old enough to move under the shortest policy in use
+    overrides = db.session.query(
+        db.func.min(Circle.audio_retention_days), db.func.min(Circle.text_retention_days)).one()
+    shortest = min(filter(None, [AUDIO_RETENTION_DAYS, ARCHIVE_AFTER_DAYS, TEXT_RETENTION_DAYS, *overrides]))
+    cutoff = now - timedelta(days=shortest)
+    return [room_id for (room_id,) in db.session.query(ChatMessage.room_id).filter(ChatMessage.timestamp < cutoff).distinct()]
+
+
+def release_blobs(blob_store, blob_hashes):
+    """Delete blobs no remaining message or circle image refers to."""
+    if not blob_hashes:
+        return 0
+    blob_hashes = set(blob_hashes)
+    referenced = {row[0] for row in db.session.query(ChatMessage.audio_hash).filter(ChatMessage.audio_hash.in_(blob_hashes))}
+    referenced |= {row[0] for row in db.session.query(Circle.image_hash).filter(Circle.image_hash.in_(blob_hashes))}
+    referenced |= {row[0] for row in db.session.query(Circle.thumbnail_hash).filter(Circle.thumbnail_hash.in_(blob_hashes))}
+    deleted = 0
+    for blob_hash in blob_hashes - referenced:
+        age = blob_store.age(blob_hash)
+        # Recently re-put: a row for the same recording may still be in the write-behind queue
+        if age is not None and age >= BLOB_GRACE_SECONDS and blob_store.delete(blob_hash):
+            deleted += 1
+    return deleted
+
+
+def compact_room(room_id, policy, archive, blob_store, now=None, batch_size=SEGMENT_SIZE):
+    """Move the room's aged rows into archive segments and expire old segments.
+
+    Text rows older than archive_after_days and voice rows whose audio is past
+    audio_days are written to segments (voice without its audio), then
+    deleted from ChatMessage/MessageTranslation together with their search
+    rows. The segment is durable before the delete commits, so a crash in
+    between leaves a duplicate that readers drop, never a gap.
+    """
+    now = now or datetime.utcnow()
+    text_cutoff = now - timedelta(days=policy.archive_after_days)
+    audio_cutoff = now - timedelta(days=policy.audio_days)
+    expire_cutoff = now - timedelta(days=policy.text_days)
+    result = {'archived': 0, 'segments': 0, 'blobs_deleted': 0, 'expired': 0}
+
+    while True:
+        rows = ChatMessage.query.options(db.defer(ChatMessage.audio_data)).filter(
+            ChatMessage.room_id == room_id,
+            db.or_(
+                db.and_(ChatMessage.message_type != 'voice', ChatMessage.timestamp < text_cutoff),
+                db.and_(ChatMessage.message_type == 'voice', ChatMessage.timestamp < audio_cutoff)
+            )
+        ).order_by(ChatMessage.timestamp, ChatMessage.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        translations = load_translations(rows)
+        # One segment per calendar month, so expiry can drop whole segments close to the cutoff;
+        # rows already past text retention are deleted without being archived
+        months = {}
+        for row in rows:
+            if row.timestamp >= expire_cutoff:
+                months.setdefault((row.timestamp.year, row.timestamp.month), []).append(archive_entry(row, translations))
+        for entries in months.values():
+            archive.append_segment(room_id, entries)
+
+        blob_hashes = {row.audio_hash for row in rows if row.audio_hash}
+        message_ids = [row.id for row in rows]
+        message_uuids = [row.message_uuid for row in rows]
+        db.session.expunge_all()
+        db.session.execute(db.delete(MessageTranslation).where(MessageTranslation.message_uuid.in_(message_uuids)))
+        db.session.execute(db.delete(ChatMessage).where(ChatMessage.id.in_(message_ids)))
+        db.session.commit()
+
+        archived = sum(len(entries) for entries in months.values())
+        result['archived'] += archived
+        result['expired'] += len(rows) - archived
+        result['segments'] += len(months)
+        result['blobs_deleted'] += release_blobs(blob_store, blob_hashes)
+        if len(rows) < batch_size:
+            break
+
+    result['expired'] += archive.expire(room_id, expire_cutoff)
+    return result
+
+
+def run_retention(archive, blob_store, now=None):
+    """One pass over every room with aged rows or archived history."""
+    now = now or datetime.utcnow()
+    room_ids = set(_candidate_rooms(now)) | set(archive.rooms())
+    policies = {circle.id: RetentionPolicy.for_circle(circle)
+                for circle in Circle.query.filter(Circle.id.in_(room_ids))} if room_ids else {}
+
+    totals = {'rooms': 0, 'archived': 0, 'segments': 0, 'blobs_deleted': 0, 'expired': 0}
+    for room_id in sorted(room_ids):
+        result = compact_room(room_id, policies.get(room_id) or RetentionPolicy(), archive, blob_store, now=now)
+        if any(result.values()):
+            totals['rooms'] += 1
+            for key, value in result.items():
+                totals[key] += value
+    return totals
+
+
+class RetentionWorker:
+    """Runs run_retention every interval_seconds in a background thread.
+
+    Compaction isn't coordinated across processes, so enable it on one worker
+    only (or run compact_history.py from cron instead).
+    """
+
+    def __init__(self, app, archive, blob_store, interval_seconds):
+        self.app = app
+        self.archive = archive
+        self.blob_store = blob_store
+        self.interval = interval_seconds
+        self.last_run = None
+        self.last_result = None
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            started = time.time()
+            try:
+                with self.app.app_context():
+                    self.last_result = run_retention(self.archive, self.blob_store)
+                    log.info('retention_pass', seconds=round(time.time() - started, 1), **self.last_result)
+            except Exception as e:
+                self.failures += 1
+                log.warning('retention_pass_failed', error=str(e))
+                with self.app.app_context():
+                    db.session.rollback()
+            self.last_run = datetime.utcnow()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'interval_seconds': self.interval,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_result': self.last_result,
+            'failures': self.failures
+        }
@@ -0,0 +1,234 @@
+import json
+import threading
+from collections.abc import MutableMapping
+
+
+class MemoryBackend:
+    """Process-local state. Values are stored as-is, so callers must treat what
+    they read as a snapshot and write changes back, exactly as with Redis."""
+
+    def __init__(self):
+        self._hashes = {}
+        self._sets = {}
+        self._lists = {}
+        # Striped so per-key locks don't accumulate one Lock per room or job forever
+        self._locks = [threading.RLock() for _ in range(64)]
+        self._lock = threading.RLock()
+
+    def hget(self, name, key):
+        with self._lock:
+            return self._hashes.get(name, {}).get(key)
+
+    def hset(self, name, key, value):
+        with self._lock:
+            self._hashes.setdefault(name, {})[key] = value
+
+    def hsetnx(self, name, key, value):
+        with self._lock:
+            values = self._hashes.setdefault(name, {})
+            if key in values:
+                return False
+            values[key] = value
+            return True
+
+    def hdel(self, name, key):
+        with self._lock:
+            values = self._hashes.get(name)
+            if not values or key not in values:
+                return 0
+            del values[key]
+            if not values:
+                del self._hashes[name]
+            return 1
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            values = self._hashes.setdefault(name, {})
+            values[key] = values.get(key, 0) + amount
+            return values[key]
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._hashes.get(name, {}))
+
+    def hkeys(self, name):
+        with self._lock:
+            return list(self._hashes.get(name, {}))
+
+    def hlen(self, name):
+        with self._lock:
+            return len(self._hashes.get(name, {}))
+
+    def hexists(self, name, key):
+        with self._lock:
+            return key in self._hashes.get(name, {})
+
+    def sadd(self, name, member):
+        with self._lock:
+            self._sets.setdefault(name, set()).add(member)
+
+    def srem(self, name, member):
+        with self._lock:
+            members = self._sets.get(name)
+            if members:
+                members.discard(member)
+                if not members:
+                    del self._sets[name]
+
+    def smembers(self, name):
+        with self._lock:
+            return set(self._sets.get(name, ()))
+
+    def scard(self, name):
+        with self._lock:
+            return len(self._sets.get(name, ()))
+
+    def rpush(self, name, value):
+        with self._lock:
+            self._lists.setdefault(name, []).append(value)
+
+    def lrange(self, name):
+        with self._lock:
+            return list(self._lists.get(name, []))
+
+    def delete(self, name):
+        with self._lock:
+            self._hashes.pop(name, None)
+            self._sets.pop(name, None)
+            self._lists.pop(name, None)
+
+    def lock(self, name):
+        return self._locks[hash(name) % len(self._locks)]
+
+
+class RedisBackend:
+    """Shared state in any Redis-protocol server. Values are JSON encoded.
+
+    client is a redis.Redis (or compatible stand-in) created with
+    decode_responses=True.
+    """
+
+    def __init__(self, client, prefix='circle:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _name(self, name):
+        return self.prefix + name
+
+    @staticmethod
+    def _load(raw):
+        return None if raw is None else json.loads(raw)
+
+    def hget(self, name, key):
+        return self._load(self.client.hget(self._name(name), key))
+
+    def hset(self, name, key, value):
+        self.client.hset(self._name(name), key, json.dumps(value))
+
+    def hsetnx(self, name, key, value):
+        return bool(self.client.hsetnx(self._name(name), key, json.dumps(value)))
+
+    def hdel(self, name, key):
+        return self.client.hdel(self._name(name), key)
+
+    def hincrby(self, name, key, amount=1):
+        return self.client.hincrby(self._name(name), key, amount)
+
+    def hgetall(self, name):
+        return {key: json.loads(raw) for key, raw in self.client.hgetall(self._name(name)).items()}
+
+    def hkeys(self, name):
+        return list(self.client.hkeys(self._name(name)))
+
+    def hlen(self, name):
+        return self.client.hlen(self._name(name))
+
+    def hexists(self, name, key):
+        return bool(self.client.hexists(self._name(name), key))
+
+    def sadd(self, name, member):
+        self.client.sadd(self._name(name), member)
+
+    def srem(self, name, member):
+        self.client.srem(self._name(name), member)
+
+    def smembers(self, name):
+        return set(self.client.smembers(self._name(name)))
+
+    def scard(self, name):
+        return self.client.scard(self._name(name))
+
+    def rpush(self, name, value):
+        self.client.rpush(self._name(name), json.dumps(value))
+
+    def lrange(self, name):
+        return [json.loads(raw) for raw in self.client.lrange(self._name(name), 0, -1)]
+
+    def delete(self, name):
+        self.client.delete(self._name(name))
+
+    def lock(self, name):
+        return self.client.lock(self._name('lock:' + name), timeout=10, blocking_timeout=10)
+
+
+class SharedMap(MutableMapping):
+    """dict-style view over one hash in a state backend.
+
+    Reads return snapshots: mutate a value, then assign it back.
+    """
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    def __getitem__(self, key):
+        value = self.backend.hget(self.name, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backend.hset(self.name, key, value)
+
+    def __delitem__(self, key):
+        if not self.backend.hdel(self.name, key):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.backend.hexists(self.name, key)
+
+    def __iter__(self):
+        return iter(self.backend.hkeys(self.name))
+
+    def __len__(self):
+        return self.backend.hlen(self.name)
+
+    def get(self, key, default=None):
+        value = self.backend.hget(self.name, key)
+        return default if value is None else value
+
+    def items(self):
+        return list(self.backend.hgetall(self.name).items())
+
+    def values(self):
+        return list(self.backend.hgetall(self.name).values())
+
+    def pop(self, key, *default):
+        # Only the caller whose delete succeeds gets the value, so concurrent
+        # pops of the same key (e.g. webhook vs poller) have a single winner
+        value = self.backend.hget(self.name, key)
+        if value is not None and self.backend.hdel(self.name, key):
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+
+def create_backend(url=None):
+    if not url or url == 'memory://':
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return RedisBackend(redis.Redis.from_url(url, decode_responses=True))
+    raise ValueError(f"Unsupported state store URL: {url}")
+
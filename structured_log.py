@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+
+class StructuredLogger:
+    """One JSON object per line: {"ts", "level", "logger", "event", ...fields}.
+
+    Calls that pass sample=<rate> are kept with that probability, so per-message
+    and per-poll events can stay on in production without flooding the log.
+    Sampled records carry the rate so counts can be scaled back up.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level, event, sample, fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample is not None and sample < 1 and random.random() >= sample:
+            return
+        record = {'ts': round(time.time(), 3), 'level': logging.getLevelName(level).lower(), 'logger': self.name, 'event': event}
+        if sample is not None and sample < 1:
+            record['sample_rate'] = sample
+        record.update(fields)
+        self._logger.log(level, json.dumps(record, default=str))
+
+    def debug(self, event, sample=None, **fields):
+        self._log(logging.DEBUG, event, sample, fields)
+
+    def info(self, event, sample=None, **fields):
+        self._log(logging.INFO, event, sample, fields)
+
+    def warning(self, event, sample=None, **fields):
+        self._log(logging.WARNING, event, sample, fields)
+
+    def error(self, event, sample=None, **fields):
+        self._log(logging.ERROR, event, sample, fields)
+
+
+def configure(level=None):
+    root = logging.getLogger('circle')
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        root.addHandler(handler)
+        root.propagate = False
+    root.setLevel(LEVELS.get((level or os.getenv('LOG_LEVEL', 'info')).lower(), logging.INFO))
+
+
+def get_logger(name):
+    return StructuredLogger('circle.' + name)
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from broadcast_batcher import BroadcastBatcher
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def batcher(sent):
+    batchers = []
+
+    def make(**kwargs):
+        batcher = BroadcastBatcher(
+            lambda room_id, message: sent.append((room_id, 'single', [message])),
+            lambda room_id, messages: sent.append((room_id, 'batch', list(messages))),
+            **kwargs
+        )
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def delivered(sent, room_id):
+    return [message for room, _, messages in sent if room == room_id for message in messages]
+
+
+def test_quiet_rooms_send_each_message_at_once(batcher, sent):
+    b = batcher(threshold_per_second=100)
+    for i in range(5):
+        b.send('room', i)
+    assert sent == [('room', 'single', [i]) for i in range(5)]
+
+
+def test_busy_rooms_batch_without_reordering(batcher, sent):
+    b = batcher(threshold_per_second=2, window_ms=50, rate_window_seconds=1)
+    for i in range(20):
+        b.send('room', i)
+    b.flush()
+    assert delivered(sent, 'room') == list(range(20))
+    kinds = [kind for _, kind, _ in sent]
+    # Singles until the rate crosses the threshold, then one batch holding the rest
+    assert kinds[0] == 'single' and kinds[-1] == 'batch'
+    assert 'single' not in kinds[kinds.index('batch'):]
+
+
+def test_concurrent_senders_keep_their_own_order(batcher, sent):
+    b = batcher(threshold_per_second=50, window_ms=20, rate_window_seconds=1)
+
+    def sender(name):
+        for i in range(200):
+            b.send('room', (name, i))
+            if i % 50 == 0:
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=sender, args=(name,)) for name in 'abcd']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    b.flush()
+
+    messages = delivered(sent, 'room')
+    assert len(messages) == 800
+    for name in 'abcd':
+        assert [i for sender_name, i in messages if sender_name == name] == list(range(200))
+
+
+def test_follow_runs_after_the_pending_batch(batcher, sent):
+    b = batcher(threshold_per_second=1, window_ms=50, rate_window_seconds=1)
+    b.send('room', 'first')
+    b.send('room', 'second')
+    b.send('room', 'third')
+    b.follow('room', lambda: sent.append(('room', 'translation', ['for third'])))
+    b.send('room', 'fourth')
+
+    deadline = time.monotonic() + 5
+    while len(delivered(sent, 'room')) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    b.flush()
+    # Messages sent after follow() join the pending batch; the callback goes out right after it
+    assert delivered(sent, 'room') == ['first', 'second', 'third', 'fourth', 'for third']
+
+
+def test_follow_on_an_idle_room_runs_at_once(batcher, sent):
+    b = batcher(threshold_per_second=100)
+    ran = []
+    b.follow('room', lambda: ran.append(True))
+    assert ran == [True]
+
+
+def test_a_failing_emit_does_not_block_the_room(sent):
+    calls = []
+
+    def emit_single(room_id, message):
+        calls.append(message)
+        if message == 'bad':
+            raise RuntimeError('socket gone')
+
+    b = BroadcastBatcher(emit_single, lambda room_id, messages: None, threshold_per_second=100)
+    try:
+        for message in ['a', 'bad', 'b']:
+            b.send('room', message)
+    finally:
+        b.close()
+    assert calls == ['a', 'bad', 'b']
+    assert b.stats()['queued_frames'] == 0
@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from chat_archive import ArchiveStore
+
+
+def entry(message_id, timestamp):
+    return {'id': message_id, 'message_uuid': f"m{message_id}", 'username': 'alice', 'message': str(message_id),
+            'language': 'en', 'message_type': 'text', 'timestamp': timestamp.isoformat()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArchiveStore(str(tmp_path / 'archive'))
+
+
+@pytest.fixture
+def overlapping(store):
+    # Segments from repeated compaction runs overlap in time and arrive in any order
+    rng = random.Random(7)
+    base = datetime(2026, 1, 1)
+    keys = []
+    for _ in range(25):
+        entries = []
+        for _ in range(rng.randint(1, 30)):
+            message_id = len(keys) + 1
+            timestamp = base + timedelta(minutes=rng.randint(0, 3000))
+            keys.append((timestamp, message_id))
+            entries.append(entry(message_id, timestamp))
+        store.append_segment('room', entries)
+    return keys
+
+
+def test_load_before_matches_a_full_scan(store, overlapping):
+    rng = random.Random(11)
+    for _ in range(200):
+        limit = rng.randint(1, 60)
+        before = rng.choice([None] + overlapping)
+        after = rng.choice([None, None] + overlapping)
+        expected = sorted((key for key in overlapping
+                           if (before is None or key < before) and (after is None or key > after)), reverse=True)
+        got = [msg.sort_key for msg in store.load_before('room', before=before, after=after, limit=limit)]
+        assert got == expected[:limit]
+
+
+def test_load_before_stops_after_the_segments_it_needs(store):
+    base = datetime(2026, 1, 1)
+    for day in range(20):
+        store.append_segment('room', [entry(day * 10 + i, base + timedelta(days=day, minutes=i)) for i in range(10)])
+    reads = []
+    read = store._read
+    store._read = lambda room_id, segment: reads.append(segment['file']) or read(room_id, segment)
+
+    page = store.load_before('room', limit=15)
+    assert [msg.id for msg in page] == list(range(199, 184, -1))
+    assert len(reads) == 2
+
+    reads.clear()
+    page = store.load_before('room', before=page[-1].sort_key, limit=15)
+    assert [msg.id for msg in page] == list(range(184, 169, -1))
+    assert len(reads) == 2
+
+
+def test_duplicates_across_segments_do_not_break_paging(store):
+    base = datetime(2026, 1, 1)
+    rows = [entry(i, base + timedelta(minutes=i)) for i in range(5)]
+    store.append_segment('room', rows)
+    # A compaction that crashed after writing its segment archives the same rows again
+    store.append_segment('room', rows)
+    assert len(store.load_before('room', limit=3)) == 3
+
+
+def test_unknown_room_is_empty(store):
+    assert store.load_before('nowhere') == []
+    assert store.stats('nowhere')['segments'] == 0
+
+
+def test_expire_drops_whole_segments(store):
+    base = datetime(2026, 1, 1)
+    store.append_segment('room', [entry(1, base), entry(2, base + timedelta(days=1))])
+    store.append_segment('room', [entry(3, base + timedelta(days=10))])
+    assert store.expire('room', base + timedelta(days=5)) == 2
+    assert [msg.id for msg in store.load_before('room')] == [3]
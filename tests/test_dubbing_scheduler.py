@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from dubbing_scheduler import (BudgetExceeded, DubbingScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE,
+                               estimate_audio_seconds)
+from executors import ExecutorBusy
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def make(**kwargs):
+        kwargs.setdefault('rate_per_second', 1000)
+        kwargs.setdefault('burst', 1000)
+        scheduler = DubbingScheduler(**kwargs)
+        # Hold dispatch until every job of the test is queued
+        scheduler.pause(0.2)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_priority_then_round_robin_across_rooms_and_users(scheduler):
+    s = scheduler()
+    ran = []
+    names = {}
+
+    def submit(name, room, user, **kwargs):
+        names[s.submit(lambda: ran.append(name), room, user, **kwargs)] = name
+
+    for room, user, count in [('A', 'a1', 3), ('A', 'a2', 1), ('B', 'b1', 2)]:
+        for i in range(count):
+            submit(f"{user}-{i}", room, user)
+    submit('bulk', 'C', 'c', priority=PRIORITY_BULK)
+    submit('interactive', 'C', 'c', priority=PRIORITY_INTERACTIVE)
+    expected = ['interactive', 'a1-0', 'b1-0', 'a2-0', 'b1-1', 'a1-1', 'a1-2', 'bulk']
+    # The order positions are reported from matches the real dispatch order
+    with s._cond:
+        assert [names[job] for job in s._ordered()] == expected
+
+    wait_for(lambda: len(ran) == len(expected))
+    assert ran == expected
+
+
+def test_departed_listeners_are_dropped_without_spending(scheduler):
+    s = scheduler(credit_budget=10)
+    ran = []
+    s.submit(lambda: ran.append('dead'), 'A', 'u', cost=5, is_live=lambda: False, on_drop=lambda: ran.append('dropped'))
+    s.submit(lambda: ran.append('live'), 'A', 'v', cost=5)
+
+    wait_for(lambda: len(ran) == 2)
+    assert ran == ['dropped', 'live']
+    stats = s.stats()
+    assert stats['dropped'] == 1
+    assert stats['dispatched'] == 1
+    assert stats['credits_spent'] == 5
+
+
+def test_is_live_is_called_without_the_scheduler_lock(scheduler):
+    s = scheduler()
+    lock_free = []
+
+    def is_live():
+        # stats() takes the scheduler lock; it only returns if _run isn't holding it
+        probe = threading.Thread(target=s.stats)
+        probe.start()
+        probe.join(timeout=1)
+        lock_free.append(not probe.is_alive())
+        return True
+
+    ran = []
+    s.submit(lambda: ran.append(1), 'A', 'u', is_live=is_live)
+    wait_for(lambda: ran)
+    assert lock_free and all(lock_free)
+
+
+def test_admission_limits(scheduler):
+    s = scheduler(credit_budget=10, max_queue=2)
+    with pytest.raises(BudgetExceeded):
+        s.submit(lambda: None, 'A', 'u', cost=11)
+    s.submit(lambda: None, 'A', 'u')
+    s.submit(lambda: None, 'A', 'u')
+    with pytest.raises(ExecutorBusy):
+        s.submit(lambda: None, 'A', 'u')
+    assert s.stats()['rejected'] == 2
+
+
+def test_credit_budget_holds_jobs_until_the_window_resets(scheduler):
+    s = scheduler(credit_budget=10, credit_window_seconds=0.5)
+    ran = []
+    s.submit(lambda: ran.append(time.monotonic()), 'A', 'u', cost=8)
+    s.submit(lambda: ran.append(time.monotonic()), 'A', 'u', cost=8)
+    wait_for(lambda: len(ran) == 2)
+    assert ran[1] - ran[0] >= 0.2
+
+
+def test_position_reports_are_throttled(scheduler):
+    s = scheduler(position_interval_seconds=60)
+    reports = []
+    for user in ['a', 'b', 'c', 'd']:
+        s.submit(lambda: None, 'A', user, on_position=lambda position, user=user: reports.append((user, position)))
+    # The first submit reports at once; the rest wait for the interval
+    assert reports == [('a', 1)]
+
+
+def test_position_reports_catch_up_after_the_interval(scheduler):
+    s = scheduler(rate_per_second=2, burst=1, position_interval_seconds=0.1)
+    reports = []
+    for user in ['a', 'b', 'c']:
+        s.submit(lambda: None, 'A', user, on_position=lambda position, user=user: reports.append((user, position)))
+    wait_for(lambda: ('c', 1) in reports)
+    assert ('b', 2) in reports and ('c', 3) in reports
+
+
+def test_estimate_audio_seconds_reads_wav_headers():
+    header = b'RIFF' + b'\0' * 4 + b'WAVEfmt ' + b'\0' * 12 + (32000).to_bytes(4, 'little') + b'\0' * 12
+    assert estimate_audio_seconds(header + b'\0' * 64000) == 2.0
+    assert estimate_audio_seconds(b'\0' * 8000) == 2.0
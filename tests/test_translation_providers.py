@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from translation_providers import CircuitBreaker, TranslationProvider, TranslationRouter, TranslationUnavailable
+
+
+class FakeProvider(TranslationProvider):
+    def __init__(self, name, answer=None, error=None, block=None, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.answer = answer
+        self.error = error
+        # Calls wait on this event, e.g. to stand in for a stalled provider
+        self.block = block
+
+    def translate(self, text, source_language, target_language):
+        if self.block is not None:
+            self.block.wait(5)
+        if self.error:
+            raise RuntimeError(self.error)
+        return f"{self.answer}:{text}"
+
+
+@pytest.fixture
+def stalled():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    breaker.opened_at -= 31
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    # Only one trial at a time
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    breaker.opened_at -= 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_failure_falls_through_to_the_next_provider():
+    broken = FakeProvider('broken', error='boom')
+    backup = FakeProvider('backup', answer='backup')
+    router = TranslationRouter([broken, backup])
+
+    assert router.translate('hi', 'en', 'es') == 'backup:hi'
+    assert router.stats()['fallbacks'] == 1
+    assert broken.failures == 1 and backup.calls == 1
+
+
+def test_open_breaker_is_skipped():
+    broken = FakeProvider('broken', error='boom', failure_threshold=1)
+    backup = FakeProvider('backup', answer='backup')
+    router = TranslationRouter([broken, backup])
+    router.translate('one', 'en', 'es')
+
+    assert broken.breaker.state == 'open'
+    assert router.translate('two', 'en', 'es') == 'backup:two'
+    assert broken.calls == 1
+
+
+def test_slow_primary_is_hedged_and_the_first_answer_wins(stalled):
+    slow = FakeProvider('slow', answer='slow', block=stalled)
+    fast = FakeProvider('fast', answer='fast')
+    router = TranslationRouter([slow, fast], default_hedge_seconds=0.05)
+
+    assert router.translate('hi', 'en', 'es') == 'fast:hi'
+    stats = router.stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+
+def test_every_provider_failing_raises_with_their_errors():
+    router = TranslationRouter([FakeProvider('a', error='down'), FakeProvider('b', error='quota')])
+    with pytest.raises(TranslationUnavailable) as excinfo:
+        router.translate('hi', 'en', 'es')
+    assert 'a: down' in str(excinfo.value) and 'b: quota' in str(excinfo.value)
+
+
+def test_deadline_bounds_the_wait_when_providers_hang(stalled):
+    router = TranslationRouter([FakeProvider('a', block=stalled), FakeProvider('b', block=stalled)],
+                               default_hedge_seconds=0.05, deadline_seconds=0.3)
+    started = time.monotonic()
+    with pytest.raises(TranslationUnavailable, match='timed out'):
+        router.translate('hi', 'en', 'es')
+    assert time.monotonic() - started < 2
+    assert router.stats()['timeouts'] == 1
+
+
+def test_no_provider_available():
+    broken = FakeProvider('broken', error='boom', failure_threshold=1)
+    router = TranslationRouter([broken])
+    with pytest.raises(TranslationUnavailable):
+        router.translate('hi', 'en', 'es')
+    with pytest.raises(TranslationUnavailable, match='No translation provider available'):
+        router.translate('hi', 'en', 'es')
+
+
+def test_batches_use_the_provider_batch_call():
+    provider = FakeProvider('p', answer='x')
+    router = TranslationRouter([provider])
+    assert router.translate_batch(['a', 'b'], 'en', 'es') == ['x:a', 'x:b']
+    assert router.translate_batch([], 'en', 'es') == []
@@ -42,6 +42,12 @@ const ChatRoom = () => {
   
   const messagesAreaRef = useRef(null)
   const typingTimerRef = useRef(null)
+  const typingSentAtRef = useRef(0)
+  // Paged history: cursor for the next older page, and a voice message waiting on its audio
+  const [hasMoreHistory, setHasMoreHistory] = useState(false)
+  const historyCursorRef = useRef(null)
+  const pendingPlayRef = useRef(null)
+  const keepScrollRef = useRef(false)
 
   useEffect(() => {
     // Get circle info from localStorage
@@ -81,23 +87,33 @@ const ChatRoom = () => {
       room_id: roomId,
       username: username,
       language: userLanguage,
-      bot_language: isBot ? botLanguage : undefined
+      bot_language: isBot ? botLanguage : undefined,
+      history_mode: 'paged'
     })
 
     // Socket event handlers
-    newSocket.on('user_joined', (data) => {
+    newSocket.on('room_users', (data) => {
       setParticipantCount(data.users.length)
+    })
+
+    newSocket.on('user_joined', (data) => {
+      setParticipantCount(data.participant_count)
       addStatusMessage(`${data.username} joined the circle`)
     })
 
     newSocket.on('user_left', (data) => {
-      setParticipantCount(data.users.length)
+      setParticipantCount(data.participant_count)
     })
 
     newSocket.on('new_message', (message) => {
       setMessages(prev => [...prev, message])
     })
 
+    // Busy rooms send a window of messages in one frame; append them in one render
+    newSocket.on('new_messages', (data) => {
+      setMessages(prev => [...prev, ...data.messages])
+    })
+
     newSocket.on('voice_message', (data) => {
       setVoiceMessages(prev => {
         // Check if message already exists to prevent duplicates
@@ -113,16 +129,49 @@ const ChatRoom = () => {
       updateVoiceMessageWithDub(data)
     })
 
-    newSocket.on('user_typing', (data) => {
-      if (data.typing) {
-        setTypingIndicator(`${data.username} is typing...`)
-      } else {
+    newSocket.on('typing_users', (data) => {
+      // Snapshot of everyone typing in the room, sent at most every few hundred ms
+      const others = data.users.filter(name => name !== username)
+      if (others.length === 0) {
         setTypingIndicator('')
+      } else if (others.length === 1) {
+        setTypingIndicator(`${others[0]} is typing...`)
+      } else if (others.length <= 3) {
+        setTypingIndicator(`${others.join(', ')} are typing...`)
+      } else {
+        setTypingIndicator(`${others.length} people are typing...`)
       }
     })
 
-    newSocket.on('chat_history', (data) => {
-      setMessages(data.messages)
+    // One page of history at a time; voice entries are stubs until their audio is asked for
+    newSocket.on('history', (data) => {
+      const textEntries = data.messages
+        .filter(entry => entry.type === 'text')
+        .map(entry => entry.translations[userLanguage]
+          ? { ...entry, translated_text: entry.translations[userLanguage] }
+          : entry)
+      // Archived voice messages have outlived their audio
+      const voiceEntries = data.messages.filter(entry => entry.type === 'voice' && entry.audio_url)
+      if (data.before) {
+        keepScrollRef.current = true
+      }
+      setMessages(prev => {
+        const known = new Set(prev.map(msg => msg.id))
+        return [...textEntries.filter(entry => !known.has(entry.id)), ...prev]
+      })
+      setVoiceMessages(prev => {
+        const known = new Set(prev.map(msg => msg.message_id))
+        return [...voiceEntries.filter(entry => !known.has(entry.message_id)), ...prev]
+      })
+      historyCursorRef.current = data.next_cursor
+      setHasMoreHistory(data.has_more)
+    })
+
+    newSocket.on('voice_audio', (data) => {
+      keepScrollRef.current = true
+      setVoiceMessages(prev => prev.map(msg =>
+        msg.message_id === data.message_id ? { ...msg, audio_data: data.audio_data } : msg
+      ))
     })
 
     newSocket.on('translated_text', (data) => {
@@ -167,9 +216,42 @@ const ChatRoom = () => {
   }, [roomId, username, userLanguage, isBot])
 
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false
+      return
+    }
     scrollToBottom()
   }, [messages, voiceMessages])
 
+  useEffect(() => {
+    // Play a history voice message as soon as its audio has been loaded
+    const messageId = pendingPlayRef.current
+    if (!messageId || !voiceMessages.some(msg => msg.message_id === messageId && msg.audio_data)) return
+    pendingPlayRef.current = null
+    const audio = document.getElementById(`audio_${messageId}`)
+    if (audio) {
+      audio.load()
+      playAudio(`audio_${messageId}`)
+    }
+  }, [voiceMessages])
+
+  const loadEarlierMessages = () => {
+    if (socket && historyCursorRef.current) {
+      socket.emit('load_history', { before: historyCursorRef.current })
+    }
+  }
+
+  const playVoiceMessage = (data) => {
+    if (data.audio_data) {
+      playAudio(`audio_${data.message_id}`)
+      return
+    }
+    pendingPlayRef.current = data.message_id
+    if (socket) {
+      socket.emit('load_voice_audio', { message_id: data.message_id })
+    }
+  }
+
   const scrollToBottom = () => {
     if (messagesAreaRef.current) {
       messagesAreaRef.current.scrollTop = messagesAreaRef.current.scrollHeight
@@ -209,8 +291,11 @@ const ChatRoom = () => {
     if (isBot) return // No typing indicator in bot mode
     if (!socket) return
     
-    if (!isTyping) {
+    // Re-announce now and then while typing; the server expires silent typers
+    const now = Date.now()
+    if (!isTyping || now - typingSentAtRef.current > 2000) {
       setIsTyping(true)
+      typingSentAtRef.current = now
       socket.emit('typing', { typing: true })
     }
     
@@ -556,7 +641,7 @@ const ChatRoom = () => {
             )}
             <div className="flex items-center space-x-3">
               <button 
-                onClick={() => playAudio(audioId)}
+                onClick={() => playVoiceMessage(data)}
                 className="w-8 h-8 rounded-full bg-gray-600 hover:bg-gray-500 flex items-center justify-center text-white transition-all duration-300"
               >
                 <img src="https://api.iconify.design/mdi:play.svg?color=white" alt="Play" className="w-4 h-4" />
@@ -626,10 +711,12 @@ const ChatRoom = () => {
               </div>
             </div>
             <div className="text-xs text-gray-400">{time}</div>
-            <audio id={audioId} style={{ display: 'none' }}>
-              <source src={`data:audio/webm;base64,${data.audio_data}`} type="audio/webm" />
-              <source src={`data:audio/wav;base64,${data.audio_data}`} type="audio/wav" />
-            </audio>
+            {data.audio_data && (
+              <audio id={audioId} style={{ display: 'none' }}>
+                <source src={`data:audio/webm;base64,${data.audio_data}`} type="audio/webm" />
+                <source src={`data:audio/wav;base64,${data.audio_data}`} type="audio/wav" />
+              </audio>
+            )}
             {data.dubbed_audio && (
               <audio id={dubbedAudioId} style={{ display: 'none' }}>
                 <source src={`data:audio/wav;base64,${data.dubbed_audio}`} type="audio/wav" />
@@ -782,6 +869,17 @@ const ChatRoom = () => {
           </div>
         </div>
         
+        {hasMoreHistory && (
+          <div className="text-center">
+            <button
+              onClick={loadEarlierMessages}
+              className="px-4 py-2 rounded-xl bg-white/10 text-gray-300 text-sm hover:bg-white/20 transition-all duration-300"
+            >
+              Load earlier messages
+            </button>
+          </div>
+        )}
+        
         {[...messages, ...voiceMessages]
           .sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp))
           .map(message => {
@@ -3,6 +3,9 @@ import { useNavigate } from 'react-router-dom'
 import Header from '../components/Header'
 import Modal from '../components/Modal'
 
+// Circle images are served by the backend under /api/images
+const imageUrl = (url) => (url && url.startsWith('/') ? `http://localhost:5000${url}` : url)
+
 const Dashboard = () => {
   const navigate = useNavigate()
   const [showJoinModal, setShowJoinModal] = useState(false)
@@ -20,27 +23,37 @@ const Dashboard = () => {
   const loadRooms = async () => {
     const rooms = JSON.parse(localStorage.getItem('joinedRooms') || '[]')
     
-    // Update circle info for non-owner circles
-    const updatedRooms = await Promise.all(rooms.map(async (room) => {
-      if (!room.isOwner && !room.isDM && room.id.startsWith('circle-')) {
-        try {
-          const response = await fetch(`http://localhost:5000/api/circles/${room.id}`)
-          const circleInfo = await response.json()
-          return {
-            ...room,
-            name: circleInfo.name,
-            description: circleInfo.description,
-            image: circleInfo.image,
-            color: circleInfo.color,
-            emoji: circleInfo.emoji
-          }
-        } catch (error) {
-          console.error('Error fetching circle info:', error)
-          return room
-        }
+    // Update circle info for non-owner circles in one request
+    const circleIds = rooms
+      .filter(room => !room.isOwner && !room.isDM && room.id.startsWith('circle-'))
+      .map(room => room.id)
+    let circlesById = {}
+    if (circleIds.length > 0) {
+      try {
+        const response = await fetch(`http://localhost:5000/api/circles?ids=${circleIds.map(encodeURIComponent).join(',')}`)
+        const data = await response.json()
+        circlesById = Object.fromEntries(data.circles.map(circle => [circle.id, circle]))
+      } catch (error) {
+        console.error('Error fetching circle info:', error)
+      }
+    }
+    
+    const updatedRooms = rooms.map(room => {
+      const circleInfo = circlesById[room.id]
+      if (!circleInfo) {
+        return room
+      }
+      return {
+        ...room,
+        name: circleInfo.name,
+        description: circleInfo.description,
+        image: imageUrl(circleInfo.thumbnail),
+        color: circleInfo.color,
+        emoji: circleInfo.emoji,
+        participantCount: circleInfo.participant_count,
+        lastMessage: circleInfo.last_message
       }
-      return room
-    }))
+    })
     
     // Update localStorage with new info
     localStorage.setItem('joinedRooms', JSON.stringify(updatedRooms))
@@ -70,7 +83,7 @@ const Dashboard = () => {
           name: circleInfo.name,
           description: circleInfo.description,
           language: userLanguage,
-          image: circleInfo.image,
+          image: imageUrl(circleInfo.thumbnail),
           color: circleInfo.color,
           emoji: circleInfo.emoji,
           joinedAt: Date.now(),
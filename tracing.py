@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MAX_SPANS_PER_TRACE = 200
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Tracer:
+    """Per-message traces kept in a fixed-size ring buffer.
+
+    The trace id is the chat message_id, so every stage a message goes through
+    (storage, broadcast, dubbing job, polls, download, delivery) lands on the
+    same trace no matter which thread records it. The oldest trace is dropped
+    once capacity is reached. Traces are per process.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, trace_id, stage, started, ended, **attrs):
+        if trace_id is None:
+            return
+        span = dict(attrs, stage=stage, start=started, end=ended, duration_ms=round((ended - started) * 1000, 3))
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.capacity:
+                    self._traces.popitem(last=False)
+            if len(spans) < MAX_SPANS_PER_TRACE:
+                spans.append(span)
+
+    @contextmanager
+    def span(self, trace_id, stage, **attrs):
+        """Time a block; the yielded dict can be filled with attributes as it runs."""
+        started = time.time()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(trace_id, stage, started, time.time(), **attrs)
+
+    @staticmethod
+    def _summary(trace_id, spans):
+        spans = sorted(spans, key=lambda span: span['start'])
+        started = spans[0]['start']
+        stages = {}
+        for span in spans:
+            stages[span['stage']] = round(stages.get(span['stage'], 0) + span['duration_ms'], 3)
+        return {
+            'trace_id': trace_id,
+            'started_at': started,
+            'duration_ms': round((max(span['end'] for span in spans) - started) * 1000, 3),
+            'stages': stages,
+            'spans': [dict(span, offset_ms=round((span['start'] - started) * 1000, 3)) for span in spans]
+        }
+
+    def get(self, trace_id):
+        with self._lock:
+            spans = list(self._traces.get(trace_id, ()))
+        return self._summary(trace_id, spans) if spans else None
+
+    def slowest(self, limit=20):
+        with self._lock:
+            traces = [(trace_id, list(spans)) for trace_id, spans in self._traces.items() if spans]
+        summaries = [self._summary(trace_id, spans) for trace_id, spans in traces]
+        summaries.sort(key=lambda summary: summary['duration_ms'], reverse=True)
+        return summaries[:limit]
+
+    def stage_percentiles(self, percentiles=(50, 90, 99)):
+        with self._lock:
+            spans = [span for trace_spans in self._traces.values() for span in trace_spans]
+        durations = {}
+        for span in spans:
+            durations.setdefault(span['stage'], []).append(span['duration_ms'])
+        breakdown = {}
+        for stage, values in durations.items():
+            values.sort()
+            breakdown[stage] = dict(
+                {f"p{pct}": percentile(values, pct) for pct in percentiles},
+                count=len(values),
+                max=values[-1]
+            )
+        return breakdown
+
+    def __len__(self):
+        with self._lock:
+            return len(self._traces)
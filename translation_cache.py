@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import structured_log
+from models import db, CachedTranslation
+
+log = structured_log.get_logger('translation_cache')
+
+
+def normalize_text(text):
+    # Same message typed with different spacing should hit the same entry
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class TranslationCache:
+    """In-process LRU of translations, backed by the CachedTranslation table."""
+
+    def __init__(self, app, max_entries=5000, ttl_seconds=7 * 24 * 3600):
+        self.app = app
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, text, source_language, target_language):
+        text_hash = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return (text_hash, source_language, target_language)
+
+    def _remember(self, key, translated_text, expires_at):
+        self._entries[key] = (translated_text, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text, source_language, target_language):
+        key = self._key(text, source_language, target_language)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                translated_text, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return translated_text
+                del self._entries[key]
+
+        row = None
+        try:
+            with self.app.app_context():
+                row = CachedTranslation.query.filter_by(
+                    text_hash=key[0],
+                    source_language=source_language,
+                    target_language=target_language
+                ).first()
+                if row and row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+                    db.session.delete(row)
+                    db.session.commit()
+                    row = None
+                if row:
+                    translated_text = row.translated_text
+                    expires_at = now + self.ttl_seconds - (datetime.utcnow() - row.created_at).total_seconds()
+        except Exception as e:
+            log.error('lookup_failed', target_language=target_language, error=str(e))
+            row = None
+
+        with self._lock:
+            if row:
+                self.db_hits += 1
+                self._remember(key, translated_text, expires_at)
+                return translated_text
+            self.misses += 1
+        return None
+
+    def set(self, text, source_language, target_language, translated_text):
+        key = self._key(text, source_language, target_language)
+
+        with self._lock:
+            self._remember(key, translated_text, time.time() + self.ttl_seconds)
+
+        try:
+            with self.app.app_context():
+                row = CachedTranslation.query.filter_by(
+                    text_hash=key[0],
+                    source_language=source_language,
+                    target_language=target_language
+                ).first()
+                if row:
+                    row.translated_text = translated_text
+                    row.created_at = datetime.utcnow()
+                else:
+                    db.session.add(CachedTranslation(
+                        text_hash=key[0],
+                        source_language=source_language,
+                        target_language=target_language,
+                        translated_text=translated_text
+                    ))
+                db.session.commit()
+        except Exception as e:
+            # Another worker may have stored the same translation first
+            log.error('store_failed', target_language=target_language, error=str(e))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'hits': self.memory_hits + self.db_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,304 @@
+import html
+import importlib.util
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from metrics import timed_call
+from tracing import percentile
+
+
+class TranslationUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops sending traffic to a provider after repeated failures.
+
+    After failure_threshold consecutive failures the breaker opens for
+    reset_seconds; then one trial call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half_open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class TranslationProvider:
+    name = 'provider'
+    supports_batch = False
+
+    def __init__(self, failure_threshold=5, reset_seconds=30, window=200):
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def translate(self, text, source_language, target_language):
+        raise NotImplementedError
+
+    def translate_batch(self, texts, source_language, target_language):
+        return [self.translate(text, source_language, target_language) for text in texts]
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def latency_percentile(self, pct, minimum_samples=20):
+        with self._lock:
+            if len(self._latencies) < minimum_samples:
+                return None
+            return percentile(sorted(self._latencies), pct)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'breaker': self.breaker.state,
+            'supports_batch': self.supports_batch,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3) if latencies else None
+        }
+
+
+class GoogleProvider(TranslationProvider):
+    """Google Translate's public mobile page, the one deep_translator scrapes.
+
+    Called directly so the request has a timeout; deep_translator's has none,
+    and a hung call would hold its thread forever.
+    """
+    name = 'google'
+    url = 'https://translate.google.com/m'
+    result_pattern = re.compile(r'<div class="(?:result-container|t0)">(.*?)</div>', re.S)
+
+    def __init__(self, timeout=10, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+
+    def translate(self, text, source_language, target_language):
+        if not text.strip() or source_language == target_language:
+            return text
+        response = requests.get(self.url, params={'sl': source_language, 'tl': target_language, 'q': text},
+                                timeout=self.timeout)
+        response.raise_for_status()
+        match = self.result_pattern.search(response.text)
+        if not match:
+            raise ValueError('No translation in response')
+        return html.unescape(match.group(1)).strip()
+
+
+class LibreTranslateProvider(TranslationProvider):
+    """Any LibreTranslate-compatible HTTP service; q may be a list, so batches are one request."""
+    name = 'libre'
+    supports_batch = True
+
+    def __init__(self, url, api_key=None, timeout=10, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def _post(self, q, source_language, target_language):
+        payload = {'q': q, 'source': source_language, 'target': target_language, 'format': 'text'}
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        response = requests.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['translatedText']
+
+    def translate(self, text, source_language, target_language):
+        return self._post(text, source_language, target_language)
+
+    def translate_batch(self, texts, source_language, target_language):
+        translated = self._post(list(texts), source_language, target_language)
+        if not isinstance(translated, list) or len(translated) != len(texts):
+            raise ValueError('Batch response does not match the request')
+        return translated
+
+
+class ArgosProvider(TranslationProvider):
+    """Offline translation with Argos Translate (pip install argostranslate plus language packages)."""
+    name = 'argos'
+
+    @staticmethod
+    def installed():
+        return importlib.util.find_spec('argostranslate') is not None
+
+    def translate(self, text, source_language, target_language):
+        import argostranslate.translate
+        if source_language == 'auto':
+            raise ValueError('Offline translation needs a known source language')
+        return argostranslate.translate.translate(text, source_language, target_language)
+
+
+class TranslationRouter:
+    """Sends each translation to the first healthy provider.
+
+    If it hasn't answered within its own hedge_percentile latency, a hedged
+    request goes to the next provider (or the same one again when it's the
+    only one) and whichever answers first wins. Failures fall through to the
+    remaining providers; providers with an open circuit breaker are skipped.
+    Past deadline_seconds the caller gets TranslationUnavailable, whatever is
+    still running.
+    """
+
+    def __init__(self, providers, hedge_percentile=95, default_hedge_seconds=1.0, max_workers=16, deadline_seconds=10):
+        self.providers = providers
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_seconds = default_hedge_seconds
+        self.deadline_seconds = deadline_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translate-hedge')
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+
+    def _call(self, provider, method, args):
+        provider.calls += 1
+        started = time.perf_counter()
+        try:
+            with timed_call('translator', f"{provider.name}.{method}"):
+                result = getattr(provider, method)(*args)
+        except Exception:
+            provider.failures += 1
+            provider.breaker.record_failure()
+            raise
+        provider.record_latency(time.perf_counter() - started)
+        provider.breaker.record_success()
+        return result
+
+    def _hedge_delay(self, provider):
+        delay = provider.latency_percentile(self.hedge_percentile)
+        return self.default_hedge_seconds if delay is None else delay
+
+    def _route(self, method, args):
+        # One provider is allowed to hedge against itself; a retry still dodges one-off stalls
+        order = self.providers * 2 if len(self.providers) == 1 else list(self.providers)
+        running = {}
+        errors = []
+        position = 0
+        hedged = False
+
+        def launch():
+            nonlocal position
+            # Breakers are asked only when a call is really about to go out,
+            # so a half-open trial slot is never reserved and then left unused
+            while position < len(order):
+                provider = order[position]
+                position += 1
+                if provider.breaker.allow():
+                    running[self._executor.submit(self._call, provider, method, args)] = (provider, bool(running) or bool(errors))
+                    return provider
+            return None
+
+        deadline = time.monotonic() + self.deadline_seconds
+        primary = launch()
+        if primary is None:
+            raise TranslationUnavailable('No translation provider available')
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Stragglers finish (or hit their own timeout) in the background
+                with self._lock:
+                    self.timeouts += 1
+                raise TranslationUnavailable('; '.join(errors + ['translation timed out']))
+            timeout = remaining
+            if not hedged and position < len(order):
+                timeout = min(self._hedge_delay(primary), remaining)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedged or position >= len(order):
+                    continue
+                hedged = True
+                if launch() is not None:
+                    with self._lock:
+                        self.hedges += 1
+                continue
+            for future in done:
+                provider, secondary = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                if secondary:
+                    with self._lock:
+                        if hedged:
+                            self.hedge_wins += 1
+                        else:
+                            self.fallbacks += 1
+                return result
+            if not running:
+                launch()
+        raise TranslationUnavailable('; '.join(errors) or 'No translation provider available')
+
+    def translate(self, text, source_language, target_language):
+        return self._route('translate', (text, source_language, target_language))
+
+    def translate_batch(self, texts, source_language, target_language):
+        if not texts:
+            return []
+        return self._route('translate_batch', (list(texts), source_language, target_language))
+
+    def stats(self):
+        with self._lock:
+            totals = {'hedges': self.hedges, 'hedge_wins': self.hedge_wins, 'fallbacks': self.fallbacks,
+                      'timeouts': self.timeouts}
+        return dict(totals, hedge_percentile=self.hedge_percentile,
+                    providers={provider.name: provider.stats() for provider in self.providers})
+
+
+def create_providers(names, libre_url=None, libre_api_key=None, timeout=10):
+    """Build providers in the configured order, skipping ones that can't run here."""
+    providers = []
+    for name in names:
+        name = name.strip().lower()
+        if name == 'libre' and libre_url:
+            providers.append(LibreTranslateProvider(libre_url, libre_api_key, timeout=timeout))
+        elif name == 'google':
+            providers.append(GoogleProvider(timeout=timeout))
+        elif name == 'argos' and ArgosProvider.installed():
+            providers.append(ArgosProvider())
+    return providers
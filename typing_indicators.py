@@ -0,0 +1,125 @@
+import atexit
+import threading
+import time
+
+
+class TypingAggregator:
+    """Debounced "who is typing" snapshots per room.
+
+    Clients send a typing event per keystroke burst; relaying each one is
+    O(members) frames per keystroke. Instead, who is typing in a room lives
+    in the state backend (username -> expiry), and a background thread
+    sends at most one snapshot of the full list per room every interval_ms,
+    only when the list changed. Refreshes of someone already typing don't
+    touch shared state or the network, and entries expire after
+    ttl_seconds, so a client that vanishes without sending typing=false is
+    cleared anyway.
+
+    Snapshots are complete, so when two workers both touch a room their
+    frames converge on the same list.
+    """
+
+    def __init__(self, backend, emit, interval_ms=300, ttl_seconds=5, events=None, snapshots=None):
+        self.backend = backend
+        self.emit = emit
+        self.interval = interval_ms / 1000.0
+        self.ttl = ttl_seconds
+        # Optional metrics counters: events by result, snapshots sent
+        self.events = events
+        self.snapshots = snapshots
+        self._dirty = set()
+        # Rooms this worker has seen typers in, for expiry
+        self._watched = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='typing-indicators', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _name(room_id):
+        return f"typing:{room_id}"
+
+    def _count(self, result):
+        if self.events is not None:
+            self.events.inc(result=result)
+
+    def update(self, room_id, username, typing):
+        now = time.time()
+        name = self._name(room_id)
+        expires_at = self.backend.hget(name, username)
+        if typing:
+            # Still comfortably within its expiry: nothing anyone else needs to know
+            if expires_at is not None and expires_at - now > self.ttl / 2:
+                self._count('suppressed')
+                return
+            self.backend.hset(name, username, now + self.ttl)
+            changed = expires_at is None or expires_at <= now
+        else:
+            changed = bool(self.backend.hdel(name, username))
+        if not changed:
+            self._count('suppressed')
+            return
+        self._count('changed')
+        self._mark(room_id)
+
+    def remove(self, room_id, username):
+        # The user left or disconnected
+        if self.backend.hdel(self._name(room_id), username):
+            self._mark(room_id)
+
+    def typing(self, room_id):
+        now = time.time()
+        return sorted(username for username, expires_at in self.backend.hgetall(self._name(room_id)).items()
+                      if expires_at > now)
+
+    def _mark(self, room_id):
+        with self._cond:
+            if not self._dirty:
+                self._cond.notify()
+            self._dirty.add(room_id)
+            self._watched.add(room_id)
+
+    def _expire(self):
+        now = time.time()
+        for room_id in list(self._watched):
+            entries = self.backend.hgetall(self._name(room_id))
+            expired = [username for username, expires_at in entries.items() if expires_at <= now]
+            for username in expired:
+                self.backend.hdel(self._name(room_id), username)
+            with self._cond:
+                if expired:
+                    self._dirty.add(room_id)
+                if len(entries) == len(expired):
+                    self._watched.discard(room_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._dirty and not self._watched and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Coalesce everything that happens within one interval into one frame per room
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        self._expire()
+        with self._cond:
+            dirty, self._dirty = self._dirty, set()
+        for room_id in dirty:
+            self.emit(room_id, self.typing(room_id))
+            if self.snapshots is not None:
+                self.snapshots.inc()
+        return len(dirty)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {'dirty_rooms': len(self._dirty), 'watched_rooms': len(self._watched),
+                    'interval_ms': self.interval * 1000, 'ttl_seconds': self.ttl}
@@ -0,0 +1,163 @@
+import atexit
+import os
+import signal
+import threading
+import time
+
+import structured_log
+from models import db
+
+log = structured_log.get_logger('write_behind')
+
+
+class WriteBehindQueue:
+    """Buffers inserts and commits them in batches from a background thread.
+
+    Rows are flushed every flush_interval_ms or as soon as max_batch rows are
+    waiting, whichever comes first. Readers that need to see recent rows call
+    flush() first; close() drains the queue and is registered with atexit,
+    and close_on_signals() covers SIGTERM/SIGINT, which skip atexit.
+    on_flush(rows, started, ended), if given, is called after each batch is
+    written, with wall-clock times of the insert.
+    """
+
+    def __init__(self, app, model, flush_interval_ms=50, max_batch=200, on_flush=None):
+        self.app = app
+        self.model = model
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.on_flush = on_flush
+        self._rows = []
+        self._cond = threading.Condition()
+        # Reentrant: a signal handler may close() the queue while this thread is mid-flush
+        self._flush_lock = threading.RLock()
+        self._closed = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, **row):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('write-behind queue is closed')
+            self._rows.append(row)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._rows))
+            if len(self._rows) >= self.max_batch:
+                self._cond.notify()
+
+    def depth(self):
+        with self._cond:
+            return len(self._rows)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._rows and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._rows:
+                    return
+                if len(self._rows) < self.max_batch and not self._closed:
+                    # Give the batch a moment to fill before paying for a commit
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            started_at = time.time()
+            started = time.perf_counter()
+            try:
+                self._insert(rows)
+            except Exception as e:
+                self.failures += 1
+                log.error('batch_insert_failed', rows=len(rows), error=str(e))
+                self._insert_one_by_one(rows)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            if self.on_flush:
+                try:
+                    self.on_flush(rows, started_at, time.time())
+                except Exception as e:
+                    log.error('flush_callback_failed', error=str(e))
+            return len(rows)
+
+    def _insert(self, rows):
+        with self.app.app_context():
+            db.session.execute(db.insert(self.model), rows)
+            db.session.commit()
+        self.flushed += len(rows)
+
+    def _insert_one_by_one(self, rows):
+        # A single bad row (e.g. a duplicate message_uuid) must not drop the whole batch
+        for row in rows:
+            try:
+                self._insert([row])
+            except Exception as e:
+                self.dropped += 1
+                log.error('row_dropped', message_uuid=row.get('message_uuid'), error=str(e))
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._rows)
+        return {
+            'depth': depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'flush_interval_ms': self.flush_interval * 1000,
+            'max_batch': self.max_batch
+        }
+
+
+def close_on_signals(*queues, signals=(signal.SIGTERM, signal.SIGINT)):
+    """Drain queues when the process is told to stop, then hand over to the previous handler.
+
+    A process killed by SIGTERM's default action never runs atexit. Handlers
+    can only be installed from the main thread; elsewhere this does nothing.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        log.warning('signal_handlers_skipped', reason='not the main thread')
+        return
+
+    for signum in signals:
+        previous = signal.getsignal(signum)
+
+        def handler(signum, frame, previous=previous):
+            for queue in queues:
+                try:
+                    queue.close()
+                except Exception as e:
+                    log.error('close_on_signal_failed', signal=signum, error=str(e))
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                # Default action: die of the same signal, as if no handler had been installed
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+
+        signal.signal(signum, handler)